@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -106,8 +108,141 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,
 }
 
+# Opt-in orjson rendering/parsing (same output as DRF's JSON renderer, several times faster).
+USE_ORJSON = os.getenv("USE_ORJSON", "False").lower() == "true"
+if USE_ORJSON:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "utils.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = (
+        "utils.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    )
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+
+REQUEST_INSTRUMENTATION = {
+    "SERVER_TIMING": True,
+    "SLOW_REQUEST_MS": int(os.getenv("SLOW_REQUEST_MS", "1000")),
+    "QUERY_BUDGETS": {
+        "report-list": 10,
+        "report-detail": 6,
+        "report-search": 6,
+        "report-trends": 4,
+        "report-upload": 60,
+        "patient-list": 6,
+        "resultvalue-list": 6,
+        "alert-list": 6,
+        "lab-results-bulk": 20,
+        "analyte-analytics": 4,
+        "llm-usage-summary": 4,
+        "core_report_changelist": 8,
+        "core_resultvalue_changelist": 6,
+        "core_alert_changelist": 6,
+        "core_llmcalllog_changelist": 8,
+    },
+    "ENFORCE_QUERY_BUDGETS": os.getenv("ENFORCE_QUERY_BUDGETS", "False").lower() == "true",
+}
+
+METRICS_AUTH_TOKEN = os.getenv("METRICS_AUTH_TOKEN", "")
+# Without a token, /metrics is only served to these networks (comma-separated CIDRs).
+METRICS_ALLOWED_NETWORKS = [
+    network.strip()
+    for network in os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.1/32,::1/128").split(",")
+    if network.strip()
+]
+
+# Seconds to cache each user's linked patient ids (0 disables the per-user cache). Only enable
+# it with a cache shared by all workers; see core.access.PatientAccess.
+PATIENT_ACCESS_CACHE_TIMEOUT = int(os.getenv("PATIENT_ACCESS_CACHE_TIMEOUT", "0"))
+
+BATCH_UPLOAD = {
+    "MAX_FILES": int(os.getenv("BATCH_UPLOAD_MAX_FILES", "50")),
+    "CONCURRENCY": int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4")),
+    "MAX_FILE_BYTES": 25 * 1024 * 1024,
+    # Uploaded files plus uncompressed archive entries.
+    "MAX_TOTAL_BYTES": 200 * 1024 * 1024,
+}
+
+# Codec for extracted report text (core.models.ReportText): "zlib", or "zstd" when the
+# zstandard package is installed.
+REPORT_TEXT_CODEC = os.getenv("REPORT_TEXT_CODEC", "zlib")
+
+BULK_RESULTS_MAX_RESULTS = int(os.getenv("BULK_RESULTS_MAX_RESULTS", "10000"))
+
+# Writes flag their analytes stale; `refresh_analyte_rollups --stale` rebuilds them.
+ANALYTICS_ROLLUPS = {
+    "REFRESH_ON_WRITE": os.getenv("ANALYTICS_REFRESH_ON_WRITE", "True").lower() == "true",
+}
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
+# Any OpenAI-compatible server, e.g. a local stub that replays streamed chunks.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+
+# Host-wide limiter and circuit breaker for model calls (state shared through a lock file).
+LLM_GUARD = {
+    "ENABLED": os.getenv("LLM_GUARD_ENABLED", "True").lower() == "true",
+    "STATE_DIR": os.getenv("LLM_GUARD_STATE_DIR", "/tmp/nanolabs-llm-guard"),
+    "RATE_PER_MINUTE": int(os.getenv("LLM_RATE_PER_MINUTE", "60")),
+    "BURST": int(os.getenv("LLM_BURST", "10")),
+    "FAILURE_THRESHOLD": int(os.getenv("LLM_FAILURE_THRESHOLD", "3")),
+    "COOLDOWN_SECONDS": int(os.getenv("LLM_COOLDOWN_SECONDS", "30")),
+}
+
+# Per-call telemetry (core.models.LLMCallLog), written in batches by a background thread.
+LLM_TELEMETRY = {
+    "ENABLED": os.getenv("LLM_TELEMETRY_ENABLED", "True").lower() == "true",
+    "BATCH_SIZE": int(os.getenv("LLM_TELEMETRY_BATCH_SIZE", "100")),
+    "FLUSH_SECONDS": float(os.getenv("LLM_TELEMETRY_FLUSH_SECONDS", "2")),
+    "MAX_QUEUE": 10000,
+}
+
+# USD per million tokens, used to estimate spend in the LLM usage summary. Dated snapshots
+# (e.g. gpt-4o-mini-2024-07-18) use the price of their base model.
+LLM_PRICING = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+}
+
+# OCR for scanned pages (no text layer) with a local Tesseract (see core.services.ocr).
+OCR = {
+    "ENABLED": os.getenv("OCR_ENABLED", "True").lower() == "true",
+    "COMMAND": os.getenv("TESSERACT_CMD", "tesseract"),
+    "LANGUAGES": os.getenv("OCR_LANGUAGES", "eng+spa"),
+    "DPI": int(os.getenv("OCR_DPI", "300")),
+    "WORKERS": int(os.getenv("OCR_WORKERS", "4")),
+    "PAGE_TIMEOUT_SECONDS": int(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", "30")),
+    "MAX_PAGES": int(os.getenv("OCR_MAX_PAGES", "20")),
+}
+
+# PDF extraction backend per stage (see core.services.pdf_backends): pypdfium2 reads the text
+# layer quickly, pdfplumber keeps the word positions and rulings the table parser needs.
+PDF_BACKENDS = {
+    "text": os.getenv("PDF_TEXT_BACKEND", "pypdfium2"),
+    "tables": os.getenv("PDF_TABLE_BACKEND", "pdfplumber"),
+}
+
+# PDFs whose tables parse with at least this confidence skip the LLM parser; confident
+# layouts are saved per lab as ParserTemplate rows (see core.services.pdf_parser).
+PARSER_ROUTING = {
+    "TABLE_MIN_CONFIDENCE": float(os.getenv("PARSER_TABLE_MIN_CONFIDENCE", "0.8")),
+    "TABLE_MIN_ANALYTES": int(os.getenv("PARSER_TABLE_MIN_ANALYTES", "1")),
+    "TEMPLATES_ENABLED": os.getenv("PARSER_TEMPLATES_ENABLED", "True").lower() == "true",
+    "TEMPLATE_CACHE_SECONDS": int(os.getenv("PARSER_TEMPLATE_CACHE_SECONDS", "3600")),
+    "TEMPLATE_HIT_FLUSH_EVERY": int(os.getenv("PARSER_TEMPLATE_HIT_FLUSH_EVERY", "50")),
+}
+
+# When insights are generated locally instead of by the LLM (see core.services.ai_insights).
+INSIGHTS_ROUTING = {
+    "ENABLED": os.getenv("INSIGHTS_ROUTING_ENABLED", "True").lower() == "true",
+    "MAX_LOCAL_FLAGS": int(os.getenv("INSIGHTS_MAX_LOCAL_FLAGS", "1")),
+    "MAX_LOCAL_DEVIATION": float(os.getenv("INSIGHTS_MAX_LOCAL_DEVIATION", "0.25")),
+}
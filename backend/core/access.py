@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import FrozenSet, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
+
+from .models import Alert, Patient, Report, ResultValue, User
+
+CLINICAL_ROLES = {User.Roles.DOCTOR, User.Roles.LAB, User.Roles.ADMIN}
+_REQUEST_ATTR = "_patient_access"
+
+
+def _cache_key(user_id) -> str:
+    return f"patient-access:{user_id}"
+
+
+def _cache_timeout() -> int:
+    return getattr(settings, "PATIENT_ACCESS_CACHE_TIMEOUT", 0)
+
+
+class PatientAccess:
+    """Which patients a user may see, resolved with at most one query.
+
+    Clinical roles and staff are unrestricted; everyone else is limited to the patients linked
+    to their account. The linked ids are loaded lazily, memoized for the request and, when
+    ``PATIENT_ACCESS_CACHE_TIMEOUT`` is set, cached per user.
+
+    That cache is invalidated by the ``Patient`` save/delete signals only, so it needs a cache
+    backend shared by all workers: with the default per-process ``LocMemCache`` a reassigned
+    patient stays visible to its previous owner in the other workers until the timeout.
+    ``QuerySet.update(user=...)`` sends no signals and invalidates nothing.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.unrestricted = bool(
+            user.is_authenticated and (user.role in CLINICAL_ROLES or user.is_staff)
+        )
+        self._patient_ids: Optional[FrozenSet] = None
+        self._own_patient: Optional[Patient] = None
+        self._own_patient_loaded = False
+
+    @property
+    def patient_ids(self) -> FrozenSet:
+        """Ids of the patients linked to the user (regardless of role)."""
+        if self._patient_ids is None:
+            self._patient_ids = self._load_patient_ids()
+        return self._patient_ids
+
+    def _load_patient_ids(self) -> FrozenSet:
+        if not self.user.is_authenticated:
+            return frozenset()
+        timeout = _cache_timeout()
+        if timeout:
+            cached = cache.get(_cache_key(self.user.pk))
+            if cached is not None:
+                return cached
+        patients = list(Patient.objects.filter(user=self.user))
+        if patients:
+            self._own_patient = patients[0]
+        self._own_patient_loaded = True
+        ids = frozenset(patient.pk for patient in patients)
+        if timeout:
+            cache.set(_cache_key(self.user.pk), ids, timeout)
+        return ids
+
+    def get_own_patient(self) -> Optional[Patient]:
+        """The user's primary patient profile (first by name), as ``filter(user=...).first()``."""
+        if not self._own_patient_loaded:
+            if self._patient_ids is None:
+                self._patient_ids = self._load_patient_ids()
+            if not self._own_patient_loaded:
+                self._own_patient = Patient.objects.filter(user=self.user).first()
+                self._own_patient_loaded = True
+        return self._own_patient
+
+    def can_access(self, patient_id) -> bool:
+        return self.unrestricted or (patient_id is not None and patient_id in self.patient_ids)
+
+    def can_access_object(self, obj) -> bool:
+        if self.unrestricted:
+            return True
+        return self.can_access(patient_id_for(obj))
+
+    def scope(self, queryset: QuerySet, path: str = "patient", mine: bool = False) -> QuerySet:
+        """Restrict ``queryset`` to accessible patients; ``mine`` limits clinical users too."""
+        if self.unrestricted and not mine:
+            return queryset
+        return queryset.filter(**{f"{path}__in": self.patient_ids})
+
+    def scope_alerts(self, queryset: QuerySet) -> QuerySet:
+        if self.unrestricted:
+            return queryset
+        ids = self.patient_ids
+        return queryset.filter(Q(patient__in=ids) | Q(report__patient__in=ids))
+
+
+def _report_patient_id(obj):
+    """Patient of ``obj.report``, from the loaded report or a single-column lookup."""
+    if not obj.report_id:
+        return None
+    if type(obj).report.is_cached(obj):
+        return obj.report.patient_id
+    return Report.objects.filter(pk=obj.report_id).values_list("patient_id", flat=True).first()
+
+
+def patient_id_for(obj):
+    if isinstance(obj, Patient):
+        return obj.pk
+    if isinstance(obj, Report):
+        return obj.patient_id
+    if isinstance(obj, ResultValue):
+        return _report_patient_id(obj)
+    if isinstance(obj, Alert):
+        return obj.patient_id or _report_patient_id(obj)
+    return None
+
+
+def get_patient_access(request) -> PatientAccess:
+    """Return the request's ``PatientAccess``, creating it on first use."""
+    http_request = getattr(request, "_request", request)
+    access = getattr(http_request, _REQUEST_ATTR, None)
+    if access is None or access.user is not request.user:
+        access = PatientAccess(request.user)
+        setattr(http_request, _REQUEST_ATTR, access)
+    return access
+
+
+def remember_patient_owner(sender, instance: Patient, **kwargs) -> None:
+    """``pre_save`` receiver noting the stored owner, so a reassignment invalidates both users."""
+    if not _cache_timeout():
+        return
+    if instance._state.adding:
+        instance._previous_user_id = None
+        return
+    instance._previous_user_id = (
+        Patient.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+    )
+
+
+def invalidate_patient_access(sender, instance: Patient, **kwargs) -> None:
+    """``post_save``/``post_delete`` receiver dropping the cached ids of the linked users."""
+    if not _cache_timeout():
+        return
+    user_ids = {instance.user_id, getattr(instance, "_previous_user_id", None)} - {None}
+    if user_ids:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -1,6 +1,34 @@
-from django.contrib import admin
+from asgiref.sync import async_to_sync
+from django.contrib import admin, messages
+from utils.pagination import EstimatedCountPaginator
 
-from .models import Alert, Analyte, Patient, Report, ResultValue, User
+from .models import (
+    Alert,
+    Analyte,
+    LLMCallLog,
+    ParserTemplate,
+    Patient,
+    Report,
+    ResultValue,
+    User,
+)
+from .services.insights_regeneration import RegenerationStats, aregenerate_page, save_page
+from .services.units import canonicalize
+
+# Larger selections block the admin request for too long; use ``regenerate_insights`` instead.
+ADMIN_REGENERATION_LIMIT = 25
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelists for tables with millions of rows: no full ``COUNT(*)`` on every page.
+
+    Subclasses pick related rows with ``list_select_related``, edit foreign keys to large
+    tables through ``raw_id_fields`` (or ``autocomplete_fields``) instead of a dropdown of
+    every row, and only filter on indexed columns.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(User)
@@ -15,9 +43,92 @@ class PatientAdmin(admin.ModelAdmin):
     list_display = ("name", "sex", "birth_date", "user")
     search_fields = ("name",)
     list_filter = ("sex",)
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(Analyte)
+class AnalyteAdmin(admin.ModelAdmin):
+    list_display = ("name", "unit")
+    search_fields = ("name",)
+
+
+@admin.register(Report)
+class ReportAdmin(LargeTableAdmin):
+    list_display = ("id", "patient", "org_name", "issued_at", "insights_prompt_version")
+    list_filter = ("insights_prompt_version",)
+    list_select_related = ("patient",)
+    raw_id_fields = ("patient",)
+    actions = ["regenerate_insights"]
+
+    @admin.action(description="Regenerate insights for selected reports")
+    def regenerate_insights(self, request, queryset):
+        count = queryset.count()
+        if count > ADMIN_REGENERATION_LIMIT:
+            self.message_user(
+                request,
+                f"Select at most {ADMIN_REGENERATION_LIMIT} reports here; use the "
+                "regenerate_insights management command for larger batches.",
+                messages.WARNING,
+            )
+            return
+        stats = RegenerationStats()
+        ready = async_to_sync(aregenerate_page)(list(queryset), stats, attempts=1)
+        save_page(ready)
+        summary = f"Regenerated insights for {len(ready)} of {count} reports."
+        level = messages.SUCCESS
+        if stats.failed:
+            summary += f" {stats.failed} skipped because the model was unavailable."
+            level = messages.WARNING
+        self.message_user(request, summary, level)
+
+
+@admin.register(LLMCallLog)
+class LLMCallLogAdmin(LargeTableAdmin):
+    list_display = (
+        "created_at",
+        "stage",
+        "model",
+        "outcome",
+        "latency_ms",
+        "input_tokens",
+        "output_tokens",
+        "retries",
+    )
+    # Choice and boolean filters only: ``stage`` or ``prompt_version`` would list their values
+    # with a ``SELECT DISTINCT`` over the whole log.
+    list_filter = ("outcome", "fallback_used")
+    date_hierarchy = "created_at"
+
+
+@admin.register(ParserTemplate)
+class ParserTemplateAdmin(admin.ModelAdmin):
+    list_display = ("lab_name", "fingerprint", "hits", "misses", "last_used_at")
+    search_fields = ("lab_name", "fingerprint")
+    readonly_fields = ("fingerprint", "hits", "misses", "created_at", "last_used_at")
+
+
+@admin.register(ResultValue)
+class ResultValueAdmin(LargeTableAdmin):
+    # ``report_id`` rather than ``report``: showing the report would join its JSON columns.
+    list_display = ("id", "analyte", "value", "unit", "flag", "measured_at", "report_id")
+    list_filter = ("flag",)
+    list_select_related = ("analyte",)
+    raw_id_fields = ("report",)
+    autocomplete_fields = ("analyte",)
+
+    def save_model(self, request, obj, form, change):
+        if not change or {"analyte", "value", "unit"} & set(form.changed_data):
+            obj.canonical_value, obj.canonical_unit = canonicalize(
+                obj.analyte.name, obj.unit, obj.value, obj.analyte.unit
+            )
+        super().save_model(request, obj, form, change)
 
 
-admin.site.register(Report)
-admin.site.register(Analyte)
-admin.site.register(ResultValue)
-admin.site.register(Alert)
+@admin.register(Alert)
+class AlertAdmin(LargeTableAdmin):
+    list_display = ("created_at", "level", "rule_key", "status", "patient", "report_id")
+    list_filter = ("status",)
+    list_select_related = ("patient",)
+    raw_id_fields = ("report",)
+    autocomplete_fields = ("patient",)
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_save
+
+        from .access import invalidate_patient_access, remember_patient_owner
+        from .instrumentation import install_query_tracking
+        from .models import Patient
+
+        pre_save.connect(remember_patient_owner, sender=Patient)
+        post_save.connect(invalidate_patient_access, sender=Patient)
+        post_delete.connect(invalidate_patient_access, sender=Patient)
+        connection_created.connect(install_query_tracking)
+        for connection in connections.all(initialized_only=True):
+            install_query_tracking(sender=None, connection=connection)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+
+from core.services import pdf_parser
+from core.services.pdf_backends import TEXT_BACKENDS
+from core.services.table_parser import NUMBER_PATTERN, extract_table_analytes
+
+from .synthetic_pdf import DocumentSpec, corpus_specs, generate_document
+
+GOLDEN_PATH = Path(__file__).with_name("golden.json")
+
+# (name, pdf bytes, expected values from ``generate_document``)
+Document = Tuple[str, bytes, Dict[str, Any]]
+
+
+@dataclass
+class Scores:
+    true_positives: int = 0
+    false_positives: int = 0
+    false_negatives: int = 0
+
+    @property
+    def precision(self) -> float:
+        found = self.true_positives + self.false_positives
+        return self.true_positives / found if found else 0.0
+
+    @property
+    def recall(self) -> float:
+        expected = self.true_positives + self.false_negatives
+        return self.true_positives / expected if expected else 0.0
+
+    def add(self, expected: Iterable[Dict[str, Any]], found: Iterable[Dict[str, Any]]) -> None:
+        """Count analytes by ``(name, value)``; a wrong value is both a miss and a false hit."""
+        wanted = Counter(_key(item) for item in expected)
+        got = Counter(_key(item) for item in found)
+        hits = sum((wanted & got).values())
+        self.true_positives += hits
+        self.false_positives += sum(got.values()) - hits
+        self.false_negatives += sum(wanted.values()) - hits
+
+
+@dataclass
+class BenchmarkReport:
+    documents: int = 0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    peak_memory_bytes: int = 0
+    text_hits: int = 0
+    text_expected: int = 0
+    dates_correct: int = 0
+    scores: Dict[str, Scores] = field(default_factory=dict)
+    parsers: Counter = field(default_factory=Counter)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / max(self.stage_seconds.get("parse_pdf", 0.0), 1e-9)
+
+    @property
+    def text_recall(self) -> float:
+        return self.text_hits / self.text_expected if self.text_expected else 0.0
+
+    @property
+    def date_accuracy(self) -> float:
+        return self.dates_correct / self.documents if self.documents else 0.0
+
+
+@dataclass
+class BackendResult:
+    """Throughput, memory and text recall of one text backend over the corpus."""
+
+    documents: int = 0
+    seconds: float = 0.0
+    peak_memory_bytes: int = 0
+    text_hits: int = 0
+    text_expected: int = 0
+
+    @property
+    def ms_per_doc(self) -> float:
+        return self.seconds * 1000 / self.documents if self.documents else 0.0
+
+    @property
+    def text_recall(self) -> float:
+        return self.text_hits / self.text_expected if self.text_expected else 0.0
+
+
+def _key(item: Dict[str, Any]) -> Tuple[str, float]:
+    return item["name"], round(float(item["value"]), 2)
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[Document]:
+    return [(spec.name, *generate_document(spec)) for spec in corpus_specs(count, seed)]
+
+
+def load_golden(path: Path = GOLDEN_PATH) -> List[Dict[str, Any]]:
+    return json.loads(path.read_text())
+
+
+def golden_corpus(path: Path = GOLDEN_PATH) -> List[Document]:
+    """Documents regenerated from the golden specs, paired with the recorded expectations."""
+    documents = []
+    for entry in load_golden(path):
+        spec = DocumentSpec(**entry["spec"])
+        data, _ = generate_document(spec)
+        documents.append((spec.name, data, entry["expected"]))
+    return documents
+
+
+def _timed(report: BenchmarkReport, stage: str, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    report.stage_seconds[stage] = (
+        report.stage_seconds.get(stage, 0.0) + time.perf_counter() - started
+    )
+    return result
+
+
+def _upload(name: str, data: bytes) -> SimpleUploadedFile:
+    return SimpleUploadedFile(f"{name}.pdf", data, content_type="application/pdf")
+
+
+def _numbers(text: str) -> set:
+    return {round(float(match.replace(",", ".")), 2) for match in NUMBER_PATTERN.findall(text)}
+
+
+def _text_hits(text: str, expected: Dict[str, Any]) -> Tuple[int, int]:
+    """Expected values (and the lab name) found in ``text``, and how many there were."""
+    wanted = [_key(item)[1] for item in expected["analytes"]]
+    numbers = _numbers(text)
+    hits = sum(1 for value in wanted if value in numbers) + (expected["lab_name"] in text)
+    return hits, len(wanted) + 1
+
+
+def _peak_memory(func, *args) -> int:
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare_text_backends(
+    documents: List[Document], repeat: int = 1, memory: bool = True
+) -> Dict[str, BackendResult]:
+    """Run ``_extract_text`` with every installed text backend over the same documents."""
+    results = {}
+    for name, backend in TEXT_BACKENDS.items():
+        if not backend.available():
+            continue
+        result = BackendResult(documents=len(documents))
+        for iteration in range(repeat):
+            for _, data, expected in documents:
+                started = time.perf_counter()
+                text = pdf_parser._extract_text(io.BytesIO(data), name)
+                result.seconds += time.perf_counter() - started
+                if iteration == 0:
+                    hits, wanted = _text_hits(text, expected)
+                    result.text_hits += hits
+                    result.text_expected += wanted
+        result.seconds /= repeat
+        if memory:
+            for _, data, _ in documents:
+                peak = _peak_memory(pdf_parser._extract_text, io.BytesIO(data), name)
+                result.peak_memory_bytes = max(result.peak_memory_bytes, peak)
+        results[name] = result
+    return results
+
+
+def run_benchmark(
+    documents: List[Document],
+    repeat: int = 1,
+    templates: bool = False,
+    memory: bool = True,
+    backends: Optional[Dict[str, str]] = None,
+) -> BenchmarkReport:
+    """Time each parser stage over ``documents`` and score what it extracted.
+
+    The LLM parser is disabled, so the numbers cover the deterministic path only. Stage times
+    are summed over ``repeat`` passes and divided back to one pass; accuracy comes from the
+    first pass. ``templates`` lets ``parse_pdf`` learn and reuse ``ParserTemplate`` rows
+    (which writes to the database). ``backends`` picks the extraction backend per stage for
+    the ``extract_text`` stage; ``parse_pdf`` always uses the ``PDF_BACKENDS`` setting.
+    """
+    report = BenchmarkReport(documents=len(documents))
+    for name in ("tables", "regex", "parse_pdf"):
+        report.scores[name] = Scores()
+    routing = {**getattr(settings, "PARSER_ROUTING", {}), "TEMPLATES_ENABLED": templates}
+    with override_settings(OPENAI_API_KEY="", PARSER_ROUTING=routing):
+        for iteration in range(repeat):
+            first = iteration == 0
+            for name, data, expected in documents:
+                text, tables = _timed(
+                    report, "extract_text", pdf_parser._extract_document, io.BytesIO(data), backends
+                )
+                report_date = _timed(report, "report_date", pdf_parser._parse_report_date, text)
+                regex = _timed(
+                    report,
+                    "regex_analytes",
+                    pdf_parser._extract_analytes_from_text,
+                    text,
+                    timezone.now(),
+                )
+                table = _timed(
+                    report,
+                    "table_analytes",
+                    extract_table_analytes,
+                    tables,
+                    pdf_parser.DEFAULT_ANALYTES,
+                )
+                parsed = _timed(report, "parse_pdf", pdf_parser.parse_pdf, _upload(name, data))
+                if not first:
+                    continue
+                hits, wanted = _text_hits(text, expected)
+                report.text_hits += hits
+                report.text_expected += wanted
+                if report_date and report_date.date().isoformat() == expected["report_date"]:
+                    report.dates_correct += 1
+                report.scores["regex"].add(expected["analytes"], regex)
+                report.scores["tables"].add(expected["analytes"], table.analytes)
+                report.scores["parse_pdf"].add(expected["analytes"], parsed["analytes"])
+                report.parsers[parsed["parser"]] += 1
+        if memory:
+            for name, data, _ in documents:
+                peak = _peak_memory(pdf_parser.parse_pdf, _upload(name, data))
+                report.peak_memory_bytes = max(report.peak_memory_bytes, peak)
+    report.stage_seconds = {
+        stage: seconds / repeat for stage, seconds in report.stage_seconds.items()
+    }
+    return report
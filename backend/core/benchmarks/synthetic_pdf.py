@@ -0,0 +1,226 @@
+"""Synthetic lab-report PDFs with known contents, for parser accuracy and speed checks.
+
+The PDFs are written directly (one Helvetica font, WinAnsi text, optional table rulings), so
+no PDF library is needed to build the corpus.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Sequence, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LAYOUTS = ("ruled_table", "aligned_columns", "inline")
+LANGUAGES = ("en", "es")
+
+# name -> (English label, Spanish label, unit, ref_min, ref_max, typical value)
+ANALYTES = {
+    "glucose": ("Glucose", "Glucosa", "mg/dL", 70, 100, 92),
+    "cholesterol_total": ("Total Cholesterol", "Colesterol total", "mg/dL", 125, 200, 180),
+    "hdl": ("HDL Cholesterol", "Colesterol HDL", "mg/dL", 40, 60, 52),
+    "ldl": ("LDL Cholesterol", "Colesterol LDL", "mg/dL", 0, 130, 110),
+    "triglycerides": ("Triglycerides", "Triglicéridos", "mg/dL", 0, 150, 120),
+    "hemoglobin": ("Hemoglobin", "Hemoglobina", "g/dL", 12, 17.5, 14.2),
+}
+LABELS = {
+    "en": {
+        "report_date": "Report Date",
+        "birth": "Date of birth",
+        "patient": "Patient",
+        "header": ("Test", "Result", "Units", "Reference range"),
+        "note": "Results should be interpreted by a physician together with clinical findings.",
+    },
+    "es": {
+        "report_date": "Fecha de reporte",
+        "birth": "Fecha de nacimiento",
+        "patient": "Paciente",
+        "header": ("Análisis", "Resultado", "Unidades", "Valores de referencia"),
+        "note": "Los resultados deben ser interpretados por un médico junto con la clínica.",
+    },
+}
+LABS = ("Laboratorio Central", "Nano Labs Diagnostics", "Clinical Lab Norte", "Lab Salud Integral")
+PATIENTS = ("Ana Torres", "John Smith", "María López", "Wei Chen", "Lucía Fernández")
+
+TextItem = Tuple[float, float, str]
+Rule = Tuple[float, float, float, float]
+
+
+@dataclass
+class DocumentSpec:
+    seed: int
+    layout: str = "ruled_table"
+    language: str = "en"
+    pages: int = 1
+
+    @property
+    def name(self) -> str:
+        return f"{self.layout}-{self.language}-{self.pages}p-{self.seed}"
+
+
+def _escape(text: str) -> bytes:
+    encoded = text.encode("cp1252", errors="replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def render_pdf(pages: Sequence[Tuple[Sequence[TextItem], Sequence[Rule]]]) -> bytes:
+    """A minimal PDF: each page is text items ``(x, y, text)`` plus line segments."""
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for items, rules in pages:
+        stream = b"0.5 w\n"
+        for x0, y0, x1, y1 in rules:
+            stream += b"%.1f %.1f m %.1f %.1f l S\n" % (x0, y0, x1, y1)
+        for x, y, text in items:
+            stream += b"BT /F1 9 Tf %.1f %.1f Td (%s) Tj ET\n" % (x, y, _escape(text))
+        objects.append(b"<< /Length %d >>\nstream\n%sendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def _format_date(value: date, language: str, rng: random.Random) -> str:
+    if language == "es":
+        return value.strftime(rng.choice(["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y"]))
+    return value.strftime(rng.choice(["%Y-%m-%d", "%m/%d/%Y"]))
+
+
+def _format_number(value: float, language: str) -> str:
+    text = f"{value:g}"
+    return text.replace(".", ",") if language == "es" else text
+
+
+def _results(rng: random.Random) -> List[Dict[str, Any]]:
+    names = rng.sample(sorted(ANALYTES), rng.randint(3, len(ANALYTES)))
+    results = []
+    for name in names:
+        _, _, unit, ref_min, ref_max, typical = ANALYTES[name]
+        value = round(typical * rng.uniform(0.7, 1.3), 1 if typical < 20 else 0)
+        results.append(
+            {"name": name, "value": value, "unit": unit, "ref_min": ref_min, "ref_max": ref_max}
+        )
+    return results
+
+
+def _table_page(
+    spec: DocumentSpec, results: List[Dict[str, Any]], top: float, ruled: bool
+) -> Tuple[List[TextItem], List[Rule]]:
+    labels = LABELS[spec.language]
+    columns = (60, 250, 340, 430)
+    items: List[TextItem] = []
+    rules: List[Rule] = []
+    rows = [labels["header"]] + [
+        (
+            ANALYTES[r["name"]][0 if spec.language == "en" else 1],
+            _format_number(r["value"], spec.language),
+            r["unit"],
+            f"{_format_number(r['ref_min'], spec.language)} - "
+            f"{_format_number(r['ref_max'], spec.language)}",
+        )
+        for r in results
+    ]
+    for index, row in enumerate(rows):
+        y = top - index * 20
+        items.extend((x + 4, y + 6, cell) for x, cell in zip(columns, row))
+    if ruled:
+        bottom = top - len(rows) * 20 + 20
+        for index in range(len(rows) + 1):
+            y = top + 20 - index * 20
+            rules.append((60, y, 552, y))
+        rules.extend((x, bottom, x, top + 20) for x in (*columns, 552))
+    return items, rules
+
+
+def _inline_page(spec: DocumentSpec, results: List[Dict[str, Any]], top: float) -> List[TextItem]:
+    items = []
+    for index, r in enumerate(results):
+        label = ANALYTES[r["name"]][0 if spec.language == "en" else 1]
+        value = f"{r['value']:g}"
+        items.append(
+            (60, top - index * 16, f"{label} {value} {r['unit']} {r['ref_min']:g}-{r['ref_max']:g}")
+        )
+    return items
+
+
+def generate_document(spec: DocumentSpec) -> Tuple[bytes, Dict[str, Any]]:
+    """The PDF for ``spec`` and the values a parser should read from it.
+
+    Documents are deterministic per spec. Every page repeats the lab header; results go on
+    the first page and later pages only carry notes.
+    """
+    rng = random.Random(f"{spec.seed}-{spec.layout}-{spec.language}")
+    labels = LABELS[spec.language]
+    lab = rng.choice(LABS)
+    report_date = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+    birth_date = date(1950, 1, 1) + timedelta(days=rng.randint(0, 15000))
+    results = _results(rng)
+    pages = []
+    for page in range(spec.pages):
+        items: List[TextItem] = [(60, 740, lab)]
+        rules: List[Rule] = []
+        if page == 0:
+            items += [
+                (60, 716, f"{labels['patient']}: {rng.choice(PATIENTS)}"),
+                (60, 702, f"{labels['birth']}: {_format_date(birth_date, spec.language, rng)}"),
+                (
+                    60,
+                    688,
+                    f"{labels['report_date']}: {_format_date(report_date, spec.language, rng)}",
+                ),
+            ]
+            if spec.layout == "inline":
+                items += _inline_page(spec, results, 650)
+            else:
+                table_items, rules = _table_page(
+                    spec, results, 640, ruled=spec.layout == "ruled_table"
+                )
+                items += table_items
+        else:
+            items += [(60, 700 - line * 14, labels["note"]) for line in range(10)]
+        items.append((500, 40, f"{page + 1}/{spec.pages}"))
+        pages.append((items, rules))
+    expected = {
+        "lab_name": lab,
+        "report_date": report_date.isoformat(),
+        "analytes": results,
+    }
+    return render_pdf(pages), expected
+
+
+def corpus_specs(count: int, seed: int = 0) -> List[DocumentSpec]:
+    """``count`` specs cycling through every layout and language with 1-3 pages."""
+    combos = [(layout, language) for layout in LAYOUTS for language in LANGUAGES]
+    return [
+        DocumentSpec(
+            seed=seed + index,
+            layout=combos[index % len(combos)][0],
+            language=combos[index % len(combos)][1],
+            pages=1 + (index // len(combos)) % 3,
+        )
+        for index in range(count)
+    ]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_current: ContextVar[Optional["RequestMetrics"]] = ContextVar("request_metrics", default=None)
+_serializer_depth: ContextVar[int] = ContextVar("serializer_depth", default=0)
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Collapse a SQL statement into a shape shared by all executions of the same query."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_time: float = 0.0
+    stages: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    fingerprints: Dict[str, List[float]] = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record_query(self, sql: str, duration: float) -> None:
+        self.queries += 1
+        self.db_time += duration
+        entry = self.fingerprints.setdefault(fingerprint(sql), [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+
+    def top_fingerprints(self, limit: int = 5) -> List[Tuple[str, int, float]]:
+        ranked = sorted(self.fingerprints.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, int(count), total) for sql, (count, total) in ranked[:limit]]
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"']
+        for stage, seconds in sorted(self.stages.items()):
+            parts.append(f"{stage};dur={seconds * 1000:.1f}")
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def start_request() -> Tuple[RequestMetrics, object]:
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the wall time of the block to ``stage`` on the current request, if any."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.stages[stage] += time.perf_counter() - started
+
+
+def track_queries(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_tracking(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver attaching the query tracker to new connections."""
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_queries)
+
+
+class InstrumentedSerializerMixin:
+    """Accumulate top-level ``to_representation`` time under the ``serialize`` stage.
+
+    Nested serializers run inside their parent's call, so only the outermost one is timed.
+    """
+
+    def to_representation(self, instance):
+        depth = _serializer_depth.get()
+        if depth or _current.get() is None:
+            token = _serializer_depth.set(depth + 1)
+            try:
+                return super().to_representation(instance)
+            finally:
+                _serializer_depth.reset(token)
+        token = _serializer_depth.set(1)
+        try:
+            with timed("serialize"):
+                return super().to_representation(instance)
+        finally:
+            _serializer_depth.reset(token)
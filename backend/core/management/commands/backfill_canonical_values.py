@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from core.models import ResultValue
+from core.services.rollups import refresh_rollups
+from core.services.units import conversion_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills ResultValue.canonical_value/canonical_unit from the unit registry with set-based "
+        "UPDATEs, one id range at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50000, help="Rows per UPDATE")
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row, not only rows without a canonical unit "
+            "(use after changing the registry)",
+        )
+
+    def handle(self, *args, **options):
+        queryset = ResultValue.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(canonical_unit="")
+        pairs = queryset.values_list("analyte_id", "analyte__name", "analyte__unit", "unit")
+        conversions = []
+        for analyte_id, name, analyte_unit, unit in pairs.distinct():
+            factor, canonical_unit = conversion_for(name, unit, analyte_unit)
+            conversions.append((analyte_id, unit, factor, canonical_unit))
+        if not conversions:
+            self.stdout.write(self.style.SUCCESS("Nothing to backfill."))
+            return
+
+        bounds = queryset.aggregate(low=Min("id"), high=Max("id"))
+        table = ResultValue._meta.db_table
+        values_sql = ", ".join(["(%s, %s, %s::double precision, %s)"] * len(conversions))
+        params = [item for conversion in conversions for item in conversion]
+        only_missing = "" if options["all"] else "AND rv.canonical_unit = ''"
+        sql = f"""
+            UPDATE {table} AS rv
+            SET canonical_value = round((rv.value::double precision * c.factor)::numeric, 6),
+                canonical_unit = c.canonical_unit
+            FROM (VALUES {values_sql}) AS c (analyte_id, unit, factor, canonical_unit)
+            WHERE rv.analyte_id = c.analyte_id AND rv.unit = c.unit
+              AND rv.id BETWEEN %s AND %s {only_missing}
+        """
+        started = time.monotonic()
+        updated = 0
+        batch_size = options["batch_size"]
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [*params, start, start + batch_size - 1])
+                updated += cursor.rowcount
+            self.stdout.write(f"{updated} rows updated (ids up to {start + batch_size - 1})")
+        unconvertible = sum(1 for conversion in conversions if conversion[2] is None)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfilled {updated} results across {len(conversions)} analyte/unit pairs in "
+                f"{time.monotonic() - started:.1f}s ({unconvertible} pairs not convertible)."
+            )
+        )
+        self.stdout.write(f"Refreshed {refresh_rollups()} analyte rollup rows.")
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.services.search import report_ids_page, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills Report.search_vector for reports that have none (or every report with --all), "
+        "one batch of report ids per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Reports per UPDATE")
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild every vector (use after changing what is indexed)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = 0
+        last = None
+        while True:
+            ids = report_ids_page(
+                after=last, limit=options["batch_size"], missing_only=not options["all"]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += update_search_vectors(ids)
+            last = ids[-1]
+            self.stdout.write(f"{updated} reports indexed")
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {updated} reports in {time.monotonic() - started:.1f}s.")
+        )
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.harness import (
+    compare_text_backends,
+    golden_corpus,
+    run_benchmark,
+    synthetic_corpus,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures parse_pdf throughput, per-stage time, peak memory and extraction "
+        "precision/recall on synthetic lab PDFs (the LLM parser is disabled)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--golden",
+            action="store_true",
+            help="Use the golden corpus (core/benchmarks/golden.json) instead of new documents",
+        )
+        parser.add_argument("--documents", type=int, default=60, help="Synthetic documents")
+        parser.add_argument("--seed", type=int, default=0, help="First synthetic document seed")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the corpus")
+        parser.add_argument(
+            "--templates",
+            action="store_true",
+            help="Let parse_pdf learn and reuse layout templates (writes ParserTemplate rows)",
+        )
+        parser.add_argument(
+            "--text-backend", help="Text backend for the extract_text stage (default: setting)"
+        )
+        parser.add_argument(
+            "--table-backend", help="Table backend for the extract_text stage (default: setting)"
+        )
+        parser.add_argument(
+            "--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass"
+        )
+
+    def handle(self, *args, **options):
+        if options["documents"] < 1 or options["repeat"] < 1:
+            raise CommandError("--documents and --repeat must be positive.")
+        if options["golden"]:
+            documents = golden_corpus()
+        else:
+            documents = synthetic_corpus(options["documents"], options["seed"])
+        report = run_benchmark(
+            documents,
+            repeat=options["repeat"],
+            templates=options["templates"],
+            memory=not options["no_memory"],
+            backends={
+                stage: options[option]
+                for stage, option in (("text", "text_backend"), ("tables", "table_backend"))
+                if options[option]
+            },
+        )
+        backends = compare_text_backends(
+            documents, repeat=options["repeat"], memory=not options["no_memory"]
+        )
+
+        self.stdout.write(f"{'stage':<16}{'total ms':>12}{'ms/doc':>10}")
+        for stage, seconds in report.stage_seconds.items():
+            per_doc = seconds * 1000 / report.documents
+            self.stdout.write(f"{stage:<16}{seconds * 1000:>12.1f}{per_doc:>10.2f}")
+        self.stdout.write("")
+        self.stdout.write(f"{'extractor':<16}{'precision':>12}{'recall':>10}")
+        for name, scores in report.scores.items():
+            self.stdout.write(f"{name:<16}{scores.precision:>12.3f}{scores.recall:>10.3f}")
+        self.stdout.write("")
+        self.stdout.write(f"{'text backend':<16}{'ms/doc':>12}{'peak MiB':>10}{'recall':>10}")
+        for name, result in backends.items():
+            self.stdout.write(
+                f"{name:<16}{result.ms_per_doc:>12.2f}"
+                f"{result.peak_memory_bytes / 2**20:>10.1f}{result.text_recall:>10.3f}"
+            )
+        self.stdout.write("")
+        self.stdout.write(f"Text recall (values and lab name): {report.text_recall:.3f}")
+        self.stdout.write(f"Report date accuracy: {report.date_accuracy:.3f}")
+        paths = ", ".join(f"{path}={count}" for path, count in sorted(report.parsers.items()))
+        self.stdout.write(f"Parser paths: {paths}")
+        if report.peak_memory_bytes:
+            self.stdout.write(
+                f"Peak traced memory per document: {report.peak_memory_bytes / 2**20:.1f} MiB"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report.documents} documents, "
+                f"{report.docs_per_second:.1f} docs/s through parse_pdf"
+            )
+        )
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from utils.renderers import ORJSONRenderer, orjson
+
+from core.models import Report, ResultValue
+from core.serializers import ReportSerializer
+
+
+def _synthetic_report(index: int, results: int) -> dict:
+    issued_at = timezone.now() - timedelta(days=index)
+    return {
+        "id": str(uuid.uuid4()),
+        "patient": {"id": str(uuid.uuid4()), "name": f"Patient {index}", "sex": "F"},
+        "org_name": "Nano Labs",
+        "issued_at": issued_at.isoformat(),
+        "raw_json": {"filename": f"report-{index}.pdf", "sha256": "0" * 64},
+        "parsed_fields": {"lab_name": "Nano Labs", "analytes": [{"name": "glucose"}] * results},
+        "insights": {"summary": "Stable results.", "recommendations": ["Keep it up."] * 3},
+        "results": [
+            {
+                "id": index * results + n,
+                "analyte_name": f"analyte_{n}",
+                "value": "95.0000",
+                "unit": "mg/dL",
+                "ref_min": "70.0000",
+                "ref_max": "100.0000",
+                "flag": "normal",
+                "measured_at": issued_at.isoformat(),
+                "canonical_value": 95.0,
+                "canonical_unit": "mg/dL",
+            }
+            for n in range(results)
+        ],
+    }
+
+
+def _trends_payload(rows) -> dict:
+    series = {}
+    for name, value, unit, ref_min, ref_max, flag, measured_at, report_id in rows:
+        entry = series.setdefault(name, {"key": name, "label": name, "unit": unit, "points": []})
+        entry["points"].append(
+            {
+                "value": value,
+                "unit": unit,
+                "ref_min": float(ref_min),
+                "ref_max": float(ref_max),
+                "flag": flag,
+                "measured_at": measured_at.isoformat(),
+                "report_id": str(report_id),
+            }
+        )
+    return {"analytes": list(series.values())}
+
+
+class Command(BaseCommand):
+    help = "Compares render time and payload size of DRF's JSON renderer and the orjson one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reports", type=int, default=50, help="Reports per payload")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Use generated payloads instead of reports stored in the database",
+        )
+
+    def _payloads(self, options):
+        count = options["reports"]
+        reports = None
+        if not options["synthetic"]:
+            queryset = Report.objects.select_related("patient", "patient__user").prefetch_related(
+                "results", "results__analyte"
+            )[:count]
+            reports = ReportSerializer(queryset, many=True).data
+        if not reports:
+            reports = [_synthetic_report(index, 12) for index in range(count)]
+            now = timezone.now()
+            rows = [
+                ("glucose", 90.0 + n % 20, "mg/dL", 70, 100, "normal", now, uuid.uuid4())
+                for n in range(count * 20)
+            ]
+        else:
+            rows = ResultValue.objects.filter(canonical_value__isnull=False).values_list(
+                "analyte__name",
+                "canonical_value",
+                "canonical_unit",
+                "ref_min",
+                "ref_max",
+                "flag",
+                "measured_at",
+                "report_id",
+            )[: count * 20]
+        return {
+            "report-list": {"count": len(reports), "results": list(reports)},
+            "report-detail": reports[0],
+            "report-trends": _trends_payload(rows),
+        }
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed.")
+        payloads = self._payloads(options)
+        renderers = {"drf-json": JSONRenderer(), "orjson": ORJSONRenderer()}
+        self.stdout.write(f"{'payload':<16}{'renderer':<10}{'ms/render':>12}{'bytes':>12}")
+        for name, payload in payloads.items():
+            timings = {}
+            for label, renderer in renderers.items():
+                renderer.render(payload)
+                started = time.perf_counter()
+                for _ in range(options["iterations"]):
+                    body = renderer.render(payload)
+                elapsed = (time.perf_counter() - started) * 1000 / options["iterations"]
+                timings[label] = elapsed
+                self.stdout.write(f"{name:<16}{label:<10}{elapsed:>12.3f}{len(body):>12}")
+            speedup = timings["drf-json"] / max(timings["orjson"], 1e-9)
+            self.stdout.write(self.style.SUCCESS(f"{name:<16}orjson is {speedup:.1f}x faster"))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.lab_import import (
+    FORMATS,
+    READERS,
+    LabResultImporter,
+    detect_format,
+    open_source,
+)
+from core.services.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-loads partner lab exports (CSV, NDJSON or HL7 ORU) into reports and results "
+        "using PostgreSQL COPY, with resumable checkpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Export file (optionally .gz compressed)")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Results per COPY chunk")
+        parser.add_argument("--lab-name", default="", help="Lab name when records omit one")
+        parser.add_argument(
+            "--create-patients",
+            action="store_true",
+            help="Create patients matched by name and birth date when they do not exist",
+        )
+        parser.add_argument(
+            "--checkpoint", help="Checkpoint file (defaults to <path>.checkpoint.json)"
+        )
+        parser.add_argument(
+            "--resume", action="store_true", help="Skip records committed by a previous run"
+        )
+        parser.add_argument("--rejects", help="Write rejected records as NDJSON to this file")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        file_format = options["format"] or detect_format(path)
+        checkpoint = Path(options["checkpoint"] or f"{path}.checkpoint.json")
+
+        skip = 0
+        if options["resume"] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            if state.get("complete"):
+                self.stdout.write(self.style.WARNING(f"{path} was already imported completely."))
+                return
+            skip = state.get("position", 0)
+            self.stdout.write(f"Resuming after {skip} records.")
+
+        rejects = open(options["rejects"], "a", encoding="utf-8") if options["rejects"] else None
+        importer = LabResultImporter(
+            source_name=path.name,
+            chunk_size=options["chunk_size"],
+            create_patients=options["create_patients"],
+            default_lab_name=options["lab_name"],
+            rejects=rejects,
+        )
+        started = time.monotonic()
+
+        def on_chunk(position, stats):
+            checkpoint.write_text(json.dumps({"position": position, "complete": False}))
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"{position} records read, {stats.results} results in {stats.reports} reports "
+                f"({stats.results / elapsed:,.0f} results/s)"
+            )
+
+        try:
+            with open_source(path) as handle:
+                stats = importer.run(READERS[file_format](handle), skip=skip, on_chunk=on_chunk)
+        finally:
+            if rejects:
+                rejects.close()
+
+        state = json.loads(checkpoint.read_text()) if checkpoint.exists() else {}
+        state["complete"] = True
+        checkpoint.write_text(json.dumps(state))
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {stats.results} results into {stats.reports} reports in {elapsed:.1f}s "
+                f"({stats.results / elapsed * 3600:,.0f} results/hour); "
+                f"{stats.rejected} rejected, {stats.skipped_reports} reports already present."
+            )
+        )
+        if stats.rejections:
+            self.stdout.write(f"Rejections: {json.dumps(stats.rejections, sort_keys=True)}")
+        if stats.results:
+            self.stdout.write(f"Refreshed {refresh_rollups()} analyte rollup rows.")
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Analyte
+from core.services.rollups import refresh_rollups, refresh_stale_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the population analytics rollups (all analytes, or the ones given)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("analytes", nargs="*", help="Analyte names to refresh")
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Only refresh analytes with results written since their last refresh",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            if options["analytes"]:
+                raise CommandError("--stale refreshes the flagged analytes; omit analyte names.")
+            started = time.monotonic()
+            analytes, rows = refresh_stale_rollups()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Refreshed {rows} rollup rows for {analytes} stale analytes in "
+                    f"{time.monotonic() - started:.2f}s."
+                )
+            )
+            return
+        analyte_ids = None
+        if options["analytes"]:
+            found = dict(
+                Analyte.objects.filter(name__in=options["analytes"]).values_list("name", "id")
+            )
+            missing = sorted(set(options["analytes"]) - set(found))
+            if missing:
+                raise CommandError(f"Unknown analytes: {', '.join(missing)}")
+            analyte_ids = list(found.values())
+        started = time.monotonic()
+        rows = refresh_rollups(analyte_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {rows} rollup rows in {time.monotonic() - started:.2f}s."
+            )
+        )
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.services.ai_insights import INSIGHTS_PROMPT_VERSION
+from core.services.insights_regeneration import aregenerate_insights, select_reports
+from core.services.llm import track_usage
+
+# Options that select the reports; a checkpoint can only be resumed with the same values.
+FILTER_OPTIONS = ("all", "prompt_versions", "since", "until", "patients")
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenerates stored report insights (by default every report whose prompt version is "
+        f"not {INSIGHTS_PROMPT_VERSION}) with bounded concurrency and resumable checkpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Include reports already on the current version"
+        )
+        parser.add_argument(
+            "--prompt-version",
+            action="append",
+            dest="prompt_versions",
+            help="Only reports generated with this version ('' for never versioned); repeatable",
+        )
+        parser.add_argument("--since", help="Only reports issued on or after YYYY-MM-DD")
+        parser.add_argument("--until", help="Only reports issued before YYYY-MM-DD")
+        parser.add_argument(
+            "--patient", action="append", dest="patients", help="Patient id; repeatable"
+        )
+        parser.add_argument("--concurrency", type=int, default=4, help="Parallel model calls")
+        parser.add_argument("--batch-size", type=int, default=50, help="Reports per bulk_update")
+        parser.add_argument("--limit", type=int, help="Stop after this many reports")
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=4,
+            help="Tries per report while the model is rate limited or unavailable",
+        )
+        parser.add_argument(
+            "--backoff", type=float, default=1.0, help="Initial retry delay in seconds"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default="regenerate_insights.checkpoint.json",
+            help="File recording where to resume: before the first skipped report, if any",
+        )
+        parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the reports that would be updated"
+        )
+
+    def _date(self, value, name):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f"--{name} must be YYYY-MM-DD.")
+        return parsed
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--concurrency and --batch-size must be positive.")
+        queryset = select_reports(
+            outdated_only=not options["all"],
+            prompt_versions=options["prompt_versions"],
+            since=self._date(options["since"], "since"),
+            until=self._date(options["until"], "until"),
+            patient_ids=options["patients"],
+        )
+        filters = {name: options[name] for name in FILTER_OPTIONS}
+        checkpoint = Path(options["checkpoint"])
+        position = None
+        if options["resume"] and checkpoint.exists():
+            saved = json.loads(checkpoint.read_text())
+            if saved.get("filters") != filters:
+                raise CommandError(
+                    f"{checkpoint} was written with different filters ({saved.get('filters')}); "
+                    "repeat them or start a new run without --resume."
+                )
+            if saved["position"]:
+                position = tuple(saved["position"])
+                self.stdout.write(f"Resuming after report {position[1]}.")
+        if options["dry_run"]:
+            self.stdout.write(f"{queryset.count()} reports would be regenerated.")
+            return
+
+        def on_page(page_position, stats):
+            checkpoint.write_text(json.dumps({"position": page_position, "filters": filters}))
+            self.stdout.write(
+                f"{stats.processed} processed, {stats.updated} updated, {stats.failed} skipped "
+                f"({stats.rate:.2f} reports/s)"
+            )
+
+        with track_usage() as usage:
+            stats = async_to_sync(aregenerate_insights)(
+                queryset,
+                batch_size=max(options["batch_size"], options["concurrency"]),
+                concurrency=options["concurrency"],
+                position=position,
+                limit=options["limit"],
+                on_page=on_page,
+                attempts=max(options["attempts"], 1),
+                backoff=options["backoff"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Regenerated {stats.updated} of {stats.processed} reports in {stats.elapsed:.1f}s "
+                f"({stats.rate:.2f} reports/s); {stats.failed} skipped after retries. "
+                f"Sources: {json.dumps(stats.sources, sort_keys=True)}. "
+                f"Model calls: {usage.calls}, tokens: {usage.prompt_tokens} prompt + "
+                f"{usage.completion_tokens} completion = {usage.total_tokens}."
+            )
+        )
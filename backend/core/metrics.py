@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+INGESTION_STAGE_SECONDS = Histogram(
+    "nanolabs_ingestion_stage_seconds",
+    "Latency of each stage of the report ingestion pipeline.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+PARSER_PATH_TOTAL = Counter(
+    "nanolabs_parser_path_total",
+    "Parsed documents by the parser path that produced their analytes.",
+    ["path"],
+)
+PARSED_ANALYTES = Histogram(
+    "nanolabs_parsed_analytes",
+    "Number of analytes extracted per parsed document.",
+    ["path"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+INGESTION_FAILURES_TOTAL = Counter(
+    "nanolabs_ingestion_failures_total",
+    "Ingestion problems by stage and reason, including ones recovered by a fallback.",
+    ["stage", "reason"],
+)
+
+INSIGHTS_ROUTE_TOTAL = Counter(
+    "nanolabs_insights_route_total",
+    "Insight generations by route (llm or rules) and the routing rule that chose it.",
+    ["route", "reason"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Time the block into the stage histogram; exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        INGESTION_FAILURES_TOTAL.labels(stage=stage, reason=type(exc).__name__).inc()
+        raise
+    finally:
+        INGESTION_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def record_failure(stage: str, reason: str) -> None:
+    INGESTION_FAILURES_TOTAL.labels(stage=stage, reason=reason).inc()
+
+
+def record_parse(path: str, analyte_count: int) -> None:
+    PARSER_PATH_TOTAL.labels(path=path).inc()
+    PARSED_ANALYTES.labels(path=path).observe(analyte_count)
+
+
+def record_insights_route(route: str, reason: str) -> None:
+    INSIGHTS_ROUTE_TOTAL.labels(route=route, reason=reason).inc()
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Exposition payload; merges per-worker files when running under multi-process gunicorn."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
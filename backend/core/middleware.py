@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+from .instrumentation import finish_request, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint runs more SQL queries than its configured budget."""
+
+
+class RequestInstrumentationMiddleware:
+    """Per-request query count, DB time and stage timings.
+
+    Staff users get the numbers back as a ``Server-Timing`` header, slow requests are logged
+    with their most expensive query fingerprints, and ``QUERY_BUDGETS`` (keyed by URL name)
+    either log or, with ``ENFORCE_QUERY_BUDGETS``, raise so the test suite fails.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        self._finalize(request, response, metrics, self._is_staff(request))
+        return response
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        user = getattr(request, "user", None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            is_staff = await sync_to_async(self._is_staff)(request)
+        else:
+            is_staff = self._is_staff(request)
+        self._finalize(request, response, metrics, is_staff)
+        return response
+
+    @property
+    def config(self):
+        return getattr(settings, "REQUEST_INSTRUMENTATION", {})
+
+    @staticmethod
+    def _is_staff(request) -> bool:
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    def _finalize(self, request, response, metrics, is_staff: bool) -> None:
+        if is_staff and self.config.get("SERVER_TIMING", True):
+            response["Server-Timing"] = metrics.server_timing()
+
+        elapsed_ms = metrics.elapsed * 1000
+        slow_ms = self.config.get("SLOW_REQUEST_MS")
+        if slow_ms is not None and elapsed_ms >= slow_ms:
+            logger.warning(
+                "Slow request %s %s -> %s in %.0f ms (%d queries, %.0f ms DB): %s",
+                request.method,
+                request.path,
+                response.status_code,
+                elapsed_ms,
+                metrics.queries,
+                metrics.db_time * 1000,
+                "; ".join(
+                    f"{count}x {total * 1000:.1f} ms {sql[:200]}"
+                    for sql, count, total in metrics.top_fingerprints()
+                ),
+            )
+
+        match = getattr(request, "resolver_match", None)
+        budget = self.config.get("QUERY_BUDGETS", {}).get(match.url_name if match else None)
+        if budget is not None and metrics.queries > budget:
+            message = (
+                f"{request.method} {request.path} ran {metrics.queries} queries "
+                f"(budget {budget} for '{match.url_name}')"
+            )
+            if self.config.get("ENFORCE_QUERY_BUDGETS"):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
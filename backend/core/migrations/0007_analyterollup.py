@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_report_pdf_file_alter_report_pdf_url"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyteRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("sex", models.CharField(blank=True, max_length=1)),
+                ("age_band", models.CharField(blank=True, max_length=10)),
+                ("result_count", models.PositiveIntegerField()),
+                ("patient_count", models.PositiveIntegerField()),
+                ("high_count", models.PositiveIntegerField()),
+                ("low_count", models.PositiveIntegerField()),
+                ("mean", models.FloatField()),
+                ("p05", models.FloatField()),
+                ("p25", models.FloatField()),
+                ("p50", models.FloatField()),
+                ("p75", models.FloatField()),
+                ("p95", models.FloatField()),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "analyte",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="core.analyte",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["analyte__name", "sex", "age_band"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="analyterollup",
+            constraint=models.UniqueConstraint(
+                fields=("analyte", "sex", "age_band"), name="analyte_rollup_unique_group"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_analyterollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resultvalue",
+            name="canonical_unit",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="resultvalue",
+            name="canonical_value",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_resultvalue_canonical_value"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="report",
+            name="insights_prompt_version",
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
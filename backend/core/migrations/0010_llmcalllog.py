@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_report_insights_prompt_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LLMCallLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("stage", models.CharField(max_length=32)),
+                ("model", models.CharField(blank=True, max_length=64)),
+                ("prompt_version", models.CharField(blank=True, max_length=32)),
+                ("input_tokens", models.PositiveIntegerField(default=0)),
+                ("output_tokens", models.PositiveIntegerField(default=0)),
+                ("cached_tokens", models.PositiveIntegerField(default=0)),
+                ("latency_ms", models.FloatField(default=0)),
+                ("retries", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "outcome",
+                    models.CharField(
+                        choices=[
+                            ("success", "Success"),
+                            ("error", "Error"),
+                            ("unavailable", "Unavailable"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("error", models.CharField(blank=True, max_length=64)),
+                ("fallback_used", models.BooleanField(default=False)),
+                (
+                    "created_at",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:08
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Build the GIN index without locking writes on a large report table.
+    atomic = False
+
+    dependencies = [
+        ("core", "0010_llmcalllog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="report",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name="report",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="report_search_vector_gin"
+            ),
+        ),
+    ]
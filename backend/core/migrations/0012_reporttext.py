@@ -0,0 +1,89 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:11
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import Q
+from utils.compression import compress_text, decompress_text
+
+BATCH_SIZE = 500
+
+
+def _batches(queryset):
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page.order_by("pk")[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].pk
+
+
+def move_raw_text(apps, schema_editor):
+    """Compress ``raw_text`` into ReportText and drop both JSON copies, one batch at a time."""
+    Report = apps.get_model("core", "Report")
+    ReportText = apps.get_model("core", "ReportText")
+    pending = Report.objects.filter(
+        Q(raw_json__has_key="raw_text") | Q(parsed_fields__has_key="raw_text")
+    ).only("id", "raw_json", "parsed_fields")
+    for batch in _batches(pending):
+        texts = []
+        for report in batch:
+            text = report.raw_json.pop("raw_text", "") or ""
+            duplicate = report.parsed_fields.pop("raw_text", "") or ""
+            text = text or duplicate
+            if text:
+                codec, data = compress_text(text)
+                texts.append(
+                    ReportText(report_id=report.pk, codec=codec, data=data, length=len(text))
+                )
+        with transaction.atomic():
+            ReportText.objects.bulk_create(texts, ignore_conflicts=True)
+            Report.objects.bulk_update(batch, ["raw_json", "parsed_fields"])
+
+
+def restore_raw_text(apps, schema_editor):
+    Report = apps.get_model("core", "Report")
+    ReportText = apps.get_model("core", "ReportText")
+    for batch in _batches(ReportText.objects.all()):
+        reports = Report.objects.in_bulk([stored.report_id for stored in batch])
+        for stored in batch:
+            reports[stored.report_id].raw_json["raw_text"] = decompress_text(
+                stored.codec, stored.data
+            )
+        with transaction.atomic():
+            Report.objects.bulk_update(list(reports.values()), ["raw_json"])
+
+
+class Migration(migrations.Migration):
+    # The text is moved in batches, each in its own transaction.
+    atomic = False
+
+    dependencies = [
+        ("core", "0011_report_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportText",
+            fields=[
+                (
+                    "report",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="extracted_text",
+                        serialize=False,
+                        to="core.report",
+                    ),
+                ),
+                (
+                    "codec",
+                    models.CharField(choices=[("zlib", "zlib"), ("zstd", "zstd")], max_length=8),
+                ),
+                ("data", models.BinaryField()),
+                ("length", models.PositiveIntegerField(help_text="Characters before compression")),
+            ],
+        ),
+        migrations.RunPython(move_raw_text, restore_raw_text),
+    ]
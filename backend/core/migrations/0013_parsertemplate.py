@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_reporttext"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ParserTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("fingerprint", models.CharField(max_length=64, unique=True)),
+                ("lab_name", models.CharField(blank=True, max_length=255)),
+                ("layout", models.JSONField()),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("misses", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_used_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["lab_name"],
+            },
+        ),
+    ]
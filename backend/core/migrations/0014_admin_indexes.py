@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:32
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on the large result and alert tables.
+    atomic = False
+
+    dependencies = [
+        ("core", "0013_parsertemplate"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="alert",
+            index=models.Index(fields=["status", "-created_at"], name="alert_status_created"),
+        ),
+        AddIndexConcurrently(
+            model_name="report",
+            index=models.Index(fields=["-issued_at"], name="report_issued_at"),
+        ),
+        AddIndexConcurrently(
+            model_name="resultvalue",
+            index=models.Index(fields=["flag", "-id"], name="resultvalue_flag_id"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analyte",
+            name="rollups_stale",
+            field=models.BooleanField(default=False),
+        ),
+    ]
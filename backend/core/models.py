@@ -3,9 +3,14 @@ from __future__ import annotations
 import uuid
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from pathlib import Path
 
+from utils.compression import compress_text, decompress_text
+
 
 class User(AbstractUser):
     class Roles(models.TextChoices):
@@ -47,6 +52,12 @@ class Patient(models.Model):
         return self.name
 
 
+class ReportManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only read by Postgres; don't ship it with every report.
+        return super().get_queryset().defer("search_vector")
+
+
 class Report(models.Model):
     def report_upload_path(instance: "Report", filename: str) -> str:
         extension = Path(filename).suffix or ".pdf"
@@ -61,20 +72,62 @@ class Report(models.Model):
     raw_json = models.JSONField(default=dict, blank=True)
     parsed_fields = models.JSONField(default=dict, blank=True)
     insights = models.JSONField(default=dict, blank=True)
+    insights_prompt_version = models.CharField(max_length=32, blank=True, db_index=True)
     analysis_generated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Analyte names, lab name and report text; maintained by core.services.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ReportManager()
 
     class Meta:
         ordering = ["-issued_at"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="report_search_vector_gin"),
+            models.Index(fields=["-issued_at"], name="report_issued_at"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover
         return f"Report {self.id}"
 
 
+class ReportText(models.Model):
+    """Text extracted from a report's PDF, compressed and kept out of the ``Report`` row.
+
+    Report lists and details never need it; it is read by the ``/text/`` endpoint, search
+    indexing and search headlines.
+    """
+
+    class Codec(models.TextChoices):
+        ZLIB = "zlib", "zlib"
+        ZSTD = "zstd", "zstd"
+
+    report = models.OneToOneField(
+        Report, on_delete=models.CASCADE, primary_key=True, related_name="extracted_text"
+    )
+    codec = models.CharField(max_length=8, choices=Codec.choices)
+    data = models.BinaryField()
+    length = models.PositiveIntegerField(help_text="Characters before compression")
+
+    @classmethod
+    def build(cls, report_id, text: str, codec: str = Codec.ZLIB) -> "ReportText":
+        used, data = compress_text(text, codec)
+        return cls(report_id=report_id, codec=used, data=data, length=len(text))
+
+    @property
+    def text(self) -> str:
+        return decompress_text(self.codec, self.data)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"ReportText({self.report_id}, {self.length} chars)"
+
+
 class Analyte(models.Model):
     name = models.CharField(max_length=255, unique=True)
     unit = models.CharField(max_length=64)
     description = models.TextField(blank=True)
+    # New results since the last rollup refresh; see core.services.rollups.
+    rollups_stale = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["name"]
@@ -97,6 +150,9 @@ class ResultValue(models.Model):
     ref_max = models.DecimalField(max_digits=12, decimal_places=4)
     flag = models.CharField(max_length=20, choices=Flag.choices, default=Flag.NORMAL)
     measured_at = models.DateTimeField()
+    # ``value`` converted to the analyte's canonical unit; null when the unit is not convertible.
+    canonical_value = models.FloatField(null=True, blank=True)
+    canonical_unit = models.CharField(max_length=64, blank=True)
 
     class Meta:
         constraints = [
@@ -105,6 +161,8 @@ class ResultValue(models.Model):
                 name="ref_range_valid",
             )
         ]
+        # The admin changelist filters by flag, newest rows first.
+        indexes = [models.Index(fields=["flag", "-id"], name="resultvalue_flag_id")]
 
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.analyte.name} - {self.value}{self.unit}"
@@ -135,6 +193,7 @@ class Alert(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "-created_at"], name="alert_status_created")]
 
     def __str__(self) -> str:  # pragma: no cover
         return f"Alert {self.level} - {self.rule_key}"
@@ -150,3 +209,92 @@ class OnboardingProfile(models.Model):
 
     def __str__(self) -> str:  # pragma: no cover
         return f"OnboardingProfile({self.patient_id})"
+
+
+class AnalyteRollup(models.Model):
+    """Precomputed distribution of one analyte's results, overall and per sex / age band.
+
+    Rows with an empty ``sex`` or ``age_band`` aggregate across that dimension. The table is
+    rebuilt per analyte by ``core.services.rollups.refresh_rollups``.
+    """
+
+    analyte = models.ForeignKey(Analyte, on_delete=models.CASCADE, related_name="rollups")
+    sex = models.CharField(max_length=1, blank=True)
+    age_band = models.CharField(max_length=10, blank=True)
+    result_count = models.PositiveIntegerField()
+    patient_count = models.PositiveIntegerField()
+    high_count = models.PositiveIntegerField()
+    low_count = models.PositiveIntegerField()
+    mean = models.FloatField()
+    p05 = models.FloatField()
+    p25 = models.FloatField()
+    p50 = models.FloatField()
+    p75 = models.FloatField()
+    p95 = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["analyte__name", "sex", "age_band"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["analyte", "sex", "age_band"], name="analyte_rollup_unique_group"
+            )
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.analyte_id} {self.sex or '*'}/{self.age_band or '*'}"
+
+
+class LLMCallLog(models.Model):
+    """One request to the model provider, or one the LLM guard refused before sending it.
+
+    Rows are written in batches by ``core.services.llm_telemetry``; ``fallback_used`` marks
+    calls whose caller answered without the model (guard refusal or provider error).
+    """
+
+    class Outcome(models.TextChoices):
+        SUCCESS = "success", "Success"
+        ERROR = "error", "Error"
+        UNAVAILABLE = "unavailable", "Unavailable"
+
+    stage = models.CharField(max_length=32)
+    model = models.CharField(max_length=64, blank=True)
+    prompt_version = models.CharField(max_length=32, blank=True)
+    input_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.FloatField(default=0)
+    retries = models.PositiveSmallIntegerField(default=0)
+    outcome = models.CharField(max_length=16, choices=Outcome.choices)
+    error = models.CharField(max_length=64, blank=True)
+    fallback_used = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.stage} {self.outcome} {self.latency_ms:.0f}ms"
+
+
+class ParserTemplate(models.Model):
+    """Table layout learned from a confidently parsed PDF, keyed by its layout fingerprint.
+
+    Later PDFs with the same fingerprint (same lab, same table headers) are read with the
+    stored ``layout`` instead of detecting columns again; ``misses`` counts documents where it
+    no longer fit and the generic parser took over.
+    """
+
+    fingerprint = models.CharField(max_length=64, unique=True)
+    lab_name = models.CharField(max_length=255, blank=True)
+    layout = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["lab_name"]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.lab_name or 'Unknown lab'} ({self.fingerprint[:12]})"
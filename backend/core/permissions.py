@@ -2,26 +2,37 @@ from __future__ import annotations
 
 from rest_framework.permissions import BasePermission
 
-from .models import Patient, Report, ResultValue, Alert, User
+from .access import CLINICAL_ROLES, get_patient_access
+from .models import User
 
 
 class IsOwnerOrClinical(BasePermission):
     message = "You do not have permission to access this resource."
-    clinical_roles = {User.Roles.DOCTOR, User.Roles.LAB, User.Roles.ADMIN}
+    clinical_roles = CLINICAL_ROLES
 
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        if not user.is_authenticated:
+        if not request.user.is_authenticated:
             return False
-        if user.role in self.clinical_roles or user.is_staff:
-            return True
-        patient = None
-        if isinstance(obj, Patient):
-            patient = obj
-        elif isinstance(obj, Report):
-            patient = obj.patient
-        elif isinstance(obj, ResultValue):
-            patient = obj.report.patient
-        elif isinstance(obj, Alert):
-            patient = obj.patient or (obj.report.patient if obj.report else None)
-        return patient is not None and patient.user_id == user.id
+        return get_patient_access(request).can_access_object(obj)
+
+
+class HasRole(BasePermission):
+    """Allows staff and users whose ``role`` is in ``allowed_roles``."""
+
+    allowed_roles = frozenset()
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user.is_authenticated and (user.is_staff or user.role in self.allowed_roles)
+        )
+
+
+class IsLabRole(HasRole):
+    message = "Only lab accounts can submit structured results."
+    allowed_roles = {User.Roles.LAB, User.Roles.ADMIN}
+
+
+class IsClinicalRole(HasRole):
+    message = "Only medical staff can access population analytics."
+    allowed_roles = CLINICAL_ROLES
@@ -6,13 +6,23 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import serializers
 
-from .models import Alert, Analyte, OnboardingProfile, Patient, Report, ResultValue
+from .instrumentation import InstrumentedSerializerMixin
+from .models import (
+    Alert,
+    Analyte,
+    AnalyteRollup,
+    OnboardingProfile,
+    Patient,
+    Report,
+    ResultValue,
+)
+from .services.units import canonicalize, conversion_for
 from utils.validators import validate_reference_range
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "role"]
@@ -63,7 +73,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class OnboardingProfileSerializer(serializers.ModelSerializer):
+class OnboardingProfileSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = OnboardingProfile
         fields = ["profile", "medical_background", "lifestyle", "missing_answers", "updated_at"]
@@ -96,7 +106,7 @@ class OnboardingProfileSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     derived_age = serializers.SerializerMethodField()
     onboarding = OnboardingProfileSerializer(read_only=True)
@@ -136,13 +146,58 @@ class PatientSerializer(serializers.ModelSerializer):
         )
 
 
-class AnalyteSerializer(serializers.ModelSerializer):
+class AnalyteSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Analyte
         fields = ["id", "name", "unit", "description"]
 
 
-class ResultValueSerializer(serializers.ModelSerializer):
+class ReportSearchResultSerializer(serializers.ModelSerializer):
+    patient_name = serializers.CharField(source="patient.name", read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Report
+        fields = ["id", "patient", "patient_name", "org_name", "issued_at", "rank", "headline"]
+
+
+class AnalyteRollupSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    analyte = serializers.CharField(source="analyte.name", read_only=True)
+    unit = serializers.SerializerMethodField()
+    flagged_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AnalyteRollup
+        fields = [
+            "analyte",
+            "unit",
+            "sex",
+            "age_band",
+            "result_count",
+            "patient_count",
+            "high_count",
+            "low_count",
+            "flagged_rate",
+            "mean",
+            "p05",
+            "p25",
+            "p50",
+            "p75",
+            "p95",
+            "computed_at",
+        ]
+
+    def get_unit(self, obj):
+        return conversion_for(obj.analyte.name, obj.analyte.unit, obj.analyte.unit)[1]
+
+    def get_flagged_rate(self, obj):
+        if not obj.result_count:
+            return 0.0
+        return round((obj.high_count + obj.low_count) / obj.result_count, 4)
+
+
+class ResultValueSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     report_id = serializers.PrimaryKeyRelatedField(
         queryset=Report.objects.all(), source="report", write_only=True
     )
@@ -166,8 +221,10 @@ class ResultValueSerializer(serializers.ModelSerializer):
             "ref_max",
             "flag",
             "measured_at",
+            "canonical_value",
+            "canonical_unit",
         ]
-        read_only_fields = ["id", "report", "analyte"]
+        read_only_fields = ["id", "report", "analyte", "canonical_value", "canonical_unit"]
 
     def validate(self, attrs):
         ref_min = attrs.get("ref_min")
@@ -179,8 +236,28 @@ class ResultValueSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(str(exc)) from exc
         return attrs
 
+    def create(self, validated_data):
+        return super().create(self._with_canonical_value(validated_data))
+
+    def update(self, instance, validated_data):
+        # Partial updates that leave the measurement alone keep the stored canonical value.
+        if {"analyte", "value", "unit"} & validated_data.keys():
+            validated_data = self._with_canonical_value(validated_data, instance)
+        return super().update(instance, validated_data)
+
+    @staticmethod
+    def _with_canonical_value(data, instance=None):
+        def current(name):
+            return data[name] if name in data else getattr(instance, name)
+
+        analyte = current("analyte")
+        data["canonical_value"], data["canonical_unit"] = canonicalize(
+            analyte.name, current("unit"), current("value"), analyte.unit
+        )
+        return data
 
-class ReportSerializer(serializers.ModelSerializer):
+
+class ReportSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     patient_id = serializers.PrimaryKeyRelatedField(
         queryset=Patient.objects.all(), source="patient", write_only=True
@@ -240,7 +317,7 @@ class ReportSerializer(serializers.ModelSerializer):
         return request.build_absolute_uri(relative_url)
 
 
-class AlertSerializer(serializers.ModelSerializer):
+class AlertSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Alert
         fields = [
@@ -265,3 +342,19 @@ class ReportUploadSerializer(serializers.Serializer):
         if "pdf" not in content_type:
             raise serializers.ValidationError("Only PDF files are supported.")
         return value
+
+
+class ReportBatchUploadSerializer(serializers.Serializer):
+    files = serializers.ListField(child=serializers.FileField(), required=False)
+    archive = serializers.FileField(required=False)
+
+    def validate_archive(self, value):
+        content_type = (value.content_type or "").lower()
+        if "zip" not in content_type and not value.name.lower().endswith(".zip"):
+            raise serializers.ValidationError("Archives must be ZIP files.")
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get("files") and not attrs.get("archive"):
+            raise serializers.ValidationError("Provide PDF files or a ZIP archive.")
+        return attrs
@@ -2,13 +2,24 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from django.conf import settings
-from openai import OpenAI
 
+from core.instrumentation import timed
+from core.metrics import record_failure, record_insights_route
 from core.models import Report, ResultValue
 
+from .llm import (
+    DEFAULT_MODEL,
+    LLMUnavailable,
+    aguarded_call,
+    get_api_key,
+    get_async_client,
+    get_client,
+    guarded_call,
+)
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_INSIGHTS = {
@@ -54,50 +65,298 @@ def _format_key_result(payload: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _fallback_insights(report: Report) -> Dict[str, Any]:
-    results = [_result_to_payload(r) for r in report.results.all()]
+# Locally generated guidance for common single-analyte findings. Each entry is keyed by
+# analyte name and flag direction; findings without an entry are routed to the LLM.
+ANALYTE_GUIDANCE = {
+    "glucose": {
+        "label": "glucosa",
+        ResultValue.Flag.HIGH: {
+            "explanation": (
+                "La glucosa está por encima del rango de referencia. Un valor aislado puede "
+                "deberse a no haber estado en ayuno, pero conviene confirmarlo."
+            ),
+            "tests": [
+                (
+                    "Hemoglobina glucosilada (HbA1c)",
+                    "Muestra el promedio de glucosa de los últimos tres meses.",
+                )
+            ],
+            "actions": [
+                (
+                    "Reduce bebidas azucaradas y harinas refinadas",
+                    "Ayuda a mantener estable la glucosa.",
+                    "lifestyle",
+                )
+            ],
+        },
+        ResultValue.Flag.LOW: {
+            "explanation": (
+                "La glucosa está por debajo del rango de referencia; puede relacionarse con "
+                "ayunos prolongados o ejercicio intenso."
+            ),
+            "tests": [("Glucosa en ayuno repetida", "Confirma si el valor bajo se mantiene.")],
+            "actions": [
+                (
+                    "Evita ayunos prolongados y ten a mano un refrigerio",
+                    "Previene síntomas de glucosa baja.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+    "cholesterol_total": {
+        "label": "colesterol total",
+        ResultValue.Flag.HIGH: {
+            "explanation": (
+                "El colesterol total está elevado. Su importancia depende de cómo se reparte "
+                "entre HDL y LDL."
+            ),
+            "tests": [
+                (
+                    "Perfil de lípidos completo",
+                    "Separa el colesterol en HDL, LDL y triglicéridos.",
+                )
+            ],
+            "actions": [
+                (
+                    "Prefiere grasas insaturadas y aumenta la fibra",
+                    "Contribuye a bajar el colesterol.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+    "ldl": {
+        "label": "LDL",
+        ResultValue.Flag.HIGH: {
+            "explanation": (
+                "El colesterol LDL está elevado; es la fracción asociada a mayor riesgo "
+                "cardiovascular a largo plazo."
+            ),
+            "tests": [("Perfil de lípidos de control", "Permite seguir la tendencia del LDL.")],
+            "actions": [
+                (
+                    "Limita grasas saturadas y realiza actividad física regular",
+                    "Ambas medidas reducen el LDL.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+    "hdl": {
+        "label": "HDL",
+        ResultValue.Flag.LOW: {
+            "explanation": (
+                "El colesterol HDL está por debajo de lo esperado; es la fracción protectora."
+            ),
+            "tests": [],
+            "actions": [
+                (
+                    "Aumenta la actividad física aeróbica",
+                    "El ejercicio regular eleva el HDL.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+    "triglycerides": {
+        "label": "triglicéridos",
+        ResultValue.Flag.HIGH: {
+            "explanation": (
+                "Los triglicéridos están elevados; suelen responder a cambios en la "
+                "alimentación y el consumo de alcohol."
+            ),
+            "tests": [
+                (
+                    "Triglicéridos en ayuno de 12 horas",
+                    "Descarta que la elevación se deba a una comida reciente.",
+                )
+            ],
+            "actions": [
+                (
+                    "Reduce azúcares simples y alcohol",
+                    "Son los principales factores que elevan los triglicéridos.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+    "hemoglobin": {
+        "label": "hemoglobina",
+        ResultValue.Flag.LOW: {
+            "explanation": "La hemoglobina está baja, lo que puede indicar anemia leve.",
+            "tests": [
+                (
+                    "Biometría hemática y ferritina",
+                    "Ayudan a identificar la causa de la hemoglobina baja.",
+                )
+            ],
+            "actions": [
+                (
+                    "Incluye alimentos ricos en hierro",
+                    "El hierro es necesario para producir hemoglobina.",
+                    "lifestyle",
+                )
+            ],
+        },
+        ResultValue.Flag.HIGH: {
+            "explanation": (
+                "La hemoglobina está ligeramente elevada; la deshidratación es una causa "
+                "frecuente."
+            ),
+            "tests": [
+                ("Biometría hemática de control", "Confirma si el valor se mantiene elevado.")
+            ],
+            "actions": [
+                (
+                    "Mantén una hidratación adecuada",
+                    "La deshidratación concentra la sangre.",
+                    "lifestyle",
+                )
+            ],
+        },
+    },
+}
+
+ALL_NORMAL_ACTIONS = [
+    {
+        "action": "Mantén tus hábitos de alimentación, sueño y actividad física",
+        "why": "Tus resultados actuales están dentro de los rangos esperados.",
+        "type": "lifestyle",
+    }
+]
+
+DEFAULT_ROUTING = {"ENABLED": True, "MAX_LOCAL_FLAGS": 1, "MAX_LOCAL_DEVIATION": 0.25}
+
+
+def _routing_setting(name: str):
+    return {**DEFAULT_ROUTING, **getattr(settings, "INSIGHTS_ROUTING", {})}[name]
+
+
+def _deviation(payload: Dict[str, Any]) -> float:
+    """Distance outside the reference range, relative to the width of the range."""
+    low, high, value = payload["ref_min"], payload["ref_max"], payload["value"]
+    span = (high - low) or abs(high) or 1.0
+    if value > high:
+        return (value - high) / span
+    if value < low:
+        return (low - value) / span
+    return 0.0
+
+
+def _guidance(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return ANALYTE_GUIDANCE.get(payload["analyte"], {}).get(payload["flag"])
+
+
+def route_insights(results: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """Decide whether a report needs the LLM; returns ``(route, reason)``.
+
+    Reports are answered locally when every result is normal, or when at most
+    ``MAX_LOCAL_FLAGS`` results are flagged, each one is covered by ``ANALYTE_GUIDANCE`` and
+    none deviates from its range by more than ``MAX_LOCAL_DEVIATION`` of the range width.
+    """
+    if not _routing_setting("ENABLED"):
+        return "llm", "routing_disabled"
+    flagged = [r for r in results if r["flag"] != ResultValue.Flag.NORMAL]
+    if not flagged:
+        return "rules", "all_normal"
+    if len(flagged) > _routing_setting("MAX_LOCAL_FLAGS"):
+        return "llm", "multiple_flags"
+    if any(_guidance(item) is None for item in flagged):
+        return "llm", "no_template"
+    if any(_deviation(item) > _routing_setting("MAX_LOCAL_DEVIATION") for item in flagged):
+        return "llm", "large_deviation"
+    return "rules", "minor_flags"
+
+
+def rule_based_insights(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Deterministic insights in the same schema the LLM returns."""
     if not results:
         return DEFAULT_INSIGHTS
     flagged = [r for r in results if r["flag"] != ResultValue.Flag.NORMAL]
-    highlights = flagged or results[:3]
-    explanation = "Se analizaron los valores disponibles y se resaltan aquellos fuera del rango de referencia."
+    if not flagged:
+        names = ", ".join(
+            ANALYTE_GUIDANCE.get(r["analyte"], {}).get("label", r["analyte"]) for r in results
+        )
+        key_results = [
+            {**_format_key_result(item), "confidence": 0.8} for item in results[:3]
+        ]
+        return {
+            "key_results": key_results,
+            "explanation": (
+                f"Los {len(results)} valores analizados ({names}) se encuentran dentro de "
+                "sus rangos de referencia."
+            ),
+            "recommended_tests": [],
+            "actions": ALL_NORMAL_ACTIONS,
+            "triage": "routine",
+            "uncertainties": [],
+            "disclaimer": DEFAULT_INSIGHTS["disclaimer"],
+            "source": "rules",
+        }
+
+    paragraphs = []
     recommended = []
     actions = []
-    triage = "routine"
-    if flagged:
-        explanation = "Se detectaron valores fuera del rango de referencia; considera consultar a tu médico para orientación personalizada."
-        triage = "priority"
-        for item in flagged:
-            recommended.append({"test": item["analyte"], "why": "Verificar la tendencia del analito."})
-            actions.append(
-                {
-                    "action": f"Comenta el resultado de {item['analyte']} con tu profesional de salud",
-                    "why": "Es importante confirmar si se requieren estudios adicionales.",
-                    "type": "medical_followup",
-                }
+    key_results = []
+    for item in flagged:
+        guidance = _guidance(item)
+        key_result = _format_key_result(item)
+        if guidance:
+            key_result["reason"] = guidance["explanation"]
+            key_result["confidence"] = 0.7
+            paragraphs.append(guidance["explanation"])
+            recommended.extend({"test": test, "why": why} for test, why in guidance["tests"])
+            actions.extend(
+                {"action": action, "why": why, "type": kind}
+                for action, why, kind in guidance["actions"]
             )
-    key_results = [_format_key_result(item) for item in highlights]
+        else:
+            recommended.append(
+                {"test": item["analyte"], "why": "Verificar la tendencia del analito."}
+            )
+        key_results.append(key_result)
+        actions.append(
+            {
+                "action": f"Comenta el resultado de {item['analyte']} con tu profesional de salud",
+                "why": "Es importante confirmar si se requieren estudios adicionales.",
+                "type": "medical_followup",
+            }
+        )
+    if len(paragraphs) < len(flagged):
+        paragraphs.insert(
+            0,
+            "Se detectaron valores fuera del rango de referencia; considera consultar a tu "
+            "médico para orientación personalizada.",
+        )
+    normal_count = len(results) - len(flagged)
+    if normal_count:
+        paragraphs.append(
+            f"Los demás resultados ({normal_count}) están dentro de su rango de referencia."
+        )
     return {
         "key_results": key_results,
-        "explanation": explanation,
+        "explanation": " ".join(paragraphs),
         "recommended_tests": recommended,
         "actions": actions,
-        "triage": triage,
+        "triage": "priority",
         "uncertainties": [],
         "disclaimer": DEFAULT_INSIGHTS["disclaimer"],
+        "source": "rules",
     }
 
 
-def generate_insights(report: Report) -> Dict[str, Any]:
-    api_key = getattr(settings, "OPENAI_API_KEY", None)
-    results = [_result_to_payload(r) for r in report.results.all()]
-    if not results:
-        return DEFAULT_INSIGHTS
-    if not api_key:
-        return _fallback_insights(report)
+def _fallback_insights(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rule-based insights used when the LLM is unavailable or fails."""
+    insights = rule_based_insights(results)
+    return {**insights, "source": "fallback"} if results else insights
 
-    client = OpenAI(api_key=api_key)
-    prompt = """
+
+# Bump whenever INSIGHTS_PROMPT, the model or the local rules change in a way that should
+# refresh stored insights; ``regenerate_insights`` selects reports with another version.
+INSIGHTS_PROMPT_VERSION = "2025-11-v2"
+
+INSIGHTS_PROMPT = """
 ROLE
 You are a medical lab analyst. Your job is to extract signal from lab results and explain the results plainly.
 
@@ -151,26 +410,135 @@ RULES
 - If information is insufficient to suggest tests or actions, return empty arrays for those fields.
 - Output MUST be valid JSON and MUST follow the schema exactly.
 """
+
+
+def _build_messages(results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": INSIGHTS_PROMPT},
+        {"role": "user", "content": json.dumps({"results": results})},
+    ]
+
+
+def _normalize_insights(content: str) -> Dict[str, Any]:
+    data = json.loads(content or "{}")
+    return {
+        "key_results": data.get("key_results", []),
+        "explanation": data.get("explanation", ""),
+        "recommended_tests": data.get("recommended_tests", []),
+        "actions": data.get("actions", []),
+        "triage": data.get("triage", "routine"),
+        "uncertainties": data.get("uncertainties", []),
+        "disclaimer": data.get("disclaimer", DEFAULT_INSIGHTS["disclaimer"]),
+        "source": "llm",
+    }
+
+
+def _choose_route(results: List[Dict[str, Any]]) -> str:
+    route, reason = route_insights(results)
+    if route == "llm" and not get_api_key():
+        route, reason = "rules", "no_api_key"
+    record_insights_route(route, reason)
+    return route
+
+
+def generate_insights(report: Report) -> Dict[str, Any]:
+    results = [_result_to_payload(r) for r in report.results.all()]
+    if not results:
+        return DEFAULT_INSIGHTS
+    if _choose_route(results) == "rules":
+        return rule_based_insights(results)
+
+    client = get_client()
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.4,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": json.dumps({"results": results})},
-            ],
-        )
-        content = completion.choices[0].message.content or "{}"
-        data = json.loads(content)
-        return {
-            "key_results": data.get("key_results", []),
-            "explanation": data.get("explanation", ""),
-            "recommended_tests": data.get("recommended_tests", []),
-            "actions": data.get("actions", []),
-            "triage": data.get("triage", "routine"),
-            "uncertainties": data.get("uncertainties", []),
-            "disclaimer": data.get("disclaimer", DEFAULT_INSIGHTS["disclaimer"]),
-        }
+        with (
+            timed("ai"),
+            guarded_call("insights", prompt_version=INSIGHTS_PROMPT_VERSION) as call,
+        ):
+            completion = client.chat.completions.create(
+                model=DEFAULT_MODEL,
+                temperature=0.4,
+                messages=_build_messages(results),
+            )
+            call.completion = completion
+            # Parsed inside the guard: malformed output is a failed call, not a success.
+            return _normalize_insights(completion.choices[0].message.content)
+    except LLMUnavailable:
+        return _fallback_insights(results)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("AI insight generation failed: %s", exc)
+        record_failure("insights", type(exc).__name__)
+        return _fallback_insights(results)
+
+
+async def agenerate_insights(report: Report) -> Dict[str, Any]:
+    results = [
+        _result_to_payload(r) async for r in report.results.select_related("analyte")
+    ]
+    if not results:
+        return DEFAULT_INSIGHTS
+    if _choose_route(results) == "rules":
+        return rule_based_insights(results)
+
+    client = get_async_client()
+    try:
+        with timed("ai"):
+            async with aguarded_call("insights", prompt_version=INSIGHTS_PROMPT_VERSION) as call:
+                completion = await client.chat.completions.create(
+                    model=DEFAULT_MODEL,
+                    temperature=0.4,
+                    messages=_build_messages(results),
+                )
+                call.completion = completion
+                # Parsed inside the guard: malformed output is a failed call, not a success.
+                return _normalize_insights(completion.choices[0].message.content)
+    except LLMUnavailable:
+        return _fallback_insights(results)
     except Exception as exc:  # noqa: BLE001
         logger.exception("AI insight generation failed: %s", exc)
-        return _fallback_insights(report)
+        record_failure("insights", type(exc).__name__)
+        return _fallback_insights(results)
+
+
+async def astream_insights(report: Report) -> AsyncIterator[Tuple[str, Any]]:
+    """Like ``agenerate_insights`` but yields the model output as it is written.
+
+    Yields ``("delta", text)`` for every content chunk of the completion and finally
+    ``("done", insights)`` with the validated result. Reports answered by the local rules,
+    and calls that fail or are refused, only produce the ``done`` event.
+    """
+    results = [
+        _result_to_payload(r) async for r in report.results.select_related("analyte")
+    ]
+    if not results:
+        yield "done", DEFAULT_INSIGHTS
+        return
+    if _choose_route(results) == "rules":
+        yield "done", rule_based_insights(results)
+        return
+
+    client = get_async_client()
+    parts: List[str] = []
+    try:
+        async with aguarded_call("insights", prompt_version=INSIGHTS_PROMPT_VERSION) as call:
+            stream = await client.chat.completions.create(
+                model=DEFAULT_MODEL,
+                temperature=0.4,
+                messages=_build_messages(results),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    # Only the last chunk carries usage; it is all telemetry needs.
+                    call.completion = chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield "delta", chunk.choices[0].delta.content
+            insights = _normalize_insights("".join(parts))
+    except LLMUnavailable:
+        insights = _fallback_insights(results)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Streaming AI insight generation failed: %s", exc)
+        record_failure("insights", type(exc).__name__)
+        insights = _fallback_insights(results)
+    yield "done", insights
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from core.models import Patient, Report
+
+from .ingestion import aingest_pdf, file_sha256
+
+logger = logging.getLogger(__name__)
+
+UNSUPPORTED_FILE = "Only PDF files are supported."
+FILE_TOO_LARGE = "File is too large."
+TOTAL_TOO_LARGE = "Batch exceeds the maximum total size."
+# Encrypted entries raise RuntimeError, unknown compression methods NotImplementedError and
+# corrupt entries BadZipFile (CRC) or zlib.error.
+UNREADABLE_ENTRY_ERRORS = (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error)
+
+
+class BatchUploadError(ValueError):
+    """Raised when the batch as a whole is unusable (too many files, bad archive)."""
+
+
+@dataclass
+class BatchDocument:
+    filename: str
+    file: Optional[Any] = None
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _batch_setting(name: str, default: int) -> int:
+    return getattr(settings, "BATCH_UPLOAD", {}).get(name, default)
+
+
+def _is_pdf(uploaded_file) -> bool:
+    return "pdf" in (getattr(uploaded_file, "content_type", "") or "").lower()
+
+
+def _max_file_bytes() -> int:
+    return _batch_setting("MAX_FILE_BYTES", 25 * 1024 * 1024)
+
+
+def _max_total_bytes() -> int:
+    return _batch_setting("MAX_TOTAL_BYTES", 200 * 1024 * 1024)
+
+
+def _documents_from_archive(archive, total: int = 0) -> List[BatchDocument]:
+    """PDF entries of ``archive``; ``total`` is the size already used by the other files."""
+    max_entry_bytes = _max_file_bytes()
+    max_total_bytes = _max_total_bytes()
+    documents: List[BatchDocument] = []
+    try:
+        with zipfile.ZipFile(archive) as bundle:
+            for info in bundle.infolist():
+                path = PurePosixPath(info.filename)
+                if info.is_dir() or "__MACOSX" in path.parts or path.name.startswith("."):
+                    continue
+                if path.suffix.lower() != ".pdf":
+                    documents.append(BatchDocument(path.name, error=UNSUPPORTED_FILE))
+                    continue
+                if info.file_size > max_entry_bytes:
+                    documents.append(BatchDocument(path.name, error=FILE_TOO_LARGE))
+                    continue
+                total += info.file_size
+                if total > max_total_bytes:
+                    raise BatchUploadError(TOTAL_TOO_LARGE)
+                try:
+                    data = bundle.read(info)
+                except UNREADABLE_ENTRY_ERRORS:
+                    logger.warning("Could not extract %s from batch archive", info.filename)
+                    documents.append(BatchDocument(path.name, error="File could not be extracted."))
+                    continue
+                documents.append(
+                    BatchDocument(
+                        path.name,
+                        file=SimpleUploadedFile(path.name, data, content_type="application/pdf"),
+                    )
+                )
+    except zipfile.BadZipFile as exc:
+        raise BatchUploadError("Archive is not a valid ZIP file.") from exc
+    return documents
+
+
+def collect_documents(files: Iterable, archive=None) -> List[BatchDocument]:
+    """Flatten uploaded files and ZIP entries into documents, flagging non-PDF inputs.
+
+    Files over ``MAX_FILE_BYTES`` are flagged per file; uploaded files and extracted entries
+    together may not exceed ``MAX_TOTAL_BYTES``.
+    """
+    max_file_bytes = _max_file_bytes()
+    documents: List[BatchDocument] = []
+    total = 0
+    for f in files:
+        if not _is_pdf(f):
+            documents.append(BatchDocument(f.name, error=UNSUPPORTED_FILE))
+        elif f.size > max_file_bytes:
+            documents.append(BatchDocument(f.name, error=FILE_TOO_LARGE))
+        else:
+            total += f.size
+            documents.append(BatchDocument(f.name, file=f))
+    if total > _max_total_bytes():
+        raise BatchUploadError(TOTAL_TOO_LARGE)
+    if archive is not None:
+        documents.extend(_documents_from_archive(archive, total))
+    max_files = _batch_setting("MAX_FILES", 50)
+    if len(documents) > max_files:
+        raise BatchUploadError(f"A batch can contain at most {max_files} files.")
+    if not documents:
+        raise BatchUploadError("No files were provided.")
+    return documents
+
+
+async def aingest_batch(
+    patient: Patient, documents: List[BatchDocument], request=None
+) -> List[Dict[str, Any]]:
+    """Ingest ``documents`` concurrently and return one result entry per input, in order.
+
+    Identical files (by SHA-256) are ingested once; repeats within the batch and files already
+    stored for the patient come back as ``duplicate`` entries pointing at the existing report.
+    """
+    hash_file = sync_to_async(file_sha256, thread_sensitive=False)
+    for document in documents:
+        if document.file is not None:
+            document.sha256 = await hash_file(document.file)
+    hashes = {document.sha256 for document in documents if document.sha256}
+    existing = {
+        sha256: str(report_id)
+        async for report_id, sha256 in Report.objects.filter(
+            patient=patient, raw_json__sha256__in=list(hashes)
+        ).values_list("id", "raw_json__sha256")
+    }
+
+    semaphore = asyncio.Semaphore(_batch_setting("CONCURRENCY", 4))
+
+    async def ingest(document: BatchDocument) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                report = await aingest_pdf(
+                    patient, document.file, request, content_hash=document.sha256
+                )
+            except Exception:  # noqa: BLE001
+                logger.exception("Batch ingestion failed for %s", document.filename)
+                return {
+                    "filename": document.filename,
+                    "status": "error",
+                    "error": "File could not be processed.",
+                }
+        return {"filename": document.filename, "status": "created", "report_id": str(report.pk)}
+
+    entries: List[Optional[Dict[str, Any]]] = [None] * len(documents)
+    tasks = {}
+    first_seen: Dict[str, int] = {}
+    repeats: List[int] = []
+    for index, document in enumerate(documents):
+        if document.error:
+            entries[index] = {
+                "filename": document.filename,
+                "status": "error",
+                "error": document.error,
+            }
+        elif document.sha256 in existing:
+            entries[index] = {
+                "filename": document.filename,
+                "status": "duplicate",
+                "report_id": existing[document.sha256],
+            }
+        elif document.sha256 in first_seen:
+            repeats.append(index)
+        else:
+            first_seen[document.sha256] = index
+            tasks[index] = asyncio.ensure_future(ingest(document))
+
+    if tasks:
+        results = await asyncio.gather(*tasks.values())
+        for index, result in zip(tasks, results):
+            entries[index] = result
+    for index in repeats:
+        document = documents[index]
+        original = entries[first_seen[document.sha256]]
+        entries[index] = {
+            "filename": document.filename,
+            "status": "duplicate",
+            "duplicate_of": original["filename"],
+            "report_id": original.get("report_id"),
+        }
+    return entries
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.models import Analyte, Patient, Report, ResultValue
+
+from .ingestion import compute_flag
+from .lab_import import RecordError, coerce_datetime, coerce_decimal
+from .rollups import mark_rollups_stale
+from .search import update_search_vectors
+from .units import canonicalize
+
+BULK_SOURCE = "lab_api"
+
+
+class BulkValidationError(ValueError):
+    def __init__(self, errors: Dict[str, List[str]]):
+        super().__init__("Invalid bulk results payload.")
+        self.errors = errors
+
+
+@dataclass
+class CleanReport:
+    patient_id: Any
+    org_name: str
+    issued_at: Any
+    report_ref: str
+    results: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _max_results() -> int:
+    return getattr(settings, "BULK_RESULTS_MAX_RESULTS", 10000)
+
+
+def validate_bulk_payload(data: Any) -> List[CleanReport]:
+    """Validate and coerce a ``{"reports": [...]}`` payload without DRF field machinery.
+
+    Errors are collected for every offending path (``reports[2].results[0].value``) and raised
+    together as ``BulkValidationError`` so the client can fix a batch in one round trip.
+    """
+    errors: Dict[str, List[str]] = {}
+
+    def fail(path: str, message: str) -> None:
+        errors.setdefault(path, []).append(message)
+
+    reports = data.get("reports") if isinstance(data, dict) else None
+    if not isinstance(reports, list) or not reports:
+        raise BulkValidationError({"reports": ["A non-empty list of reports is required."]})
+
+    total = sum(len(r.get("results") or []) for r in reports if isinstance(r, dict))
+    if total > _max_results():
+        raise BulkValidationError(
+            {"reports": [f"A request can contain at most {_max_results()} results."]}
+        )
+
+    now = timezone.now()
+    cleaned: List[CleanReport] = []
+    seen_refs: Dict[Tuple[str, str], int] = {}
+    for index, report in enumerate(reports):
+        path = f"reports[{index}]"
+        if not isinstance(report, dict):
+            fail(path, "Must be an object.")
+            continue
+        try:
+            patient_id = str(uuid.UUID(str(report.get("patient_id") or "").strip()))
+        except ValueError:
+            fail(f"{path}.patient_id", "A valid patient UUID is required.")
+            patient_id = ""
+        try:
+            issued_at = coerce_datetime(report.get("issued_at"), now)
+        except RecordError:
+            fail(f"{path}.issued_at", "Invalid datetime.")
+            issued_at = now
+        results = report.get("results")
+        if not isinstance(results, list) or not results:
+            fail(f"{path}.results", "A non-empty list of results is required.")
+            continue
+        clean = CleanReport(
+            patient_id=patient_id,
+            org_name=str(report.get("org_name") or "Unknown Lab")[:255],
+            issued_at=issued_at,
+            report_ref=str(report.get("report_ref") or "").strip(),
+        )
+        if patient_id and clean.report_ref:
+            first = seen_refs.setdefault((patient_id, clean.report_ref), index)
+            if first != index:
+                fail(f"{path}.report_ref", f"Duplicate of reports[{first}].")
+        for result_index, result in enumerate(results):
+            result_path = f"{path}.results[{result_index}]"
+            if not isinstance(result, dict):
+                fail(result_path, "Must be an object.")
+                continue
+            analyte = str(result.get("analyte") or "").strip()[:255]
+            if not analyte:
+                fail(f"{result_path}.analyte", "This field is required.")
+            numbers = {}
+            for name in ("value", "ref_min", "ref_max"):
+                try:
+                    numbers[name] = coerce_decimal(result.get(name))
+                except RecordError as exc:
+                    fail(f"{result_path}.{name}", f"{str(exc).capitalize()}.")
+                    continue
+                if numbers[name] is None:
+                    fail(f"{result_path}.{name}", "This field is required.")
+            if all(numbers.get(name) is not None for name in ("ref_min", "ref_max")):
+                if numbers["ref_min"] > numbers["ref_max"]:
+                    fail(f"{result_path}.ref_min", "ref_min cannot be greater than ref_max")
+            try:
+                measured_at = coerce_datetime(result.get("measured_at"), issued_at)
+            except RecordError:
+                fail(f"{result_path}.measured_at", "Invalid datetime.")
+                continue
+            clean.results.append(
+                {
+                    "analyte": analyte,
+                    "unit": str(result.get("unit") or "").strip()[:64],
+                    "measured_at": measured_at,
+                    **numbers,
+                }
+            )
+        cleaned.append(clean)
+    if errors:
+        raise BulkValidationError(errors)
+    return cleaned
+
+
+def _resolve_analytes(names: List[str]) -> Dict[str, Tuple[int, str]]:
+    wanted = {name.lower(): name for name in names}
+    index = {
+        name.lower(): (pk, unit)
+        for pk, name, unit in Analyte.objects.annotate(key=Lower("name"))
+        .filter(key__in=list(wanted))
+        .values_list("id", "name", "unit")
+    }
+    missing = [
+        Analyte(name=original, unit="", description="Auto-created")
+        for key, original in wanted.items()
+        if key not in index
+    ]
+    if missing:
+        Analyte.objects.bulk_create(missing, ignore_conflicts=True)
+        for pk, name, unit in Analyte.objects.filter(
+            name__in=[analyte.name for analyte in missing]
+        ).values_list("id", "name", "unit"):
+            index[name.lower()] = (pk, unit)
+    return index
+
+
+@transaction.atomic
+def store_bulk_results(reports: List[CleanReport]) -> Dict[str, Any]:
+    """Insert validated reports and results with two ``bulk_create`` calls.
+
+    Reports whose ``report_ref`` the patient already has are skipped. The patient rows are
+    locked first, so a concurrent request for the same patients waits for this one to commit
+    and then sees its reports.
+    """
+    patient_ids = {report.patient_id for report in reports}
+    known = {
+        str(pk)
+        for pk in Patient.objects.select_for_update()
+        .filter(pk__in=patient_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    }
+    unknown = sorted(patient_ids - known)
+    if unknown:
+        raise BulkValidationError({"patient_id": [f"Unknown patient {pk}." for pk in unknown]})
+
+    refs = {report.report_ref for report in reports if report.report_ref}
+    existing = set()
+    if refs:
+        existing = {
+            (str(patient_id), ref)
+            for patient_id, ref in Report.objects.filter(
+                patient_id__in=patient_ids, raw_json__report_ref__in=list(refs)
+            ).values_list("patient_id", "raw_json__report_ref")
+        }
+
+    analytes = _resolve_analytes(
+        sorted({result["analyte"] for report in reports for result in report.results})
+    )
+    report_objects: List[Report] = []
+    result_objects: List[ResultValue] = []
+    summary = []
+    for clean in reports:
+        if clean.report_ref and (clean.patient_id, clean.report_ref) in existing:
+            summary.append({"report_ref": clean.report_ref, "status": "existing"})
+            continue
+        report = Report(
+            patient_id=clean.patient_id,
+            org_name=clean.org_name,
+            issued_at=clean.issued_at,
+            raw_json={"source": BULK_SOURCE, "report_ref": clean.report_ref or None},
+            parsed_fields={"lab_name": clean.org_name, "source": BULK_SOURCE},
+        )
+        report_objects.append(report)
+        for result in clean.results:
+            analyte_id, analyte_unit = analytes[result["analyte"].lower()]
+            unit = result["unit"] or analyte_unit
+            canonical_value, canonical_unit = canonicalize(
+                result["analyte"], unit, result["value"], analyte_unit
+            )
+            result_objects.append(
+                ResultValue(
+                    report=report,
+                    analyte_id=analyte_id,
+                    value=result["value"],
+                    unit=unit,
+                    ref_min=result["ref_min"],
+                    ref_max=result["ref_max"],
+                    flag=compute_flag(result["value"], result["ref_min"], result["ref_max"]),
+                    measured_at=result["measured_at"],
+                    canonical_value=canonical_value,
+                    canonical_unit=canonical_unit,
+                )
+            )
+        summary.append(
+            {
+                "id": str(report.pk),
+                "report_ref": clean.report_ref or None,
+                "status": "created",
+                "results": len(clean.results),
+            }
+        )
+    Report.objects.bulk_create(report_objects, batch_size=1000)
+    ResultValue.objects.bulk_create(result_objects, batch_size=2000)
+    update_search_vectors((report.pk for report in report_objects), texts={})
+    mark_rollups_stale(result.analyte_id for result in result_objects)
+    return {
+        "reports": summary,
+        "created_reports": len(report_objects),
+        "created_results": len(result_objects),
+    }
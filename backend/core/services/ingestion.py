@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.metrics import observe_stage
+from core.models import Analyte, Patient, Report, ResultValue
+
+from .ai_insights import INSIGHTS_PROMPT_VERSION, agenerate_insights
+from .pdf_parser import aparse_pdf
+from .report_text import store_report_text
+from .rollups import mark_rollups_stale
+from .search import update_search_vectors
+from .units import canonicalize
+
+
+def normalize_datetime(value: Optional[str | datetime], fallback: datetime) -> datetime:
+    if isinstance(value, str):
+        dt = parse_datetime(value)
+    elif isinstance(value, datetime):
+        dt = value
+    else:
+        dt = None
+    if dt is None:
+        dt = fallback
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, timezone.get_current_timezone())
+    return dt
+
+
+def compute_flag(value, ref_min, ref_max) -> str:
+    if value < ref_min:
+        return ResultValue.Flag.LOW
+    if value > ref_max:
+        return ResultValue.Flag.HIGH
+    return ResultValue.Flag.NORMAL
+
+
+def file_sha256(file_obj) -> str:
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+@transaction.atomic
+def persist_parsed_report(
+    patient: Patient,
+    pdf_file,
+    parsed_payload: Dict[str, Any],
+    request=None,
+    content_hash: Optional[str] = None,
+) -> Report:
+    """Store an uploaded PDF, its parser output and one ``ResultValue`` per analyte."""
+    report_date = normalize_datetime(parsed_payload.get("report_date"), timezone.now())
+    # The extracted text goes to ReportText; keep it out of both JSON columns.
+    parsed_fields = {key: value for key, value in parsed_payload.items() if key != "raw_text"}
+    parsed_fields["report_date"] = report_date.isoformat()
+    pdf_file.seek(0)
+    report = Report.objects.create(
+        patient=patient,
+        org_name=parsed_payload.get("lab_name") or "Unknown Lab",
+        issued_at=report_date,
+        pdf_file=pdf_file,
+        raw_json={
+            "filename": pdf_file.name,
+            "size": pdf_file.size,
+            "content_type": pdf_file.content_type,
+            "sha256": content_hash or file_sha256(pdf_file),
+        },
+        parsed_fields=parsed_fields,
+    )
+    if report.pdf_file:
+        url = report.pdf_file.url
+        if request:
+            url = request.build_absolute_uri(url)
+        report.pdf_url = url
+        report.save(update_fields=["pdf_url"])
+    analyte_ids = set()
+    for result_data in parsed_payload.get("analytes", []):
+        analyte, _ = Analyte.objects.get_or_create(
+            name=result_data.get("name", "unknown"),
+            defaults={
+                "unit": result_data.get("unit", ""),
+                "description": "Auto-created",
+            },
+        )
+        measured_str = result_data.get("measured_at")
+        measured_at = normalize_datetime(measured_str, report_date)
+        value = result_data.get("value", 0)
+        ref_min = result_data.get("ref_min", 0)
+        ref_max = result_data.get("ref_max", 0)
+        unit = result_data.get("unit", analyte.unit)
+        canonical_value, canonical_unit = canonicalize(analyte.name, unit, value, analyte.unit)
+        ResultValue.objects.create(
+            report=report,
+            analyte=analyte,
+            value=value,
+            unit=unit,
+            ref_min=ref_min,
+            ref_max=ref_max,
+            flag=compute_flag(value, ref_min, ref_max),
+            measured_at=measured_at,
+            canonical_value=canonical_value,
+            canonical_unit=canonical_unit,
+        )
+        analyte_ids.add(analyte.pk)
+    raw_text = parsed_payload.get("raw_text", "")
+    store_report_text(report.pk, raw_text)
+    update_search_vectors([report.pk], texts={report.pk: raw_text})
+    mark_rollups_stale(analyte_ids)
+    return report
+
+
+async def aingest_pdf(patient: Patient, pdf_file, request=None, content_hash=None) -> Report:
+    """Parse, persist and summarize one uploaded PDF without blocking the event loop."""
+    parsed_payload = await aparse_pdf(pdf_file)
+    with observe_stage("persist"):
+        report = await sync_to_async(persist_parsed_report)(
+            patient, pdf_file, parsed_payload, request, content_hash=content_hash
+        )
+    with observe_stage("insights"):
+        report.insights = await agenerate_insights(report)
+    report.insights_prompt_version = INSIGHTS_PROMPT_VERSION
+    report.analysis_generated_at = timezone.now()
+    await report.asave(
+        update_fields=["insights", "insights_prompt_version", "analysis_generated_at"]
+    )
+    return report
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from core.models import Report
+
+from .ai_insights import INSIGHTS_PROMPT_VERSION, agenerate_insights
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ["insights", "insights_prompt_version", "analysis_generated_at"]
+
+
+@dataclass
+class RegenerationStats:
+    processed: int = 0
+    updated: int = 0
+    failed: int = 0
+    sources: Dict[str, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.started, 1e-6)
+
+    @property
+    def rate(self) -> float:
+        return self.processed / self.elapsed
+
+
+def select_reports(
+    outdated_only: bool = True,
+    prompt_versions: Optional[Iterable[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    patient_ids: Optional[Iterable[str]] = None,
+) -> QuerySet:
+    """Reports to regenerate, in the stable ``(created_at, id)`` order used for checkpoints."""
+    queryset = Report.objects.all()
+    if outdated_only:
+        queryset = queryset.exclude(insights_prompt_version=INSIGHTS_PROMPT_VERSION)
+    if prompt_versions:
+        queryset = queryset.filter(insights_prompt_version__in=list(prompt_versions))
+    if since:
+        queryset = queryset.filter(issued_at__gte=since)
+    if until:
+        queryset = queryset.filter(issued_at__lt=until)
+    if patient_ids:
+        queryset = queryset.filter(patient_id__in=list(patient_ids))
+    return queryset.order_by("created_at", "id")
+
+
+def after_position(queryset: QuerySet, position: Optional[Tuple[str, str]]) -> QuerySet:
+    if not position:
+        return queryset
+    created_at, report_id = position
+    return queryset.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=report_id)
+    )
+
+
+async def _regenerate_one(
+    report: Report, semaphore: asyncio.Semaphore, attempts: int, backoff: float
+) -> Optional[Dict[str, Any]]:
+    """Generate insights for one report; ``None`` when the model stayed unavailable.
+
+    A ``fallback`` result means the limiter, the breaker or the provider refused the call.
+    Writing it would replace stored LLM output with rule-based text, so the report is retried
+    with exponential backoff and skipped (left for the next run) if it never succeeds.
+    """
+    for attempt in range(attempts):
+        async with semaphore:
+            insights = await agenerate_insights(report)
+        if insights.get("source") != "fallback":
+            return insights
+        if attempt + 1 < attempts:
+            await asyncio.sleep(backoff * (2**attempt))
+    return None
+
+
+async def aregenerate_page(
+    reports: List[Report],
+    stats: RegenerationStats,
+    concurrency: int = 4,
+    attempts: int = 4,
+    backoff: float = 1.0,
+) -> List[Report]:
+    """Regenerate a page of reports concurrently and return the ones ready to be saved."""
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = await asyncio.gather(
+        *(_regenerate_one(report, semaphore, attempts, backoff) for report in reports),
+        return_exceptions=True,
+    )
+    now = timezone.now()
+    ready = []
+    for report, outcome in zip(reports, outcomes):
+        stats.processed += 1
+        if isinstance(outcome, BaseException) or outcome is None:
+            if isinstance(outcome, BaseException):
+                logger.error("Insight regeneration failed for %s: %r", report.pk, outcome)
+            stats.failed += 1
+            continue
+        source = outcome.get("source", "llm")
+        stats.sources[source] = stats.sources.get(source, 0) + 1
+        report.insights = outcome
+        report.insights_prompt_version = INSIGHTS_PROMPT_VERSION
+        report.analysis_generated_at = now
+        ready.append(report)
+    return ready
+
+
+def save_page(reports: List[Report]) -> int:
+    if reports:
+        Report.objects.bulk_update(reports, UPDATE_FIELDS)
+    return len(reports)
+
+
+async def aregenerate_insights(
+    queryset: QuerySet,
+    batch_size: int = 50,
+    concurrency: int = 4,
+    position: Optional[Tuple[str, str]] = None,
+    limit: Optional[int] = None,
+    on_page: Optional[Callable[[Optional[Tuple[str, str]], RegenerationStats], None]] = None,
+    attempts: int = 4,
+    backoff: float = 1.0,
+) -> RegenerationStats:
+    """Walk ``queryset`` in keyset pages, regenerating and ``bulk_update``-ing each page.
+
+    After every saved page ``on_page`` receives the position a caller should persist as a
+    checkpoint and pass back as ``position``: the ``(created_at, id)`` of the last report before
+    the first one that was skipped, or of the page's last report while nothing was skipped. A
+    resumed run therefore retries the skipped reports (and revisits the ones after them; those
+    already on the current prompt version are no longer selected unless ``--all`` is used).
+    """
+    stats = RegenerationStats()
+    checkpoint = position
+    skipped = False
+    while limit is None or stats.processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - stats.processed)
+        page = [report async for report in after_position(queryset, position)[:size]]
+        if not page:
+            break
+        ready = await aregenerate_page(page, stats, concurrency, attempts, backoff)
+        stats.updated += await sync_to_async(save_page)(ready)
+        ready_ids = {report.pk for report in ready}
+        for report in page:
+            skipped = skipped or report.pk not in ready_ids
+            if skipped:
+                break
+            checkpoint = _position(report)
+        position = _position(page[-1])
+        if on_page:
+            on_page(checkpoint, stats)
+    return stats
+
+
+def _position(report: Report) -> Tuple[str, str]:
+    return (report.created_at.isoformat(), str(report.pk))
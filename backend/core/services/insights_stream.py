@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import AsyncIterator
+
+from django.utils import timezone
+from utils.renderers import sse_event
+
+from core.models import Report
+
+from .ai_insights import INSIGHTS_PROMPT_VERSION, astream_insights
+
+
+async def stream_report_insights(report: Report) -> AsyncIterator[str]:
+    """Server-Sent Events for regenerating ``report``'s insights, saving the final result.
+
+    Emits ``start`` right away, ``delta`` events with raw model output while it is written and
+    one ``done`` event with the validated insights. A ``fallback`` result (model refused or
+    failed) is only saved when the report has no insights yet, so a failed retry never
+    replaces earlier model output.
+    """
+    yield sse_event("start", {"report_id": str(report.pk)})
+    async for event, data in astream_insights(report):
+        if event == "delta":
+            yield sse_event("delta", {"text": data})
+            continue
+        saved = data.get("source") != "fallback" or not report.insights
+        if saved:
+            await Report.objects.filter(pk=report.pk).aupdate(
+                insights=data,
+                insights_prompt_version=INSIGHTS_PROMPT_VERSION,
+                analysis_generated_at=timezone.now(),
+            )
+        yield sse_event("done", {"insights": data, "saved": saved})
@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.models import Analyte, Patient, Report, ResultValue
+
+from .ingestion import compute_flag
+from .pdf_parser import DEFAULT_ANALYTES
+from .rollups import mark_rollups_stale
+from .search import update_search_vectors
+from .units import canonicalize
+
+FORMATS = ("csv", "ndjson", "hl7")
+IMPORT_SOURCE = "lab_import"
+MAX_ABS_VALUE = Decimal("1e8")
+
+REPORT_COPY_COLUMNS = (
+    "id",
+    "patient_id",
+    "org_name",
+    "issued_at",
+    "pdf_url",
+    "raw_json",
+    "parsed_fields",
+    "insights",
+    "insights_prompt_version",
+    "created_at",
+)
+RESULT_COPY_COLUMNS = (
+    "report_id",
+    "analyte_id",
+    "value",
+    "unit",
+    "ref_min",
+    "ref_max",
+    "flag",
+    "measured_at",
+    "canonical_value",
+    "canonical_unit",
+)
+
+
+class RecordError(ValueError):
+    """A single input record that cannot be imported."""
+
+
+# ---------------------------------------------------------------------------
+# Readers: every format is flattened into one dict per result with the keys
+# patient_id, patient_name, birth_date, sex, report_ref, lab_name, issued_at,
+# analyte, value, unit, ref_min, ref_max, measured_at.
+# ---------------------------------------------------------------------------
+
+
+def open_source(path: Path):
+    if path.suffix == ".gz":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return path.open("r", encoding="utf-8", newline="")
+
+
+def detect_format(path: Path) -> str:
+    suffixes = [suffix.lower() for suffix in path.suffixes if suffix.lower() != ".gz"]
+    extension = suffixes[-1].lstrip(".") if suffixes else ""
+    if extension in {"jsonl", "ndjson", "json"}:
+        return "ndjson"
+    if extension in {"hl7", "oru"}:
+        return "hl7"
+    return "csv"
+
+
+def read_csv(handle) -> Iterator[Dict[str, Any]]:
+    yield from csv.DictReader(handle)
+
+
+def read_ndjson(handle) -> Iterator[Dict[str, Any]]:
+    for line in handle:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _hl7_datetime(value: str) -> Optional[datetime]:
+    digits = (value or "").split("+")[0].split("-")[0].split(".")[0]
+    for pattern in ("%Y%m%d%H%M%S", "%Y%m%d%H%M", "%Y%m%d"):
+        try:
+            return datetime.strptime(digits, pattern)
+        except ValueError:
+            continue
+    return None
+
+
+def _hl7_field(fields: List[str], index: int) -> str:
+    return fields[index] if len(fields) > index else ""
+
+
+def _hl7_range(value: str) -> Tuple[Optional[str], Optional[str]]:
+    low, sep, high = value.partition("-")
+    if not sep:
+        return None, None
+    return low.strip() or None, high.strip() or None
+
+
+def read_hl7(handle) -> Iterator[Dict[str, Any]]:
+    """Yield one record per OBX segment of ORU^R01 messages (segments split on CR or LF)."""
+    context: Dict[str, Any] = {}
+    for raw_line in handle:
+        for segment in raw_line.replace("\r", "\n").split("\n"):
+            if not segment.strip():
+                continue
+            fields = segment.split("|")
+            kind = fields[0]
+            if kind == "MSH":
+                # MSH-1 is the field separator itself, so MSH-n lives at index n - 1.
+                context = {"lab_name": _hl7_field(fields, 3).split("^")[0]}
+            elif kind == "PID":
+                name = _hl7_field(fields, 5).split("^")
+                birth = _hl7_datetime(_hl7_field(fields, 7))
+                context.update(
+                    patient_id=_hl7_field(fields, 3).split("^")[0],
+                    patient_name=" ".join(part for part in reversed(name[:2]) if part),
+                    birth_date=birth.date().isoformat() if birth else None,
+                    sex=_hl7_field(fields, 8),
+                )
+            elif kind == "OBR":
+                issued = _hl7_datetime(_hl7_field(fields, 7))
+                context.update(
+                    report_ref=_hl7_field(fields, 3).split("^")[0]
+                    or _hl7_field(fields, 2).split("^")[0],
+                    issued_at=issued.isoformat() if issued else None,
+                )
+            elif kind == "OBX":
+                identifier = _hl7_field(fields, 3).split("^")
+                analyte = identifier[1] if len(identifier) > 1 and identifier[1] else identifier[0]
+                ref_min, ref_max = _hl7_range(_hl7_field(fields, 7))
+                observed = _hl7_datetime(_hl7_field(fields, 14))
+                yield {
+                    **context,
+                    "analyte": analyte,
+                    "value": _hl7_field(fields, 5),
+                    "unit": _hl7_field(fields, 6).split("^")[0],
+                    "ref_min": ref_min,
+                    "ref_max": ref_max,
+                    "measured_at": observed.isoformat() if observed else None,
+                }
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson, "hl7": read_hl7}
+
+
+# ---------------------------------------------------------------------------
+# Loader
+# ---------------------------------------------------------------------------
+
+
+def coerce_decimal(value: Any) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation as exc:
+        raise RecordError("invalid number") from exc
+    if not number.is_finite() or abs(number) >= MAX_ABS_VALUE:
+        raise RecordError("number out of range")
+    return number.quantize(Decimal("0.0001"))
+
+
+def coerce_datetime(value: Any, fallback: datetime) -> datetime:
+    if value in (None, ""):
+        return fallback
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = parse_datetime(text)
+            if parsed is None:
+                day = parse_date(text)
+                parsed = datetime.combine(day, datetime.min.time()) if day else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise RecordError("invalid date")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+@dataclass
+class ImportStats:
+    records: int = 0
+    reports: int = 0
+    results: int = 0
+    rejected: int = 0
+    skipped_reports: int = 0
+    rejections: Dict[str, int] = field(default_factory=dict)
+
+    def reject(self, reason: str) -> None:
+        self.rejected += 1
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+
+class LabResultImporter:
+    """Stream normalized records into ``Report``/``ResultValue`` via PostgreSQL ``COPY``.
+
+    Patients and analytes are resolved against in-memory indexes built once up front. Records
+    are grouped into reports by ``report_ref`` (or patient, lab and issue date) and flushed in
+    chunks; a chunk only ends between reports. Resuming reloads the reports this file already
+    created, so results of a report that straddles the checkpoint still join that report, and
+    results already stored on them are not inserted again (a chunk can be replayed when the
+    process stopped after its commit but before the checkpoint was written).
+
+    Reports already imported by an earlier run are skipped: matched on ``report_ref`` when the
+    input has one, otherwise on patient, lab and issue date.
+    """
+
+    def __init__(
+        self,
+        source_name: str,
+        chunk_size: int = 5000,
+        create_patients: bool = False,
+        default_lab_name: str = "",
+        rejects=None,
+    ):
+        self.source_name = source_name
+        self.chunk_size = chunk_size
+        self.create_patients = create_patients
+        self.default_lab_name = default_lab_name
+        self.rejects = rejects
+        self.stats = ImportStats()
+        self._patients_by_id: Dict[str, uuid.UUID] = {}
+        self._patients_by_identity: Dict[Tuple[str, date], uuid.UUID] = {}
+        self._analytes: Dict[str, Tuple[int, str]] = {}
+        self._existing_keys: set = set()
+        self._report_ids: Dict[tuple, uuid.UUID] = {}
+        self._resumed_reports: set = set()
+
+    # -- indexes ------------------------------------------------------------
+
+    def build_indexes(self, resume: bool = False) -> None:
+        for pk, name, birth_date in Patient.objects.values_list("id", "name", "birth_date"):
+            self._patients_by_id[str(pk)] = pk
+            self._patients_by_identity[(name.strip().lower(), birth_date)] = pk
+        for pk, name, unit in Analyte.objects.values_list("id", "name", "unit"):
+            self._analytes[name.strip().lower()] = (pk, unit)
+        imported = Report.objects.filter(raw_json__source=IMPORT_SOURCE).values_list(
+            "id", "patient_id", "org_name", "issued_at", "raw_json__report_ref", "raw_json__file"
+        )
+        for pk, patient_id, org_name, issued_at, ref, file in imported:
+            key = (patient_id, ref) if ref else (patient_id, org_name, issued_at)
+            if resume and file == self.source_name:
+                self._report_ids[key] = pk
+                self._resumed_reports.add(pk)
+            else:
+                self._existing_keys.add(key)
+
+    def _resolve_patient(self, record: Dict[str, Any]) -> uuid.UUID:
+        patient_id = str(record.get("patient_id") or "").strip()
+        if patient_id in self._patients_by_id:
+            return self._patients_by_id[patient_id]
+        name = (record.get("patient_name") or "").strip()
+        try:
+            birth_date = parse_date(str(record.get("birth_date") or "").strip())
+        except ValueError:
+            birth_date = None
+        if name and birth_date:
+            key = (name.lower(), birth_date)
+            if key in self._patients_by_identity:
+                return self._patients_by_identity[key]
+            if self.create_patients:
+                sex = (record.get("sex") or "").upper()[:1]
+                patient = Patient.objects.create(
+                    name=name,
+                    birth_date=birth_date,
+                    sex=sex if sex in Patient.Sex.values else Patient.Sex.OTHER,
+                )
+                self._patients_by_identity[key] = patient.pk
+                self._patients_by_id[str(patient.pk)] = patient.pk
+                return patient.pk
+        raise RecordError("unknown patient")
+
+    def _resolve_analyte(self, name: str, unit: str) -> Tuple[int, str]:
+        key = name.strip().lower()
+        if not key:
+            raise RecordError("missing analyte")
+        if key not in self._analytes:
+            analyte, _ = Analyte.objects.get_or_create(
+                name=name.strip(), defaults={"unit": unit or "", "description": "Auto-created"}
+            )
+            self._analytes[key] = (analyte.pk, analyte.unit)
+        return self._analytes[key]
+
+    # -- record handling ----------------------------------------------------
+
+    def _prepare(self, record: Dict[str, Any]) -> Tuple[tuple, Dict[str, Any]]:
+        patient_id = self._resolve_patient(record)
+        issued_at = coerce_datetime(record.get("issued_at"), timezone.now())
+        measured_at = coerce_datetime(record.get("measured_at"), issued_at)
+        lab_name = (record.get("lab_name") or self.default_lab_name or "Unknown Lab").strip()
+        analyte_name = str(record.get("analyte") or "")
+        unit = (record.get("unit") or "").strip()
+        analyte_id, analyte_unit = self._resolve_analyte(analyte_name, unit)
+        value = coerce_decimal(record.get("value"))
+        if value is None:
+            raise RecordError("missing value")
+        ref_min = coerce_decimal(record.get("ref_min"))
+        ref_max = coerce_decimal(record.get("ref_max"))
+        if ref_min is None or ref_max is None:
+            defaults = DEFAULT_ANALYTES.get(analyte_name.strip().lower())
+            if defaults is None:
+                raise RecordError("missing reference range")
+            ref_min = ref_min if ref_min is not None else Decimal(str(defaults["ref_min"]))
+            ref_max = ref_max if ref_max is not None else Decimal(str(defaults["ref_max"]))
+        if ref_min > ref_max:
+            raise RecordError("invalid reference range")
+        report_ref = str(record.get("report_ref") or "").strip()
+        key = (patient_id, report_ref) if report_ref else (patient_id, lab_name, issued_at)
+        unit = (unit or analyte_unit)[:64]
+        canonical_value, canonical_unit = canonicalize(analyte_name, unit, value, analyte_unit)
+        result = {
+            "analyte_id": analyte_id,
+            "value": value,
+            "unit": unit,
+            "canonical_value": canonical_value,
+            "canonical_unit": canonical_unit,
+            "ref_min": ref_min,
+            "ref_max": ref_max,
+            "flag": compute_flag(value, ref_min, ref_max),
+            "measured_at": measured_at,
+            "report": {
+                "patient_id": patient_id,
+                "org_name": lab_name[:255],
+                "issued_at": issued_at,
+                "report_ref": report_ref,
+            },
+        }
+        return key, result
+
+    def run(self, records: Iterator[Dict[str, Any]], skip: int = 0, on_chunk=None) -> ImportStats:
+        """Import ``records``, skipping the first ``skip`` (already committed) ones.
+
+        ``on_chunk(position, stats)`` is called after every committed chunk with the number of
+        input records fully handled so far, which is what a checkpoint should store.
+        """
+        self.build_indexes(resume=skip > 0)
+        chunk: Dict[tuple, List[Dict[str, Any]]] = {}
+        chunk_results = 0
+        last_key = None
+        position = skip
+        for index, record in enumerate(records):
+            if index < skip:
+                continue
+            try:
+                key, result = self._prepare(record)
+            except RecordError as exc:
+                self.stats.records += 1
+                self.stats.reject(str(exc))
+                self._write_reject(record, str(exc))
+                continue
+            if chunk_results >= self.chunk_size and key != last_key and key not in chunk:
+                self._flush(chunk)
+                if on_chunk:
+                    on_chunk(index, self.stats)
+                chunk, chunk_results = {}, 0
+            chunk.setdefault(key, []).append(result)
+            chunk_results += 1
+            last_key = key
+            self.stats.records += 1
+            position = index + 1
+        self._flush(chunk)
+        if on_chunk:
+            on_chunk(max(position, skip + self.stats.records), self.stats)
+        return self.stats
+
+    def _write_reject(self, record: Dict[str, Any], reason: str) -> None:
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({"reason": reason, "record": record}, default=str) + "\n")
+
+    def _flush(self, chunk: Dict[tuple, List[Dict[str, Any]]]) -> None:
+        now = timezone.now()
+        report_rows = []
+        result_rows = []
+        touched = set()
+        stored_results = self._stored_results(chunk)
+        for key, results in chunk.items():
+            meta = results[0]["report"]
+            report_id = self._report_ids.get(key)
+            if report_id is None:
+                if key in self._existing_keys:
+                    # Imported by an earlier run: re-running a file must not duplicate reports.
+                    self.stats.skipped_reports += 1
+                    continue
+                report_id = self._report_ids[key] = uuid.uuid4()
+                raw_json = {
+                    "source": IMPORT_SOURCE,
+                    "file": self.source_name,
+                    "report_ref": meta["report_ref"] or None,
+                }
+                report_rows.append(
+                    (
+                        report_id,
+                        meta["patient_id"],
+                        meta["org_name"],
+                        meta["issued_at"],
+                        "",
+                        json.dumps(raw_json),
+                        json.dumps({"lab_name": meta["org_name"], "source": IMPORT_SOURCE}),
+                        "{}",
+                        "",
+                        now,
+                    )
+                )
+            touched.add(report_id)
+            stored = stored_results.get(report_id, set())
+            for result in results:
+                if (result["analyte_id"], result["measured_at"]) in stored:
+                    continue
+                result_rows.append(
+                    (
+                        report_id,
+                        result["analyte_id"],
+                        result["value"],
+                        result["unit"],
+                        result["ref_min"],
+                        result["ref_max"],
+                        result["flag"],
+                        result["measured_at"],
+                        result["canonical_value"],
+                        result["canonical_unit"],
+                    )
+                )
+        if not result_rows:
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if report_rows:
+                    self._copy(cursor, Report._meta.db_table, REPORT_COPY_COLUMNS, report_rows)
+                self._copy(cursor, ResultValue._meta.db_table, RESULT_COPY_COLUMNS, result_rows)
+            update_search_vectors(touched, texts={})
+            mark_rollups_stale(row[1] for row in result_rows)
+        self.stats.reports += len(report_rows)
+        self.stats.results += len(result_rows)
+
+    def _stored_results(self, chunk: Dict[tuple, List[Dict[str, Any]]]) -> Dict[uuid.UUID, set]:
+        """``(analyte_id, measured_at)`` of results already on the resumed reports in ``chunk``."""
+        report_ids = [
+            self._report_ids[key]
+            for key in chunk
+            if self._report_ids.get(key) in self._resumed_reports
+        ]
+        stored: Dict[uuid.UUID, set] = {}
+        if report_ids:
+            rows = ResultValue.objects.filter(report_id__in=report_ids).values_list(
+                "report_id", "analyte_id", "measured_at"
+            )
+            for report_id, analyte_id, measured_at in rows:
+                stored.setdefault(report_id, set()).add((analyte_id, measured_at))
+        return stored
+
+    @staticmethod
+    def _copy(cursor, table: str, columns: tuple, rows: list) -> None:
+        statement = f'COPY "{table}" ({", ".join(columns)}) FROM STDIN'
+        with cursor.cursor.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(row)
@@ -4,11 +4,24 @@ import json
 import logging
 from typing import Any, Dict, Optional
 
-from django.conf import settings
-from openai import OpenAI
+from core.instrumentation import timed
+from core.metrics import record_failure
+
+from .llm import (
+    DEFAULT_MODEL,
+    LLMUnavailable,
+    aguarded_call,
+    get_api_key,
+    get_async_client,
+    get_client,
+    guarded_call,
+)
 
 logger = logging.getLogger(__name__)
 
+# Recorded with every parsing call in LLMCallLog; bump it whenever LAB_PARSER_PROMPT changes.
+LAB_PARSER_PROMPT_VERSION = "2025-11-v1"
+
 LAB_PARSER_PROMPT = """
 You are an expert document-vision assistant. Given OCR text extracted from a lab report
 (including tables rendered as plain text), you must detect analytes, their measured values,
@@ -41,24 +54,57 @@ Rules:
 """
 
 
+def _build_messages(ocr_text: str) -> list[Dict[str, str]]:
+    truncated_text = ocr_text[:40000]  # prevent overly large payloads
+    return [
+        {"role": "system", "content": LAB_PARSER_PROMPT},
+        {"role": "user", "content": truncated_text},
+    ]
+
+
 def parse_lab_document_with_ai(ocr_text: str) -> Optional[Dict[str, Any]]:
-    api_key = getattr(settings, "OPENAI_API_KEY", None)
-    if not api_key or not ocr_text:
+    if not get_api_key() or not ocr_text:
         return None
-    client = OpenAI(api_key=api_key)
-    truncated_text = ocr_text[:40000]  # prevent overly large payloads
+    client = get_client()
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0,
-            messages=[
-                {"role": "system", "content": LAB_PARSER_PROMPT},
-                {"role": "user", "content": truncated_text},
-            ],
-        )
-        content = completion.choices[0].message.content or "{}"
-        data = json.loads(content)
-        return data
+        with (
+            timed("ai"),
+            guarded_call("ai_parse", prompt_version=LAB_PARSER_PROMPT_VERSION) as call,
+        ):
+            completion = client.chat.completions.create(
+                model=DEFAULT_MODEL,
+                temperature=0,
+                messages=_build_messages(ocr_text),
+            )
+            call.completion = completion
+            # Parsed inside the guard: malformed output is a failed call, not a success.
+            return json.loads(completion.choices[0].message.content or "{}")
+    except LLMUnavailable:
+        return None
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("AI lab parsing failed: %s", exc)
+        record_failure("ai_parse", type(exc).__name__)
+        return None
+
+
+async def aparse_lab_document_with_ai(ocr_text: str) -> Optional[Dict[str, Any]]:
+    if not get_api_key() or not ocr_text:
+        return None
+    client = get_async_client()
+    try:
+        with timed("ai"):
+            async with aguarded_call("ai_parse", prompt_version=LAB_PARSER_PROMPT_VERSION) as call:
+                completion = await client.chat.completions.create(
+                    model=DEFAULT_MODEL,
+                    temperature=0,
+                    messages=_build_messages(ocr_text),
+                )
+                call.completion = completion
+                # Parsed inside the guard: malformed output is a failed call, not a success.
+                return json.loads(completion.choices[0].message.content or "{}")
+    except LLMUnavailable:
+        return None
     except Exception as exc:  # noqa: BLE001
         logger.exception("AI lab parsing failed: %s", exc)
+        record_failure("ai_parse", type(exc).__name__)
         return None
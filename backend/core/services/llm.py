@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core.metrics import record_failure
+
+from .llm_guard import LLMUnavailable, get_guard
+from .llm_telemetry import record_call
+
+if TYPE_CHECKING:  # pragma: no cover
+    from openai import AsyncOpenAI, OpenAI
+
+# ``openai`` pulls in httpx and pydantic; it is imported when a client is first built so that
+# management commands, migrations and workers that never call the API start without it.
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+@dataclass
+class LLMUsage:
+    """Token totals for the calls made inside a ``track_usage()`` block."""
+
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, usage: Any) -> None:
+        self.calls += 1
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class LLMCall:
+    """Handle yielded by ``guarded_call``; callers attach the provider response to it."""
+
+    stage: str
+    model: str = DEFAULT_MODEL
+    prompt_version: str = ""
+    completion: Any = None
+    attempts: int = 0
+    latency_ms: float = 0.0
+
+
+_usage: ContextVar[Optional[LLMUsage]] = ContextVar("llm_usage", default=None)
+_current_call: ContextVar[Optional[LLMCall]] = ContextVar("llm_current_call", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[LLMUsage]:
+    """Accumulate token usage of every guarded call made in this context (and its tasks)."""
+    usage = LLMUsage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def get_api_key() -> Optional[str]:
+    return getattr(settings, "OPENAI_API_KEY", None)
+
+
+def _client_options() -> dict:
+    # The SDK defaults (600s timeout, 2 retries with backoff) make a provider incident cost
+    # minutes per request; keep both short and let the circuit breaker absorb outages.
+    return {
+        "api_key": get_api_key(),
+        "timeout": getattr(settings, "OPENAI_TIMEOUT_SECONDS", 20),
+        "max_retries": getattr(settings, "OPENAI_MAX_RETRIES", 1),
+        "base_url": getattr(settings, "OPENAI_BASE_URL", "") or None,
+    }
+
+
+def _count_attempt(request) -> None:
+    # The SDK retries internally; every HTTP attempt passes through this hook.
+    call = _current_call.get()
+    if call is not None:
+        call.attempts += 1
+
+
+async def _acount_attempt(request) -> None:
+    _count_attempt(request)
+
+
+def get_client() -> "OpenAI":
+    from openai import DefaultHttpxClient, OpenAI
+
+    http_client = DefaultHttpxClient(event_hooks={"request": [_count_attempt]})
+    return OpenAI(http_client=http_client, **_client_options())
+
+
+def get_async_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    http_client = DefaultAsyncHttpxClient(event_hooks={"request": [_acount_attempt]})
+    return AsyncOpenAI(http_client=http_client, **_client_options())
+
+
+@contextmanager
+def guarded_call(
+    stage: str, model: str = DEFAULT_MODEL, prompt_version: str = ""
+) -> Iterator[LLMCall]:
+    """Wrap one provider request with the shared rate limiter and circuit breaker.
+
+    Raises ``LLMUnavailable`` without calling the provider when no token is available or the
+    breaker is open; exceptions raised inside the block count as provider failures, so parse
+    the response inside it too. Set ``call.completion`` on the yielded handle so its token
+    usage is accounted for. Every call, including refused ones, is recorded in the
+    ``LLMCallLog`` telemetry table.
+    """
+    call = LLMCall(stage, model=model, prompt_version=prompt_version)
+    guard = get_guard()
+    if guard is not None:
+        try:
+            guard.acquire()
+        except LLMUnavailable as exc:
+            _refused(call, exc)
+            raise
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as exc:
+        call.latency_ms = (time.perf_counter() - started) * 1000
+        if guard is not None:
+            guard.record_failure()
+        _finished(call, "error", type(exc).__name__)
+        raise
+    finally:
+        _current_call.reset(token)
+    call.latency_ms = (time.perf_counter() - started) * 1000
+    if guard is not None:
+        guard.record_success()
+    _finished(call, "success")
+
+
+@asynccontextmanager
+async def aguarded_call(
+    stage: str, model: str = DEFAULT_MODEL, prompt_version: str = ""
+) -> AsyncIterator[LLMCall]:
+    """Async counterpart of ``guarded_call``; the guard's file lock is taken off the loop."""
+    call = LLMCall(stage, model=model, prompt_version=prompt_version)
+    guard = get_guard()
+    if guard is not None:
+        try:
+            await sync_to_async(guard.acquire, thread_sensitive=False)()
+        except LLMUnavailable as exc:
+            _refused(call, exc)
+            raise
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as exc:
+        call.latency_ms = (time.perf_counter() - started) * 1000
+        if guard is not None:
+            await sync_to_async(guard.record_failure, thread_sensitive=False)()
+        _finished(call, "error", type(exc).__name__)
+        raise
+    finally:
+        _current_call.reset(token)
+    call.latency_ms = (time.perf_counter() - started) * 1000
+    if guard is not None:
+        await sync_to_async(guard.record_success, thread_sensitive=False)()
+    _finished(call, "success")
+
+
+def _refused(call: LLMCall, exc: LLMUnavailable) -> None:
+    record_failure(call.stage, exc.reason)
+    record_call(call, "unavailable", exc.reason)
+
+
+def _finished(call: LLMCall, outcome: str, error: str = "") -> None:
+    record_call(call, outcome, error)
+    _add_usage(call)
+
+
+def _add_usage(call: LLMCall) -> None:
+    # Tokens are billed even when the response turns out to be unusable.
+    usage = _usage.get()
+    if usage is not None and call.completion is not None:
+        usage.add(getattr(call.completion, "usage", None))
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms fall back to a process-local lock
+    fcntl = None
+
+DEFAULTS = {
+    "STATE_DIR": os.path.join(tempfile.gettempdir(), "nanolabs-llm-guard"),
+    "RATE_PER_MINUTE": 60,
+    "BURST": 10,
+    "FAILURE_THRESHOLD": 3,
+    "COOLDOWN_SECONDS": 30,
+}
+
+
+class LLMUnavailable(RuntimeError):
+    """Raised instead of calling the provider when the limiter or circuit breaker says no."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM call skipped: {reason}")
+        self.reason = reason
+
+
+class LLMGuard:
+    """Token bucket plus circuit breaker whose state is shared by every process on the host.
+
+    State lives in a small JSON file guarded by ``flock``, so gunicorn workers, management
+    commands and batch jobs draw from one budget without an external service. Decisions
+    never wait: when no token is available or the breaker is open, callers get
+    ``LLMUnavailable`` immediately and use their deterministic fallback.
+
+    After ``failure_threshold`` consecutive failures the breaker opens for
+    ``cooldown_seconds``. Once that passes it is half-open: one caller on the host gets a
+    trial slot (held for at most another ``cooldown_seconds``, in case the caller dies) and
+    everyone else is still refused. Success closes the breaker, another failure reopens it.
+    """
+
+    _local_lock = threading.Lock()
+
+    def __init__(
+        self,
+        state_dir: str,
+        rate_per_minute: float,
+        burst: int,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        name: str = "openai",
+    ):
+        self.path = Path(state_dir) / f"{name}.json"
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._local_lock, open(self.path, "a+", encoding="utf-8") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                handle.seek(0)
+                raw = handle.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                before = dict(state)
+                yield state
+                if state != before:
+                    handle.seek(0)
+                    handle.truncate()
+                    handle.write(json.dumps(state))
+                    handle.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def acquire(self) -> None:
+        """Take one token or raise ``LLMUnavailable`` (``circuit_open`` / ``rate_limited``)."""
+        now = time.time()
+        with self._state() as state:
+            open_until = state.get("open_until", 0)
+            if open_until > now or state.get("trial_until", 0) > now:
+                raise LLMUnavailable("circuit_open")
+            tokens = state.get("tokens", float(self.burst))
+            elapsed = max(now - state.get("updated", now), 0.0)
+            tokens = min(float(self.burst), tokens + elapsed * self.rate_per_second)
+            state["updated"] = now
+            if tokens < 1:
+                state["tokens"] = tokens
+                raise LLMUnavailable("rate_limited")
+            state["tokens"] = tokens - 1
+            if open_until:
+                state["trial_until"] = now + self.cooldown_seconds
+
+    def record_success(self) -> None:
+        with self._state() as state:
+            if state.get("failures"):
+                state["failures"] = 0
+            state.pop("open_until", None)
+            state.pop("trial_until", None)
+
+    def record_failure(self) -> None:
+        with self._state() as state:
+            failures = state.get("failures", 0) + 1
+            state["failures"] = failures
+            if failures >= self.failure_threshold:
+                state["open_until"] = time.time() + self.cooldown_seconds
+                state.pop("trial_until", None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._state() as state:
+            return dict(state)
+
+
+_guards: Dict[Tuple, LLMGuard] = {}
+
+
+def get_guard() -> Optional[LLMGuard]:
+    """Return the guard configured by ``settings.LLM_GUARD`` (``None`` when disabled)."""
+    config = {**DEFAULTS, **getattr(settings, "LLM_GUARD", {})}
+    if not config.get("ENABLED", True):
+        return None
+    key = tuple(config[name] for name in DEFAULTS)
+    if key not in _guards:
+        _guards[key] = LLMGuard(
+            state_dir=config["STATE_DIR"],
+            rate_per_minute=config["RATE_PER_MINUTE"],
+            burst=config["BURST"],
+            failure_threshold=config["FAILURE_THRESHOLD"],
+            cooldown_seconds=config["COOLDOWN_SECONDS"],
+        )
+    return _guards[key]
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Aggregate, Count, FloatField, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import LLMCallLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BATCH_SIZE": 100,
+    "FLUSH_SECONDS": 2.0,
+    "MAX_QUEUE": 10000,
+}
+
+
+def _config() -> Dict[str, Any]:
+    return {**DEFAULTS, **getattr(settings, "LLM_TELEMETRY", {})}
+
+
+def _bulk_insert(records: List[LLMCallLog]) -> None:
+    try:
+        LLMCallLog.objects.bulk_create(records)
+    except Exception:  # noqa: BLE001 - telemetry must never break a model call
+        logger.exception("Could not store %d LLM call records", len(records))
+
+
+class TelemetryWriter:
+    """Buffers call records in memory and inserts them from a daemon thread.
+
+    Records are flushed with one ``bulk_create`` once ``batch_size`` are waiting or
+    ``flush_seconds`` after the first one arrived. When the queue is full new records are
+    dropped (and counted) instead of slowing down the request that produced them.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_seconds: float,
+        max_queue: int,
+        write: Callable[[List[LLMCallLog]], None] = _bulk_insert,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.write = write
+        self.dropped = 0
+        self._queue: "queue.Queue[LLMCallLog]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: LLMCallLog) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("LLM telemetry queue full; %d records dropped", self.dropped)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="llm-telemetry", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> List[LLMCallLog]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self.write(batch)
+            finally:
+                # This thread outlives any request, so don't keep an idle connection open.
+                connection.close()
+
+    def flush(self) -> int:
+        """Write whatever is queued from the calling thread (used at exit and in tests)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            self.write(batch[start : start + self.batch_size])
+        return len(batch)
+
+
+_writer: Optional[TelemetryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> TelemetryWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            config = _config()
+            _writer = TelemetryWriter(
+                batch_size=config["BATCH_SIZE"],
+                flush_seconds=config["FLUSH_SECONDS"],
+                max_queue=config["MAX_QUEUE"],
+            )
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def _usage_counts(completion: Any) -> Dict[str, int]:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def record_call(call: Any, outcome: str, error: str = "") -> None:
+    """Queue a telemetry row for a finished ``core.services.llm.LLMCall``."""
+    config = _config()
+    if not config["ENABLED"]:
+        return
+    completion = call.completion
+    model = getattr(completion, "model", None) if completion is not None else None
+    record = LLMCallLog(
+        stage=call.stage,
+        model=(model or call.model)[:64],
+        prompt_version=call.prompt_version,
+        latency_ms=call.latency_ms,
+        retries=max(call.attempts - 1, 0),
+        outcome=outcome,
+        error=error[:64],
+        fallback_used=outcome != LLMCallLog.Outcome.SUCCESS,
+        created_at=timezone.now(),
+        **_usage_counts(completion),
+    )
+    get_writer().submit(record)
+
+
+class Percentile(Aggregate):
+    function = "percentile_cont"
+    template = "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction: float, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def price_for(model: str) -> Optional[Dict[str, float]]:
+    """Per-million-token prices for ``model``, matching dated snapshots by prefix."""
+    pricing = getattr(settings, "LLM_PRICING", {})
+    matches = [name for name in pricing if model == name or model.startswith(f"{name}-")]
+    return pricing[max(matches, key=len)] if matches else None
+
+
+def call_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+    prices = price_for(model)
+    if prices is None:
+        return 0.0
+    cached_price = prices.get("cached_input", prices["input"])
+    return (
+        (input_tokens - cached_tokens) * prices["input"]
+        + cached_tokens * cached_price
+        + output_tokens * prices["output"]
+    ) / 1_000_000
+
+
+def daily_summary(days: int = 14) -> List[Dict[str, Any]]:
+    """Calls, latency percentiles, tokens and estimated spend per day, newest first.
+
+    Latency percentiles only cover calls that reached the provider; refused calls are
+    counted in ``calls`` and ``fallbacks``. Spend uses ``settings.LLM_PRICING`` and is 0 for
+    models without a price.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    # Filter on created_at itself so its index is used; the day is only for grouping.
+    start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+    calls = LLMCallLog.objects.filter(created_at__gte=start).annotate(day=TruncDate("created_at"))
+    sent = ~Q(outcome=LLMCallLog.Outcome.UNAVAILABLE)
+    rows = {
+        row["day"]: {
+            **row,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cached_tokens": 0,
+            "cost_usd": 0.0,
+        }
+        for row in calls.values("day")
+        .annotate(
+            calls=Count("id"),
+            errors=Count("id", filter=Q(outcome=LLMCallLog.Outcome.ERROR)),
+            fallbacks=Count("id", filter=Q(fallback_used=True)),
+            p50_latency_ms=Percentile("latency_ms", 0.5, filter=sent),
+            p95_latency_ms=Percentile("latency_ms", 0.95, filter=sent),
+        )
+        .order_by()
+    }
+    for usage in (
+        calls.values("day", "model")
+        .annotate(
+            input=Sum("input_tokens"), output=Sum("output_tokens"), cached=Sum("cached_tokens")
+        )
+        .order_by()
+    ):
+        row = rows[usage["day"]]
+        row["input_tokens"] += usage["input"]
+        row["output_tokens"] += usage["output"]
+        row["cached_tokens"] += usage["cached"]
+        row["cost_usd"] += call_cost(
+            usage["model"], usage["input"], usage["output"], usage["cached"]
+        )
+    for row in rows.values():
+        row["cost_usd"] = round(row["cost_usd"], 6)
+    return [rows[day] for day in sorted(rows, reverse=True)]
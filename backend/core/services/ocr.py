@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.metrics import record_failure
+
+from .pdf_backends import PdfiumBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "COMMAND": "tesseract",
+    "LANGUAGES": "eng+spa",
+    "DPI": 300,
+    "WORKERS": 4,
+    "PAGE_TIMEOUT_SECONDS": 30,
+    "MAX_PAGES": 20,
+    "MIN_TEXT_CHARS": 20,
+    "CACHE_SECONDS": 7 * 24 * 3600,
+}
+
+
+@dataclass
+class OCRPage:
+    """Recognized text of one page, plus its words positioned in PDF points."""
+
+    text: str = ""
+    words: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def ocr_config() -> Dict[str, Any]:
+    return {**DEFAULTS, **getattr(settings, "OCR", {})}
+
+
+def ocr_available(config: Dict[str, Any]) -> bool:
+    return bool(config["ENABLED"]) and shutil.which(config["COMMAND"]) is not None
+
+
+def needs_ocr(page_text: str, config: Dict[str, Any]) -> bool:
+    """A page whose text layer is (nearly) empty is treated as a scan."""
+    return len(page_text.strip()) < config["MIN_TEXT_CHARS"]
+
+
+def render_pages(data: bytes, numbers: List[int], dpi: int) -> Dict[int, bytes]:
+    """Grayscale PNGs of the given (0-based) pages, rendered by pdfium."""
+    pngs = {}
+    for number, image in PdfiumBackend().render_pages(data, numbers, dpi).items():
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", dpi=(dpi, dpi))
+        pngs[number] = buffer.getvalue()
+    return pngs
+
+
+def parse_tsv(tsv: str, dpi: int) -> OCRPage:
+    """Turn Tesseract's TSV output into lines of text and words in PDF points.
+
+    Every word takes the top of its line, so words on one printed row group together when
+    ``tables_from_words`` rebuilds the result table.
+    """
+    scale = 72 / dpi
+    lines: Dict[tuple, List[Dict[str, Any]]] = {}
+    line_tops: Dict[tuple, float] = {}
+    for row in tsv.splitlines()[1:]:
+        columns = row.split("\t")
+        if len(columns) < 12:
+            continue
+        level, block, paragraph, line = (int(value) for value in columns[0:1] + columns[2:5])
+        left, top, width = (int(value) for value in columns[6:9])
+        key = (block, paragraph, line)
+        if level == 4:
+            line_tops[key] = top * scale
+        elif level == 5 and columns[11].strip():
+            lines.setdefault(key, []).append(
+                {
+                    "text": columns[11].strip(),
+                    "x0": left * scale,
+                    "x1": (left + width) * scale,
+                    "top": top * scale,
+                }
+            )
+    ordered = []
+    for key, words in lines.items():
+        top = line_tops.get(key, words[0]["top"])
+        for word in words:
+            word["top"] = top
+        ordered.append(words)
+    ordered.sort(key=lambda words: words[0]["top"])
+    return OCRPage(
+        text="\n".join(" ".join(word["text"] for word in words) for words in ordered),
+        words=[word for words in ordered for word in words],
+    )
+
+
+def _run_tesseract(image: bytes, config: Dict[str, Any]) -> OCRPage:
+    completed = subprocess.run(
+        [config["COMMAND"], "stdin", "stdout", "-l", config["LANGUAGES"], "--psm", "6", "tsv"],
+        input=image,
+        capture_output=True,
+        timeout=config["PAGE_TIMEOUT_SECONDS"],
+        check=True,
+    )
+    return parse_tsv(completed.stdout.decode("utf-8", errors="replace"), config["DPI"])
+
+
+def _cache_key(image: bytes, config: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(image).hexdigest()
+    return f"ocr-page:{config['LANGUAGES']}:{digest}"
+
+
+def ocr_images(images: Dict[int, bytes], config: Dict[str, Any]) -> Dict[int, OCRPage]:
+    """OCR rendered pages (keyed by page number) in parallel; failed pages are left out.
+
+    Each page runs in its own ``tesseract`` process, at most ``WORKERS`` at a time, and is
+    killed after ``PAGE_TIMEOUT_SECONDS``. Results are cached by the hash of the rendered
+    image, so re-uploads and pages repeated across documents are recognized once.
+    """
+    keys = {number: _cache_key(image, config) for number, image in images.items()}
+    cached = cache.get_many(keys.values())
+    results = {number: OCRPage(**cached[key]) for number, key in keys.items() if key in cached}
+    pending = {number: key for number, key in keys.items() if key not in cached}
+    if not pending:
+        return results
+    with ThreadPoolExecutor(max_workers=min(config["WORKERS"], len(pending))) as pool:
+        futures = {
+            pool.submit(_run_tesseract, images[number], config): number for number in pending
+        }
+        for future in as_completed(futures):
+            number = futures[future]
+            try:
+                page = future.result()
+            except subprocess.TimeoutExpired:
+                logger.warning("OCR of page %d timed out", number + 1)
+                record_failure("ocr", "timeout")
+                continue
+            except (OSError, subprocess.CalledProcessError) as exc:
+                logger.warning("OCR of page %d failed: %s", number + 1, exc)
+                record_failure("ocr", "tesseract_error")
+                continue
+            results[number] = page
+            cache.set(pending[number], asdict(page), config["CACHE_SECONDS"])
+    return results
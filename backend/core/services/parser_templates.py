@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ParserTemplate
+
+from .table_parser import Layout
+
+DEFAULT_CACHE_SECONDS = 3600
+DEFAULT_HIT_FLUSH_EVERY = 50
+# Cached for fingerprints without a template, so unknown layouts cost one query per timeout.
+_MISSING: Layout = []
+# Fingerprints this process counted hits for, written by ``flush_template_hits`` at exit.
+_pending: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def _cache_key(fingerprint: str) -> str:
+    return f"parser-template:{fingerprint}"
+
+
+def _hits_key(fingerprint: str) -> str:
+    return f"parser-template-hits:{fingerprint}"
+
+
+def _timeout() -> int:
+    return getattr(settings, "PARSER_ROUTING", {}).get(
+        "TEMPLATE_CACHE_SECONDS", DEFAULT_CACHE_SECONDS
+    )
+
+
+def _hit_flush_every() -> int:
+    return getattr(settings, "PARSER_ROUTING", {}).get(
+        "TEMPLATE_HIT_FLUSH_EVERY", DEFAULT_HIT_FLUSH_EVERY
+    )
+
+
+def find_template(fingerprint: str) -> Optional[Layout]:
+    """The stored layout for ``fingerprint``, served from the cache when possible."""
+    layout = cache.get(_cache_key(fingerprint))
+    if layout is None:
+        stored = (
+            ParserTemplate.objects.filter(fingerprint=fingerprint)
+            .values_list("layout", flat=True)
+            .first()
+        )
+        layout = stored or _MISSING
+        cache.set(_cache_key(fingerprint), layout, _timeout())
+    return layout or None
+
+
+def learn_template(fingerprint: str, lab_name: Optional[str], layout: Layout) -> None:
+    """Store (or replace) the layout read from a confidently parsed document."""
+    ParserTemplate.objects.update_or_create(
+        fingerprint=fingerprint,
+        defaults={"lab_name": (lab_name or "")[:255], "layout": layout},
+    )
+    cache.set(_cache_key(fingerprint), layout, _timeout())
+
+
+def _count_hit(fingerprint: str) -> int:
+    with _pending_lock:
+        _pending.add(fingerprint)
+    key = _hits_key(fingerprint)
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, 1, None)
+        return 1
+
+
+def _write_counts(fingerprint: str, hits: int, misses: int) -> None:
+    if hits:
+        try:
+            cache.decr(_hits_key(fingerprint), hits)
+        except ValueError:
+            pass
+    ParserTemplate.objects.filter(fingerprint=fingerprint).update(
+        hits=F("hits") + hits,
+        misses=F("misses") + misses,
+        last_used_at=timezone.now(),
+    )
+
+
+def record_template_use(fingerprint: str, matched: bool) -> None:
+    """Count a template hit or miss on the ``ParserTemplate`` row.
+
+    Hits are counted in the cache and written every ``TEMPLATE_HIT_FLUSH_EVERY`` hits, so a
+    document read with a known layout does not write to the database. A miss is written at
+    once, together with the hits still pending. Hits pending when the process exits are
+    written by ``flush_template_hits``; a process that is killed loses them, so the counter
+    is approximate. With a per-process cache such as ``LocMemCache`` every worker keeps its
+    own pending count.
+    """
+    if matched:
+        hits = _count_hit(fingerprint)
+        if hits >= _hit_flush_every():
+            _write_counts(fingerprint, hits, 0)
+    else:
+        _write_counts(fingerprint, cache.get(_hits_key(fingerprint), 0), 1)
+
+
+def flush_template_hits() -> None:
+    """Write the hits still pending for templates this process used (run at exit)."""
+    with _pending_lock:
+        fingerprints = list(_pending)
+        _pending.clear()
+    for fingerprint in fingerprints:
+        hits = cache.get(_hits_key(fingerprint), 0)
+        if hits:
+            _write_counts(fingerprint, hits, 0)
+
+
+atexit.register(flush_template_hits)
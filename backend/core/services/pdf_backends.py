@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import io
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .table_parser import Table, tables_from_words
+
+# Which backend each extraction stage uses unless the caller picks one: plain text for the
+# regex parser and the LLM prompt, tables for the table parser.
+DEFAULT_BACKENDS = {"text": "pypdfium2", "tables": "pdfplumber"}
+
+# pdfium is not thread-safe and uploads are parsed on a thread pool.
+_pdfium_lock = threading.Lock()
+
+
+def _load_pdfplumber():
+    """Import pdfplumber (and pdfminer) on first use so workers that never parse skip it."""
+    try:
+        import pdfplumber
+    except ImportError:  # pragma: no cover - fallback when optional dep missing
+        return None
+    return pdfplumber
+
+
+def _load_pdfium():
+    try:
+        import pypdfium2
+    except ImportError:  # pragma: no cover - fallback when optional dep missing
+        return None
+    return pypdfium2
+
+
+class PdfplumberBackend:
+    """pdfminer character layout: slower, but it sees rulings and word positions."""
+
+    name = "pdfplumber"
+
+    def available(self) -> bool:
+        return _load_pdfplumber() is not None
+
+    def page_texts(self, data: bytes) -> List[str]:
+        with _load_pdfplumber().open(io.BytesIO(data)) as pdf:
+            return [page.extract_text() or "" for page in pdf.pages]
+
+    def page_tables(self, data: bytes, numbers: Iterable[int]) -> Dict[int, List[Table]]:
+        """Tables of the given (0-based) pages; unruled pages are rebuilt from their words."""
+        numbers = sorted(numbers)
+        if not numbers:
+            return {}
+        tables: Dict[int, List[Table]] = {}
+        with _load_pdfplumber().open(io.BytesIO(data), pages=[n + 1 for n in numbers]) as pdf:
+            for number, page in zip(numbers, pdf.pages):
+                found = page.extract_tables()
+                if not found:
+                    # Most lab reports lay results out in aligned columns without rulings.
+                    found = tables_from_words(page.extract_words(keep_blank_chars=True))
+                tables[number] = found
+        return tables
+
+
+class PdfiumBackend:
+    """pdfium's text layer only: no layout objects, so tens of times faster than pdfplumber."""
+
+    name = "pypdfium2"
+
+    def available(self) -> bool:
+        return _load_pdfium() is not None
+
+    def page_texts(self, data: bytes) -> List[str]:
+        texts = []
+        with _pdfium_lock:
+            pdf = _load_pdfium().PdfDocument(data)
+            try:
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    texts.append(textpage.get_text_bounded().replace("\r\n", "\n"))
+                    textpage.close()
+                    page.close()
+            finally:
+                pdf.close()
+        return texts
+
+    def render_pages(self, data: bytes, numbers: Iterable[int], dpi: int) -> Dict[int, Any]:
+        """Grayscale PIL images of the given pages, for OCR."""
+        images = {}
+        with _pdfium_lock:
+            pdf = _load_pdfium().PdfDocument(data)
+            try:
+                for number in numbers:
+                    page = pdf[number]
+                    bitmap = page.render(scale=dpi / 72, grayscale=True)
+                    images[number] = bitmap.to_pil()
+                    page.close()
+            finally:
+                pdf.close()
+        return images
+
+
+TEXT_BACKENDS = {backend.name: backend for backend in (PdfiumBackend(), PdfplumberBackend())}
+TABLE_BACKENDS = {"pdfplumber": TEXT_BACKENDS["pdfplumber"]}
+
+
+def get_backend(stage: str, name: Optional[str] = None):
+    """The backend for ``stage`` ("text" or "tables"): ``name``, else ``PDF_BACKENDS``.
+
+    A text backend that isn't installed falls back to pdfplumber; asking for a table backend
+    that can't read tables is a configuration error.
+    """
+    registry = TEXT_BACKENDS if stage == "text" else TABLE_BACKENDS
+    name = name or {**DEFAULT_BACKENDS, **getattr(settings, "PDF_BACKENDS", {})}[stage]
+    if name not in registry:
+        raise ImproperlyConfigured(f"Unknown PDF {stage} backend {name!r}.")
+    backend = registry[name]
+    if stage == "text" and not backend.available():
+        backend = TEXT_BACKENDS["pdfplumber"]
+    return backend
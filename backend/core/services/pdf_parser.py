@@ -1,18 +1,30 @@
 from __future__ import annotations
 
+import logging
 import re
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-try:
-    import pdfplumber
-except ImportError:  # pragma: no cover - fallback when optional dep missing
-    pdfplumber = None
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
-from .lab_vision import parse_lab_document_with_ai
+from core.metrics import observe_stage, record_failure, record_parse
 
+from .lab_vision import aparse_lab_document_with_ai, parse_lab_document_with_ai
+from .ocr import needs_ocr, ocr_available, ocr_config, ocr_images, render_pages
+from .parser_templates import find_template, learn_template, record_template_use
+from .pdf_backends import get_backend
+from .table_parser import (
+    Table,
+    TableExtraction,
+    extract_table_analytes,
+    layout_fingerprint,
+    tables_from_words,
+)
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_ANALYTES = {
     "glucose": {
@@ -25,25 +37,25 @@ DEFAULT_ANALYTES = {
         "unit": "mg/dL",
         "ref_min": 125,
         "ref_max": 200,
-        "aliases": ["cholesterol", "total cholesterol", "cholesterol total"],
+        "aliases": ["cholesterol", "total cholesterol", "cholesterol total", "colesterol total"],
     },
     "hdl": {
         "unit": "mg/dL",
         "ref_min": 40,
         "ref_max": 60,
-        "aliases": ["hdl", "good cholesterol"],
+        "aliases": ["hdl", "good cholesterol", "colesterol hdl"],
     },
     "ldl": {
         "unit": "mg/dL",
         "ref_min": 0,
         "ref_max": 130,
-        "aliases": ["ldl", "bad cholesterol"],
+        "aliases": ["ldl", "bad cholesterol", "colesterol ldl"],
     },
     "triglycerides": {
         "unit": "mg/dL",
         "ref_min": 0,
         "ref_max": 150,
-        "aliases": ["triglycerides", "triacylglycerols"],
+        "aliases": ["triglycerides", "triacylglycerols", "triglicéridos", "trigliceridos"],
     },
     "hemoglobin": {
         "unit": "g/dL",
@@ -57,19 +69,69 @@ DATE_PATTERNS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%d.%m.%Y"]
 DATE_HINT_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2}\.\d{1,2}\.\d{2,4})")
 EXCLUDED_DATE_HINTS = {"dob", "date of birth", "birth", "nacimiento"}
 UNIT_PATTERN = re.compile(r"(mg/dL|g/dL|mmol/L|%)", re.IGNORECASE)
+# Pages without a line like this (narrative notes, blank pages) are not searched for tables.
+RESULT_LINE_HINT = re.compile(r"[^\W\d_]{2,}.*\d|\d.*[^\W\d_]{2,}")
+DEFAULT_PARSER_ROUTING = {
+    "TABLE_MIN_CONFIDENCE": 0.8,
+    "TABLE_MIN_ANALYTES": 1,
+    "TEMPLATES_ENABLED": True,
+}
+
 
+def _read_bytes(file_obj) -> bytes:
+    file_obj.seek(0)
+    data = file_obj.read()
+    file_obj.seek(0)
+    return data
 
-def _extract_text(file_obj) -> str:
-    if pdfplumber is None:
+
+def _extract_text(file_obj, backend: Optional[str] = None) -> str:
+    """Plain text of the PDF from the ``text`` backend (no tables, no OCR)."""
+    text_backend = get_backend("text", backend)
+    if not text_backend.available():
         return ""
     try:
-        with pdfplumber.open(file_obj) as pdf:
-            texts = [page.extract_text() or "" for page in pdf.pages]
-            return "\n".join(texts)
+        return "\n".join(text_backend.page_texts(_read_bytes(file_obj)))
     except Exception:
+        record_failure("extract_text", "unreadable_pdf")
         return ""
-    finally:
-        file_obj.seek(0)
+
+
+def _extract_document(
+    file_obj, backends: Optional[Dict[str, str]] = None
+) -> Tuple[str, List[Table]]:
+    """Page text and tables, each from its stage backend (``PDF_BACKENDS`` or ``backends``).
+
+    Every page's text comes from the fast text backend; only pages with a line holding both
+    a word and a number are handed to the table backend. Pages without a text layer (scans)
+    are rendered and sent to OCR together, and their recognized text and tables take the
+    page's place.
+    """
+    backends = backends or {}
+    text_backend = get_backend("text", backends.get("text"))
+    table_backend = get_backend("tables", backends.get("tables"))
+    if not text_backend.available():
+        return "", []
+    data = _read_bytes(file_obj)
+    try:
+        texts = text_backend.page_texts(data)
+        candidates = [number for number, text in enumerate(texts) if RESULT_LINE_HINT.search(text)]
+        page_tables = table_backend.page_tables(data, candidates)
+    except Exception:
+        record_failure("extract_text", "unreadable_pdf")
+        return "", []
+    config = ocr_config()
+    scans = [number for number, text in enumerate(texts) if needs_ocr(text, config)]
+    if scans and not ocr_available(config):
+        record_failure("ocr", "unavailable")
+    elif scans:
+        with observe_stage("ocr"):
+            images = render_pages(data, scans[: config["MAX_PAGES"]], config["DPI"])
+            recognized = ocr_images(images, config)
+        for number, result in recognized.items():
+            texts[number] = result.text
+            page_tables[number] = tables_from_words(result.words)
+    return "\n".join(texts), [table for n in sorted(page_tables) for table in page_tables[n]]
 
 
 def _parse_number_sequence(line: str) -> List[float]:
@@ -161,6 +223,13 @@ def _generate_fallback_analytes(seed: str, measured_at: datetime) -> List[Dict[s
     return analytes
 
 
+def _fallback_for(uploaded_file, signature: str, measured_at: datetime) -> List[Dict[str, Any]]:
+    logger.warning(
+        "No analytes could be extracted from %s; storing placeholder values.", uploaded_file.name
+    )
+    return _generate_fallback_analytes(signature or uploaded_file.name, measured_at)
+
+
 def _normalize_report_date(value: Optional[str | datetime], fallback: datetime) -> datetime:
     if isinstance(value, datetime):
         dt = value
@@ -175,19 +244,118 @@ def _normalize_report_date(value: Optional[str | datetime], fallback: datetime)
     return dt
 
 
-def parse_pdf(uploaded_file) -> Dict[str, Any]:
-    uploaded_file.seek(0)
-    text = _extract_text(uploaded_file)
+def _read_signature(uploaded_file) -> str:
     sample = uploaded_file.read(128)
+    uploaded_file.seek(0)
     if hasattr(sample, "decode"):
-        signature = sample.decode(errors="ignore")
-    else:
-        signature = str(sample)
+        return sample.decode(errors="ignore")
+    return str(sample)
+
+
+def _routing_setting(name: str):
+    return {**DEFAULT_PARSER_ROUTING, **getattr(settings, "PARSER_ROUTING", {})}[name]
+
+
+def _tables_suffice(table: TableExtraction) -> bool:
+    """Whether the deterministic table read is good enough to skip the LLM."""
+    return (
+        len(table.analytes) >= _routing_setting("TABLE_MIN_ANALYTES")
+        and table.confidence >= _routing_setting("TABLE_MIN_CONFIDENCE")
+    )
+
+
+def _read_tables(text: str, tables: List[Table]) -> TableExtraction:
+    """Read the tables with the lab's saved template, or detect columns and learn one.
+
+    A template that no longer yields a confident read counts as a miss and the generic
+    detection runs; if that read is confident its layout replaces the template.
+    """
+    if not tables or not _routing_setting("TEMPLATES_ENABLED"):
+        return extract_table_analytes(tables, DEFAULT_ANALYTES)
+    lab_name = _parse_lab_name(text)
+    fingerprint = layout_fingerprint(lab_name, tables)
+    layout = find_template(fingerprint)
+    if layout is not None:
+        table = extract_table_analytes(tables, DEFAULT_ANALYTES, layout=layout)
+        matched = _tables_suffice(table)
+        record_template_use(fingerprint, matched)
+        if matched:
+            table.from_template = True
+            return table
+    table = extract_table_analytes(tables, DEFAULT_ANALYTES)
+    if _tables_suffice(table) and table.layout != layout:
+        learn_template(fingerprint, lab_name, table.layout)
+    return table
+
+
+def parse_pdf(uploaded_file) -> Dict[str, Any]:
     uploaded_file.seek(0)
-    parsed_timestamp = timezone.now()
+    with observe_stage("extract_text"):
+        text, tables = _extract_document(uploaded_file)
+    signature = _read_signature(uploaded_file)
+    with observe_stage("table_parse"):
+        table = _read_tables(text, tables)
+    ai_payload = None
+    if not _tables_suffice(table):
+        with observe_stage("ai_parse"):
+            ai_payload = parse_lab_document_with_ai(text)
+    return _build_parsed_payload(uploaded_file, text, signature, ai_payload, table)
+
+
+async def aparse_pdf(uploaded_file) -> Dict[str, Any]:
+    """Async counterpart of ``parse_pdf``; text extraction runs off the event loop."""
+    uploaded_file.seek(0)
+    with observe_stage("extract_text"):
+        text, tables = await sync_to_async(_extract_document, thread_sensitive=False)(
+            uploaded_file
+        )
+    signature = _read_signature(uploaded_file)
+    with observe_stage("table_parse"):
+        table = await sync_to_async(_read_tables)(text, tables)
+    ai_payload = None
+    if not _tables_suffice(table):
+        with observe_stage("ai_parse"):
+            ai_payload = await aparse_lab_document_with_ai(text)
+    return _build_parsed_payload(uploaded_file, text, signature, ai_payload, table)
+
 
-    ai_payload = parse_lab_document_with_ai(text)
+def _table_payload(text: str, table: TableExtraction, parsed_timestamp: datetime) -> Dict[str, Any]:
+    report_date = _normalize_report_date(_parse_report_date(text), parsed_timestamp)
+    analytes = [{**item, "measured_at": report_date.isoformat()} for item in table.analytes]
+    parser = "template" if table.from_template else "table"
+    record_parse(parser, len(analytes))
+    return {
+        "report_date": report_date,
+        "lab_name": _parse_lab_name(text) or "Nano Labs Diagnostics",
+        "analytes": analytes,
+        "summary": f"Read {len(analytes)} analytes from the report tables.",
+        "parser": parser,
+        "confidence": round(table.confidence, 3),
+        "raw_text": text[:10000],
+    }
+
+
+def _build_parsed_payload(
+    uploaded_file,
+    text: str,
+    signature: str,
+    ai_payload: Optional[Dict[str, Any]],
+    table: Optional[TableExtraction] = None,
+) -> Dict[str, Any]:
+    """Choose the analytes to store for a parsed PDF.
+
+    Preference order: confident table rows (``template`` when read with a saved lab
+    template), the LLM, then whichever of the low-confidence table rows and the line regexes
+    found more analytes, and finally placeholder values.
+    """
+    parsed_timestamp = timezone.now()
+    table = table or TableExtraction()
+    if not text:
+        record_failure("extract_text", "no_text")
+    if _tables_suffice(table):
+        return _table_payload(text, table, parsed_timestamp)
     if ai_payload and ai_payload.get("analytes"):
+        parser = "ai"
         report_date = _normalize_report_date(ai_payload.get("report_date"), parsed_timestamp)
         analytes = []
         for item in ai_payload.get("analytes", []):
@@ -208,8 +376,11 @@ def parse_pdf(uploaded_file) -> Dict[str, Any]:
                 }
             )
         if not analytes:
-            analytes = _generate_fallback_analytes(signature or uploaded_file.name, parsed_timestamp)
+            record_failure("ai_parse", "no_usable_analytes")
+            analytes = _fallback_for(uploaded_file, signature, parsed_timestamp)
             report_date = _normalize_report_date(None, parsed_timestamp)
+            parser = "fallback"
+        record_parse(parser, len(analytes))
         lab_name = ai_payload.get("lab_name") or _parse_lab_name(text) or "Nano Labs Diagnostics"
         summary = f"AI parser extracted {len(analytes)} analytes."
         return {
@@ -217,6 +388,7 @@ def parse_pdf(uploaded_file) -> Dict[str, Any]:
             "lab_name": lab_name,
             "analytes": analytes,
             "summary": summary,
+            "parser": parser,
             "uncertainties": ai_payload.get("uncertainties", []),
             "raw_text": text[:10000],
         }
@@ -225,8 +397,13 @@ def parse_pdf(uploaded_file) -> Dict[str, Any]:
     if timezone.is_naive(report_date):
         report_date = timezone.make_aware(report_date, timezone.get_current_timezone())
     analytes = _extract_analytes_from_text(text, report_date)
+    if len(table.analytes) > len(analytes):
+        return _table_payload(text, table, parsed_timestamp)
+    parser = "regex"
     if not analytes:
-        analytes = _generate_fallback_analytes(signature or uploaded_file.name, report_date)
+        analytes = _fallback_for(uploaded_file, signature, report_date)
+        parser = "fallback"
+    record_parse(parser, len(analytes))
     lab_name = _parse_lab_name(text) or "Nano Labs Diagnostics"
     summary = (
         f"Parsed {len(analytes)} analytes from uploaded PDF" if text else f"Stub parser processed {uploaded_file.name}"
@@ -236,5 +413,7 @@ def parse_pdf(uploaded_file) -> Dict[str, Any]:
         "lab_name": lab_name,
         "analytes": analytes,
         "summary": summary,
+        "parser": parser,
         "raw_text": text[:10000],
     }
+
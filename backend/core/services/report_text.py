@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+from core.models import ReportText
+
+
+def store_report_text(report_id, text: str) -> Optional[ReportText]:
+    """Compress and save a report's extracted text (nothing is stored for empty text)."""
+    if not text:
+        return None
+    codec = getattr(settings, "REPORT_TEXT_CODEC", ReportText.Codec.ZLIB)
+    record = ReportText.build(report_id, text, codec)
+    record.save(force_insert=True)
+    return record
+
+
+def load_report_texts(report_ids: Iterable) -> Dict:
+    """``{report_id: text}`` for the given reports that have stored text, in one query."""
+    ids = list(report_ids)
+    if not ids:
+        return {}
+    return {row.report_id: row.text for row in ReportText.objects.filter(report_id__in=ids)}
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import csv
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core.models import ResultValue
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_COLUMNS = (
+    ("report_id", "report_id"),
+    ("report_issued_at", "report__issued_at"),
+    ("org_name", "report__org_name"),
+    ("analyte", "analyte__name"),
+    ("value", "value"),
+    ("unit", "unit"),
+    ("ref_min", "ref_min"),
+    ("ref_max", "ref_max"),
+    ("flag", "flag"),
+    ("measured_at", "measured_at"),
+)
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the formatted line back to the caller."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _chunk_size() -> int:
+    return getattr(settings, "RESULTS_EXPORT_CHUNK_SIZE", 2000)
+
+
+async def export_rows(patient_id) -> AsyncIterator[Tuple[Any, ...]]:
+    """Yield flat result tuples for a patient through a server-side cursor.
+
+    Chunks are pulled from ``QuerySet.iterator()`` in a thread. ``aiterator()`` is not used
+    because on Django 5.0 it runs the ``values_list`` query on the event loop.
+    """
+    chunk_size = _chunk_size()
+    rows = (
+        ResultValue.objects.filter(report__patient_id=patient_id)
+        .order_by("measured_at", "pk")
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+    fetch = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await fetch():
+        for row in chunk:
+            yield row
+
+
+def _serialize(value: Any) -> Any:
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+async def stream_csv(patient_id) -> AsyncIterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    async for row in export_rows(patient_id):
+        yield writer.writerow(["" if value is None else _serialize(value) for value in row])
+
+
+async def stream_ndjson(patient_id) -> AsyncIterator[str]:
+    names = [name for name, _ in EXPORT_COLUMNS]
+    async for row in export_rows(patient_id):
+        record: Dict[str, Any] = {name: _serialize(value) for name, value in zip(names, row)}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+STREAMERS = {"csv": stream_csv, "ndjson": stream_ndjson}
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.models import Analyte, AnalyteRollup, Patient, Report, ResultValue
+
+logger = logging.getLogger(__name__)
+
+# (upper bound in whole years, exclusive; label). The last band is open-ended.
+AGE_BANDS = ((18, "0-17"), (40, "18-39"), (65, "40-64"), (None, "65+"))
+PERCENTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _age_band_sql(age_expr: str) -> str:
+    cases = " ".join(
+        f"WHEN {age_expr} < {upper} THEN '{label}'" for upper, label in AGE_BANDS if upper
+    )
+    return f"CASE {cases} ELSE '{AGE_BANDS[-1][1]}' END"
+
+
+def _refresh_sql(filtered: bool) -> str:
+    age = "date_part('year', age(rv.measured_at, p.birth_date))"
+    where = "AND rv.analyte_id = ANY(%(analyte_ids)s)" if filtered else ""
+    percentiles = ", ".join(str(p) for p in PERCENTILES)
+    return f"""
+        INSERT INTO {AnalyteRollup._meta.db_table} (
+            analyte_id, sex, age_band, result_count, patient_count, high_count, low_count,
+            mean, p05, p25, p50, p75, p95, computed_at
+        )
+        SELECT analyte_id, sex, age_band, result_count, patient_count, high_count, low_count,
+               mean, pct[1], pct[2], pct[3], pct[4], pct[5], now()
+        FROM (
+            SELECT
+                analyte_id,
+                CASE WHEN GROUPING(sex) = 1 THEN '' ELSE sex END AS sex,
+                CASE WHEN GROUPING(age_band) = 1 THEN '' ELSE age_band END AS age_band,
+                count(*) AS result_count,
+                count(DISTINCT patient_id) AS patient_count,
+                count(*) FILTER (WHERE flag = 'high') AS high_count,
+                count(*) FILTER (WHERE flag = 'low') AS low_count,
+                avg(value) AS mean,
+                percentile_cont(ARRAY[{percentiles}]) WITHIN GROUP (ORDER BY value) AS pct
+            FROM (
+                SELECT rv.analyte_id, r.patient_id, p.sex, rv.flag,
+                       rv.canonical_value AS value,
+                       {_age_band_sql(age)} AS age_band
+                FROM {ResultValue._meta.db_table} rv
+                JOIN {Report._meta.db_table} r ON r.id = rv.report_id
+                JOIN {Patient._meta.db_table} p ON p.id = r.patient_id
+                WHERE rv.canonical_value IS NOT NULL {where}
+            ) base
+            GROUP BY GROUPING SETS (
+                (analyte_id), (analyte_id, sex), (analyte_id, age_band),
+                (analyte_id, sex, age_band)
+            )
+        ) grouped
+    """
+
+
+@transaction.atomic
+def refresh_rollups(analyte_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute rollups for ``analyte_ids`` (all analytes when ``None``) in one statement.
+
+    Aggregation happens entirely in PostgreSQL; existing rows for the refreshed analytes are
+    replaced inside the same transaction, so readers never see a half-built distribution.
+    The analytes' stale flags are cleared first, so results committed while the refresh runs
+    mark them again for the next one.
+    """
+    rollups = AnalyteRollup.objects.all()
+    stale = Analyte.objects.filter(rollups_stale=True)
+    params = {}
+    if analyte_ids is not None:
+        ids: List[int] = sorted(set(analyte_ids))
+        if not ids:
+            return 0
+        rollups = rollups.filter(analyte_id__in=ids)
+        stale = stale.filter(pk__in=ids)
+        params["analyte_ids"] = ids
+    stale.update(rollups_stale=False)
+    rollups.delete()
+    with connection.cursor() as cursor:
+        cursor.execute(_refresh_sql(analyte_ids is not None), params)
+        return cursor.rowcount
+
+
+def _rollup_setting(name: str, default):
+    return getattr(settings, "ANALYTICS_ROLLUPS", {}).get(name, default)
+
+
+def mark_rollups_stale(analyte_ids: Iterable[int]) -> None:
+    """Flag ``analyte_ids`` for ``refresh_analyte_rollups --stale`` once the transaction commits.
+
+    Writers only pay for one UPDATE of the (small) analyte table; the percentile scans run in
+    the scheduled command, outside any request.
+    """
+    if not _rollup_setting("REFRESH_ON_WRITE", True):
+        return
+    ids = sorted(set(analyte_ids))
+    if ids:
+        transaction.on_commit(
+            lambda: Analyte.objects.filter(pk__in=ids, rollups_stale=False).update(
+                rollups_stale=True
+            ),
+            robust=True,
+        )
+
+
+@transaction.atomic
+def refresh_stale_rollups() -> Tuple[int, int]:
+    """Refresh the analytes flagged stale; returns ``(analytes, rollup rows)``.
+
+    Flagged analytes are locked with ``SKIP LOCKED``, so overlapping runs split the work.
+    """
+    ids = list(
+        Analyte.objects.select_for_update(skip_locked=True)
+        .filter(rollups_stale=True)
+        .values_list("pk", flat=True)
+    )
+    if not ids:
+        return 0, 0
+    return len(ids), refresh_rollups(ids)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, QuerySet
+from django.utils.html import escape
+
+from core.models import Analyte, Report, ResultValue
+
+from .report_text import load_report_texts
+
+# 'simple' keeps tokens unstemmed: reports mix Spanish and English and analyte names must
+# match exactly.
+SEARCH_CONFIG = "simple"
+# Postgres caps a tsvector at 1 MB; OCR text beyond this is not indexed.
+MAX_INDEXED_CHARS = 200_000
+# ts_headline marks matches with control characters (stripped from the text first), so the
+# fragment can be HTML-escaped before the markers become <mark> tags.
+_START_SEL, _STOP_SEL = "\x02", "\x03"
+HEADLINE_OPTIONS = f'StartSel="{_START_SEL}", StopSel="{_STOP_SEL}", MaxFragments=2'
+_SELECTORS = {ord(_START_SEL): None, ord(_STOP_SEL): None}
+
+# Report text is stored compressed (ReportText), so it is passed in from Python.
+_UPDATE_SQL = f"""
+    UPDATE {Report._meta.db_table} AS r
+    SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(names.names, '')), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', r.org_name), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(texts.text, '')), 'C')
+    FROM (
+        SELECT rep.id, string_agg(DISTINCT replace(a.name, '_', ' '), ' ') AS names
+        FROM {Report._meta.db_table} rep
+        LEFT JOIN {ResultValue._meta.db_table} rv ON rv.report_id = rep.id
+        LEFT JOIN {Analyte._meta.db_table} a ON a.id = rv.analyte_id
+        WHERE rep.id = ANY(%s)
+        GROUP BY rep.id
+    ) AS names
+    LEFT JOIN unnest(%s::uuid[], %s::text[]) AS texts (id, text) ON texts.id = names.id
+    WHERE r.id = names.id
+"""
+
+_HEADLINE_SQL = f"""
+    SELECT texts.id, ts_headline(
+        '{SEARCH_CONFIG}', texts.text, websearch_to_tsquery('{SEARCH_CONFIG}', %s), %s
+    )
+    FROM unnest(%s::uuid[], %s::text[]) AS texts (id, text)
+"""
+
+
+def update_search_vectors(report_ids: Iterable, texts: Optional[Dict] = None) -> int:
+    """Recompute ``Report.search_vector`` (analyte names, lab name, report text) in one UPDATE.
+
+    ``texts`` maps report ids to their extracted text; when omitted it is loaded from
+    ``ReportText``. Pass ``{}`` for reports known to have no text.
+    """
+    ids = list(report_ids)
+    if not ids:
+        return 0
+    if texts is None:
+        texts = load_report_texts(ids)
+    text_ids = list(texts)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _UPDATE_SQL,
+            [ids, text_ids, [texts[key][:MAX_INDEXED_CHARS] for key in text_ids]],
+        )
+        return cursor.rowcount
+
+
+def search_reports(queryset: QuerySet, text: str) -> QuerySet:
+    """Reports in ``queryset`` matching ``text`` (web-search syntax), best matches first.
+
+    The match uses the GIN index on ``search_vector``. Add highlighted snippets to the rows
+    actually returned with ``attach_headlines``.
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-issued_at")
+    )
+
+
+def _highlight(fragment: str) -> str:
+    return escape(fragment).replace(_START_SEL, "<mark>").replace(_STOP_SEL, "</mark>")
+
+
+def attach_headlines(reports: List[Report], text: str) -> List[Report]:
+    """Set ``report.headline`` (``ts_headline`` over the stored text, or ``None``).
+
+    The headline is HTML: the report text is escaped and matches are wrapped in ``<mark>``.
+    """
+    texts = load_report_texts(report.pk for report in reports)
+    headlines = {}
+    if texts:
+        ids = list(texts)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _HEADLINE_SQL,
+                [
+                    text,
+                    HEADLINE_OPTIONS,
+                    ids,
+                    [texts[key][:MAX_INDEXED_CHARS].translate(_SELECTORS) for key in ids],
+                ],
+            )
+            headlines = {pk: _highlight(fragment) for pk, fragment in cursor.fetchall()}
+    for report in reports:
+        report.headline = headlines.get(report.pk)
+    return reports
+
+
+def report_ids_page(after=None, limit: int = 1000, missing_only: bool = True) -> List:
+    queryset = Report.objects.order_by("id")
+    if missing_only:
+        queryset = queryset.filter(search_vector__isnull=True)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return list(queryset.values_list("id", flat=True)[:limit])
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+Table = List[List[Optional[str]]]
+# Per table: where the data starts and which column holds each role, or None if skipped.
+Layout = List[Optional[Dict[str, Any]]]
+
+# Checked in this order, so "Valores de referencia" is a range and not a value column.
+HEADER_KEYWORDS = {
+    "range": ("reference", "range", "referencia", "rango", "intervalo"),
+    "unit": ("unit", "unidad"),
+    "name": (
+        "analyte",
+        "analysis",
+        "análisis",
+        "test",
+        "parameter",
+        "parámetro",
+        "examen",
+        "prueba",
+    ),
+    "value": ("result", "value", "resultado", "valor"),
+}
+NUMBER_PATTERN = re.compile(r"-?\d+(?:[.,]\d+)?")
+VALUE_PATTERN = re.compile(r"^[<>*\s]*(-?\d+(?:[.,]\d+)?)\s*\*?\s*([HLhl]|high|low|alto|bajo)?\s*$")
+RANGE_PATTERN = re.compile(r"(-?\d+(?:[.,]\d+)?)\s*(?:-|–|to|a)\s*(-?\d+(?:[.,]\d+)?)")
+UPPER_BOUND_PATTERN = re.compile(r"^\s*(?:<|≤|<=|hasta)\s*(\d+(?:[.,]\d+)?)")
+UNIT_CELL_PATTERN = re.compile(r"^[a-zA-Zµμ%/^0-9.\s]{1,16}$")
+INLINE_UNIT_PATTERN = re.compile(
+    r"(mg/dL|g/dL|mmol/L|µmol/L|U/L|mEq/L|ng/mL|pg/mL|%)", re.IGNORECASE
+)
+
+# Row scores: a row read entirely from the table scores 1; each value borrowed from the
+# analyte catalog (or a name we don't know) lowers it. A row with an unknown name scores below
+# the default TABLE_MIN_CONFIDENCE (0.8) even when complete, so tables of tests missing from
+# the catalog go to the LLM, which names them consistently.
+MISSING_UNIT_PENALTY = 0.2
+MISSING_RANGE_PENALTY = 0.3
+UNKNOWN_NAME_PENALTY = 0.3
+
+
+@dataclass
+class TableExtraction:
+    """Analytes read from PDF tables and how much of the tables they account for.
+
+    ``candidates`` counts data rows that look like results (a label and a number);
+    ``confidence`` is the mean row score over those candidates, so rows that could not be
+    read pull it down as much as rows that needed defaults. ``layout`` records the columns
+    used for each table so a confident read can be saved as a template.
+    """
+
+    analytes: List[Dict[str, Any]] = field(default_factory=list)
+    layout: Layout = field(default_factory=list)
+    from_template: bool = False
+    candidates: int = 0
+    score: float = 0.0
+
+    @property
+    def confidence(self) -> float:
+        return self.score / self.candidates if self.candidates else 0.0
+
+
+def _clean(cell: Optional[str]) -> str:
+    return " ".join((cell or "").split())
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def parse_value(cell: str) -> Optional[float]:
+    match = VALUE_PATTERN.match(cell)
+    return _number(match.group(1)) if match else None
+
+
+def parse_range(cell: str) -> Optional[Tuple[float, float]]:
+    match = RANGE_PATTERN.search(cell)
+    if match:
+        return _number(match.group(1)), _number(match.group(2))
+    match = UPPER_BOUND_PATTERN.match(cell)
+    if match:
+        return 0.0, _number(match.group(1))
+    return None
+
+
+def _is_unit(cell: str) -> bool:
+    return bool(cell) and bool(UNIT_CELL_PATTERN.match(cell)) and not NUMBER_PATTERN.fullmatch(cell)
+
+
+def _header_columns(row: Sequence[str]) -> Dict[str, int]:
+    columns: Dict[str, int] = {}
+    for index, cell in enumerate(row):
+        lower = cell.lower()
+        for role, keywords in HEADER_KEYWORDS.items():
+            if role not in columns and any(keyword in lower for keyword in keywords):
+                columns[role] = index
+                break
+    return columns
+
+
+def _infer_columns(rows: Sequence[Sequence[str]]) -> Dict[str, int]:
+    """Guess column roles from the data when the table has no recognizable header."""
+    width = max(len(row) for row in rows)
+    columns: Dict[str, int] = {}
+
+    def share(index: int, test) -> float:
+        cells = [row[index] for row in rows if index < len(row) and row[index]]
+        return sum(1 for cell in cells if test(cell)) / len(cells) if cells else 0.0
+
+    for index in range(width):
+        if "name" not in columns and share(index, lambda c: not NUMBER_PATTERN.search(c)) > 0.5:
+            columns["name"] = index
+        elif "name" in columns and "value" not in columns:
+            if share(index, lambda c: parse_value(c) is not None) > 0.5:
+                columns["value"] = index
+        elif "value" in columns and "range" not in columns and share(index, parse_range) > 0.5:
+            columns["range"] = index
+        elif "value" in columns and "unit" not in columns and share(index, _is_unit) > 0.5:
+            columns["unit"] = index
+    return columns
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def _known_name(label: str, catalog: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """Catalog key for ``label``; aliases contained in another analyte's alias are ignored.
+
+    That keeps "HDL Cholesterol" from matching ``cholesterol_total`` through "cholesterol",
+    which is part of the HDL alias "good cholesterol".
+    """
+    lower = label.lower()
+    matches = []
+    for key, meta in catalog.items():
+        for alias in meta["aliases"]:
+            if not re.search(rf"\b{re.escape(alias)}", lower):
+                continue
+            if any(
+                alias in other
+                for other_key, other_meta in catalog.items()
+                if other_key != key
+                for other in other_meta["aliases"]
+            ):
+                continue
+            matches.append((len(alias), key))
+    return max(matches)[1] if matches else None
+
+
+def _read_row(
+    row: Sequence[str], columns: Dict[str, int], catalog: Dict[str, Dict[str, Any]]
+) -> Tuple[Optional[Dict[str, Any]], float]:
+    """One analyte and its score, or ``(None, 0)`` when the row can't be stored."""
+
+    def cell(role: str) -> str:
+        index = columns.get(role)
+        return row[index] if index is not None and index < len(row) else ""
+
+    label, value_cell = cell("name"), cell("value")
+    value = parse_value(value_cell)
+    if not label or value is None:
+        return None, 0.0
+    key = _known_name(label, catalog)
+    meta = catalog.get(key, {})
+    score = 1.0 if key else 1.0 - UNKNOWN_NAME_PENALTY
+    unit = cell("unit") if _is_unit(cell("unit")) else None
+    if unit is None:
+        inline = INLINE_UNIT_PATTERN.search(f"{value_cell} {cell('range')}")
+        unit = inline.group(1) if inline else meta.get("unit")
+        score -= MISSING_UNIT_PENALTY
+    bounds = parse_range(cell("range"))
+    if bounds is None:
+        if not meta:
+            # Without a range the result can't be flagged; leave it to the LLM.
+            return None, 0.0
+        bounds = (meta["ref_min"], meta["ref_max"])
+        score -= MISSING_RANGE_PENALTY
+    analyte = {
+        "name": key or _slug(label),
+        "value": value,
+        "unit": unit,
+        "ref_min": bounds[0],
+        "ref_max": bounds[1],
+        "raw_line": " | ".join(cell for cell in row if cell),
+    }
+    return analyte, score
+
+
+def _is_candidate(row: Sequence[str]) -> bool:
+    """A label cell plus a separate cell holding a number."""
+    labels = [i for i, cell in enumerate(row) if cell and not NUMBER_PATTERN.search(cell)]
+    return bool(labels) and any(
+        NUMBER_PATTERN.search(cell) for i, cell in enumerate(row) if i != labels[0]
+    )
+
+
+def tables_from_words(
+    words: Sequence[Dict[str, Any]], line_tolerance: float = 3, cell_gap: float = 8
+) -> List[Table]:
+    """Tables for pages without rulings, built from ``pdfplumber`` words.
+
+    Words are grouped into lines by their ``top``, a line is split into cells wherever the
+    horizontal gap reaches ``cell_gap`` points, and every run of consecutive lines with two or
+    more cells becomes one table.
+    """
+    lines: List[List[Dict[str, Any]]] = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if lines and abs(word["top"] - lines[-1][0]["top"]) <= line_tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    tables: List[Table] = []
+    current: Table = []
+    for line in lines:
+        cells: List[str] = []
+        right = None
+        for word in sorted(line, key=lambda w: w["x0"]):
+            if right is not None and word["x0"] - right < cell_gap:
+                cells[-1] = f"{cells[-1]} {word['text']}"
+            else:
+                cells.append(word["text"])
+            right = word["x1"]
+        if len(cells) > 1:
+            current.append(cells)
+        elif current:
+            tables.append(current)
+            current = []
+    if current:
+        tables.append(current)
+    return tables
+
+
+def _find_header(rows: Sequence[Sequence[str]]) -> Tuple[Dict[str, int], int]:
+    """Column roles from a header row in the first three rows, and the row after it."""
+    for index, row in enumerate(rows[:3]):
+        header = _header_columns(row)
+        if {"name", "value"} <= header.keys():
+            return header, index + 1
+    return {}, 0
+
+
+def _rows(table: Table) -> List[List[str]]:
+    return [[_clean(cell) for cell in row] for row in table if any(row)]
+
+
+def layout_fingerprint(lab_name: Optional[str], tables: Sequence[Table]) -> str:
+    """Hash of the lab name and each table's width and header labels.
+
+    Only header rows are used (digits masked), so reports from the same lab template share a
+    fingerprint whatever patient data they carry.
+    """
+    shape = []
+    for table in tables:
+        rows = _rows(table)
+        columns, start = _find_header(rows)
+        header = (
+            [NUMBER_PATTERN.sub("#", cell.lower()) for cell in rows[start - 1]] if columns else []
+        )
+        shape.append([max((len(row) for row in rows), default=0), header])
+    payload = json.dumps([" ".join((lab_name or "").lower().split()), shape], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def extract_table_analytes(
+    tables: Sequence[Table], catalog: Dict[str, Dict[str, Any]], layout: Optional[Layout] = None
+) -> TableExtraction:
+    """Read analytes from ``pdfplumber`` tables (lists of rows of cell strings).
+
+    Columns are found from a header row (English or Spanish) or, failing that, from the shape
+    of the data: the first mostly-text column is the name, the next mostly-numeric one the
+    value, then a range column and a unit column. A ``layout`` saved from an earlier read of
+    the same template skips that detection; if it doesn't fit these tables nothing is read.
+    """
+    result = TableExtraction()
+    if layout is not None and len(layout) != len(tables):
+        return result
+    for position, table in enumerate(tables):
+        rows = _rows(table)
+        if layout is not None:
+            known = layout[position]
+            if known is None:
+                result.layout.append(None)
+                continue
+            columns, start = known["columns"], known["start"]
+            width = max((len(row) for row in rows), default=0)
+            if max(columns.values()) >= width:
+                return TableExtraction()
+        else:
+            columns, start = _find_header(rows)
+        data = [row for row in rows[start:] if _is_candidate(row)]
+        if data and not columns:
+            columns = _infer_columns(data)
+        if not data or {"name", "value"} - columns.keys():
+            result.layout.append(None)
+            continue
+        result.layout.append({"start": start, "columns": columns})
+        result.candidates += len(data)
+        for row in data:
+            analyte, score = _read_row(row, columns, catalog)
+            if analyte is not None:
+                result.analytes.append(analyte)
+                result.score += score
+    return result
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# Spellings seen in lab PDFs and partner exports, mapped to the display form we store.
+UNIT_ALIASES = {
+    "mg/dl": "mg/dL",
+    "mg%": "mg/dL",
+    "g/dl": "g/dL",
+    "g/l": "g/L",
+    "mg/l": "mg/L",
+    "mmol/l": "mmol/L",
+    "umol/l": "µmol/L",
+    "µmol/l": "µmol/L",
+    "μmol/l": "µmol/L",
+    "%": "%",
+}
+
+# Mass concentrations convert into each other regardless of the analyte (factor to mg/dL).
+MASS_CONCENTRATION = {"mg/dL": 1.0, "g/dL": 1000.0, "g/L": 100.0, "mg/L": 0.1}
+
+# Canonical unit per analyte plus analyte-specific factors (from unit -> canonical unit).
+# Molar factors come from the molecular weight, e.g. glucose 180.16 g/mol -> 18.016.
+ANALYTE_UNITS: Dict[str, Dict[str, object]] = {
+    "glucose": {"unit": "mg/dL", "factors": {"mmol/L": 18.016}},
+    "cholesterol_total": {"unit": "mg/dL", "factors": {"mmol/L": 38.67}},
+    "hdl": {"unit": "mg/dL", "factors": {"mmol/L": 38.67}},
+    "ldl": {"unit": "mg/dL", "factors": {"mmol/L": 38.67}},
+    "triglycerides": {"unit": "mg/dL", "factors": {"mmol/L": 88.57}},
+    "creatinine": {"unit": "mg/dL", "factors": {"µmol/L": 1 / 88.42}},
+    "hemoglobin": {"unit": "g/dL", "factors": {"mmol/L": 1.611}},
+}
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    text = (unit or "").strip()
+    return UNIT_ALIASES.get(text.lower().replace(" ", ""), text)
+
+
+def _mass_factor(unit: str, target: str) -> Optional[float]:
+    if unit in MASS_CONCENTRATION and target in MASS_CONCENTRATION:
+        return MASS_CONCENTRATION[unit] / MASS_CONCENTRATION[target]
+    return None
+
+
+@lru_cache(maxsize=1024)
+def conversion_for(
+    analyte_name: str, unit: Optional[str], analyte_unit: Optional[str] = ""
+) -> Tuple[Optional[float], str]:
+    """Return ``(factor, canonical_unit)`` for a result stored as ``unit``.
+
+    The canonical unit is the registry's unit for known analytes, otherwise the analyte's own
+    unit (or the result's unit when the analyte has none). ``factor`` is ``None`` when the
+    unit cannot be converted; such results keep a null canonical value and are left out of
+    cross-unit aggregates rather than being plotted on the wrong scale.
+    """
+    source = normalize_unit(unit)
+    entry = ANALYTE_UNITS.get((analyte_name or "").strip().lower())
+    canonical = entry["unit"] if entry else normalize_unit(analyte_unit) or source
+    if not source or source == canonical:
+        return 1.0, canonical
+    if entry and source in entry["factors"]:
+        return entry["factors"][source], canonical
+    return _mass_factor(source, canonical), canonical
+
+
+def canonicalize(
+    analyte_name: str, unit: Optional[str], value, analyte_unit: Optional[str] = ""
+) -> Tuple[Optional[float], str]:
+    """Return ``(canonical_value, canonical_unit)`` for one result."""
+    factor, canonical_unit = conversion_for(analyte_name, unit, analyte_unit)
+    if factor is None or value is None:
+        return None, canonical_unit
+    return round(float(value) * factor, 6), canonical_unit
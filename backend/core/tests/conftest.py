@@ -0,0 +1,13 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def llm_call_records(monkeypatch):
+    # The telemetry writer thread has its own connection, which cannot see (or be rolled back
+    # with) the test transaction; collect the rows it would insert instead.
+    records = []
+    writer = SimpleNamespace(submit=records.append)
+    monkeypatch.setattr("core.services.llm_telemetry.get_writer", lambda: writer)
+    return records
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.access import PatientAccess
+from core.models import Alert, Analyte, Patient, Report, ResultValue, User
+
+
+class PatientAccessTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="supersecret")
+        self.patient = Patient.objects.create(
+            user=self.user, name="Owner", sex="F", birth_date=date(1990, 2, 2)
+        )
+        other = Patient.objects.create(name="Someone Else", sex="M", birth_date=date(1980, 1, 1))
+        self.own_report = Report.objects.create(
+            patient=self.patient, org_name="Lab", issued_at=datetime.now(timezone.utc)
+        )
+        self.other_report = Report.objects.create(
+            patient=other, org_name="Lab", issued_at=datetime.now(timezone.utc)
+        )
+
+    def test_object_checks_and_own_patient_share_one_query(self):
+        access = PatientAccess(self.user)
+        report = Report.objects.get(pk=self.own_report.pk)
+        other = Report.objects.get(pk=self.other_report.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(access.can_access_object(report))
+            self.assertFalse(access.can_access_object(other))
+            self.assertEqual(access.get_own_patient(), self.patient)
+
+    def test_clinical_users_are_unrestricted_without_queries(self):
+        doctor = User.objects.create_user(
+            username="doc", password="supersecret", role=User.Roles.DOCTOR
+        )
+        access = PatientAccess(doctor)
+        with self.assertNumQueries(0):
+            self.assertTrue(access.can_access_object(self.other_report))
+            queryset = access.scope(Report.objects.all())
+        self.assertEqual(queryset.count(), 2)
+
+    @override_settings(PATIENT_ACCESS_CACHE_TIMEOUT=60)
+    def test_cached_ids_are_invalidated_when_patients_change(self):
+        cache.clear()
+        self.assertEqual(PatientAccess(self.user).patient_ids, {self.patient.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(PatientAccess(self.user).patient_ids, {self.patient.pk})
+        second = Patient.objects.create(
+            user=self.user, name="Dependent", sex="O", birth_date=date(2015, 5, 5)
+        )
+        self.assertEqual(PatientAccess(self.user).patient_ids, {self.patient.pk, second.pk})
+
+    @override_settings(PATIENT_ACCESS_CACHE_TIMEOUT=60)
+    def test_reassigned_patient_is_dropped_from_the_previous_owner(self):
+        cache.clear()
+        new_owner = User.objects.create_user(username="new-owner", password="supersecret")
+        self.assertEqual(PatientAccess(self.user).patient_ids, {self.patient.pk})
+        self.assertEqual(PatientAccess(new_owner).patient_ids, frozenset())
+        self.patient.user = new_owner
+        self.patient.save()
+        self.assertEqual(PatientAccess(self.user).patient_ids, frozenset())
+        self.assertEqual(PatientAccess(new_owner).patient_ids, {self.patient.pk})
+
+    def test_saving_patients_runs_no_extra_query_without_the_cache(self):
+        self.patient.name = "Renamed"
+        with self.assertNumQueries(1):
+            self.patient.save()
+
+    def test_result_and_alert_checks_do_not_load_the_report(self):
+        analyte = Analyte.objects.create(name="glucose", unit="mg/dL")
+        result = ResultValue.objects.create(
+            report=self.own_report,
+            analyte=analyte,
+            value=90,
+            unit="mg/dL",
+            ref_min=70,
+            ref_max=100,
+            measured_at=datetime.now(timezone.utc),
+        )
+        alert = Alert.objects.create(report=self.other_report, level="info", rule_key="k")
+        result = ResultValue.objects.get(pk=result.pk)
+        alert = Alert.objects.get(pk=alert.pk)
+        access = PatientAccess(self.user)
+        with self.assertNumQueries(3):  # linked ids, then one patient_id lookup per object
+            self.assertTrue(access.can_access_object(result))
+            self.assertFalse(access.can_access_object(alert))
+        self.assertNotIn("report", result._state.fields_cache)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from utils.pagination import EstimatedCountPaginator
+
+from core.models import Alert, Analyte, LLMCallLog, Patient, Report, ResultValue, User
+
+CHANGELISTS = ("report", "resultvalue", "alert", "llmcalllog")
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("ops", "ops@example.com", "supersecret")
+        self.client.force_login(self.admin)
+        self.glucose = Analyte.objects.create(name="glucose", unit="mg/dL")
+
+    def _add_reports(self, count):
+        issued = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for index in range(count):
+            patient = Patient.objects.create(name=f"P{index}", sex="F", birth_date=date(1990, 1, 1))
+            report = Report.objects.create(patient=patient, org_name="Lab", issued_at=issued)
+            ResultValue.objects.create(
+                report=report,
+                analyte=self.glucose,
+                value=90 + index,
+                unit="mg/dL",
+                ref_min=70,
+                ref_max=100,
+                measured_at=issued,
+            )
+            Alert.objects.create(
+                patient=patient, report=report, level="info", rule_key="k", message="m"
+            )
+            LLMCallLog.objects.create(stage="insights", outcome="success", created_at=issued)
+
+    def _changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/admin/core/{model}/")
+        self.assertEqual(response.status_code, 200)
+        return [query["sql"] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self._add_reports(2)
+        few = {model: len(self._changelist_queries(model)) for model in CHANGELISTS}
+        self._add_reports(8)
+        many = {model: len(self._changelist_queries(model)) for model in CHANGELISTS}
+        self.assertEqual(few, many)
+
+    def test_filtered_changelist_skips_the_full_count(self):
+        self._add_reports(3)
+        queries = self._changelist_queries("resultvalue") + self._changelist_queries(
+            "resultvalue/?flag__exact=high"
+        )
+        unfiltered_counts = [sql for sql in queries if "COUNT(" in sql and "WHERE" not in sql]
+        self.assertEqual(len(unfiltered_counts), 1)  # the unfiltered page's own total
+
+    def test_foreign_keys_to_large_tables_are_raw_ids(self):
+        response = self.client.get("/admin/core/resultvalue/add/")
+        self.assertContains(response, "vForeignKeyRawIdAdminField")
+        self.assertContains(response, "admin-autocomplete")
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        Analyte.objects.bulk_create(Analyte(name=f"a{index}", unit="mg/dL") for index in range(5))
+
+    def test_small_estimates_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Analyte.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+
+    def test_large_estimates_skip_the_count(self):
+        paginator = EstimatedCountPaginator(Analyte.objects.all(), 2)
+        paginator.estimate_above = 0
+        with CaptureQueriesContext(connection) as queries:
+            estimate = paginator.count
+        self.assertGreaterEqual(estimate, 0)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("EXPLAIN"))
+
+    def test_lists_are_counted_directly(self):
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
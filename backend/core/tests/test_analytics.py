@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import io
+from datetime import date, datetime, timezone
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Analyte, AnalyteRollup, Patient, Report, ResultValue, User
+from core.services.rollups import refresh_rollups
+
+
+class AnalyteRollupTests(APITestCase):
+    def setUp(self):
+        self.glucose = Analyte.objects.create(name="glucose", unit="mg/dL")
+        measured = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        people = [("F", date(1990, 1, 1), [80, 90]), ("M", date(1950, 1, 1), [100, 130])]
+        for sex, birth_date, values in people:
+            patient = Patient.objects.create(name=sex, sex=sex, birth_date=birth_date)
+            report = Report.objects.create(patient=patient, org_name="Lab", issued_at=measured)
+            for value in values:
+                ResultValue.objects.create(
+                    report=report,
+                    analyte=self.glucose,
+                    value=value,
+                    unit="mg/dL",
+                    ref_min=70,
+                    ref_max=99,
+                    flag="high" if value > 99 else "normal",
+                    measured_at=measured,
+                    canonical_value=value,
+                    canonical_unit="mg/dL",
+                )
+        self.url = "/api/analytics/analytes/"
+
+    def test_refresh_builds_grouping_sets_in_sql(self):
+        refresh_rollups()
+        overall = AnalyteRollup.objects.get(analyte=self.glucose, sex="", age_band="")
+        self.assertEqual(overall.result_count, 4)
+        self.assertEqual(overall.patient_count, 2)
+        self.assertEqual(overall.high_count, 2)
+        self.assertAlmostEqual(overall.mean, 100.0)
+        self.assertAlmostEqual(overall.p50, 95.0)
+        by_band = dict(
+            AnalyteRollup.objects.filter(sex="", analyte=self.glucose)
+            .exclude(age_band="")
+            .values_list("age_band", "result_count")
+        )
+        self.assertEqual(by_band, {"18-39": 2, "65+": 2})
+        self.assertEqual(AnalyteRollup.objects.filter(sex="M", age_band="65+").count(), 1)
+
+        refresh_rollups([self.glucose.pk])
+        self.assertEqual(AnalyteRollup.objects.filter(analyte=self.glucose).count(), 7)
+
+    def test_analytics_endpoint_is_clinical_only(self):
+        refresh_rollups()
+        patient_user = User.objects.create_user(username="analytics_patient", password="x")
+        self.client.force_authenticate(user=patient_user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+        doctor = User.objects.create_user(
+            username="analytics_doctor", password="x", role=User.Roles.DOCTOR
+        )
+        self.client.force_authenticate(user=doctor)
+        response = self.client.get(self.url, {"analytes": "glucose", "group": "sex"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = {row["sex"]: row for row in response.data["results"]}
+        self.assertEqual(set(rows), {"F", "M"})
+        self.assertEqual(rows["M"]["flagged_rate"], 1.0)
+        self.assertEqual(rows["F"]["unit"], "mg/dL")
+
+    @override_settings(ANALYTICS_ROLLUPS={"REFRESH_ON_WRITE": True})
+    def test_bulk_results_mark_rollups_stale_for_the_scheduled_refresh(self):
+        lab = User.objects.create_user(username="rollup_lab", password="x", role=User.Roles.LAB)
+        self.client.force_authenticate(user=lab)
+        patient = Patient.objects.first()
+        payload = {
+            "reports": [
+                {
+                    "patient_id": str(patient.pk),
+                    "results": [{"analyte": "glucose", "value": 60, "ref_min": 70, "ref_max": 99}],
+                }
+            ]
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/lab/results/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(AnalyteRollup.objects.exists())  # nothing recomputed in the request
+        self.glucose.refresh_from_db()
+        self.assertTrue(self.glucose.rollups_stale)
+
+        call_command("refresh_analyte_rollups", "--stale", stdout=io.StringIO())
+        overall = AnalyteRollup.objects.get(analyte=self.glucose, sex="", age_band="")
+        self.assertEqual((overall.result_count, overall.low_count), (5, 1))
+        self.glucose.refresh_from_db()
+        self.assertFalse(self.glucose.rollups_stale)
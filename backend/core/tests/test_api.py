@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import io
+import json
 import shutil
 import tempfile
+import zipfile
 from datetime import date, datetime, timezone
+from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
@@ -10,7 +14,8 @@ from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from core.models import Patient, Report, ResultValue, User
+from core.middleware import QueryBudgetExceeded
+from core.models import Analyte, Patient, Report, ResultValue, User
 
 
 class AuthFlowTests(APITestCase):
@@ -108,6 +113,8 @@ class ReportUploadTests(APITestCase):
         self.assertEqual(report.patient, self.patient)
         self.assertIn("parsed_fields", response.data)
         self.assertIn("analytes", response.data["parsed_fields"])
+        self.assertNotIn("raw_text", response.data["parsed_fields"])
+        self.assertNotIn("raw_text", report.raw_json)
         self.assertIn("results", response.data)
         self.assertGreater(ResultValue.objects.filter(report=report).count(), 0)
         self.assertIn("insights", response.data)
@@ -136,3 +143,399 @@ class ProfileViewTests(APITestCase):
         self.assertEqual(update_resp.status_code, status.HTTP_200_OK)
         self.patient.refresh_from_db()
         self.assertEqual(self.patient.name, "Updated Name")
+
+
+class AsyncReportViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="async_patient", password="supersecret", role=User.Roles.PATIENT
+        )
+        self.patient = Patient.objects.create(
+            user=self.user, name="Async Patient", sex="F", birth_date=date(1988, 3, 2)
+        )
+        self.report = Report.objects.create(
+            patient=self.patient,
+            org_name="Nano Labs",
+            issued_at=datetime(2025, 1, 10, tzinfo=timezone.utc),
+        )
+        analyte = Analyte.objects.create(name="glucose", unit="mg/dL")
+        ResultValue.objects.create(
+            report=self.report,
+            analyte=analyte,
+            value=110,
+            unit="mg/dL",
+            ref_min=70,
+            ref_max=100,
+            flag=ResultValue.Flag.HIGH,
+            measured_at=datetime(2025, 1, 10, tzinfo=timezone.utc),
+        )
+
+    def test_report_detail_returns_results(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f"/api/reports/{self.report.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["analyte_name"], "glucose")
+
+    def test_report_detail_denies_other_patients(self):
+        other = User.objects.create_user(
+            username="intruder", password="supersecret", role=User.Roles.PATIENT
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f"/api/reports/{self.report.id}/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_trends_groups_points_by_analyte(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/report-trends/", {"analytes": "glucose"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        series = response.data["analytes"]
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]["points"][0]["flag"], "high")
+
+    def test_trends_plot_mixed_units_on_the_canonical_scale(self):
+        ResultValue.objects.create(
+            report=self.report,
+            analyte=Analyte.objects.get(name="glucose"),
+            value=5,
+            unit="mmol/L",
+            ref_min="3.9",
+            ref_max="5.6",
+            measured_at=datetime(2025, 2, 10, tzinfo=timezone.utc),
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/report-trends/", {"analytes": "glucose"})
+        series = response.data["analytes"][0]
+        self.assertEqual(series["unit"], "mg/dL")
+        latest = series["points"][1]
+        self.assertEqual((latest["value"], latest["unit"]), (90.08, "mg/dL"))
+        self.assertEqual((latest["original_value"], latest["original_unit"]), (5.0, "mmol/L"))
+        self.assertAlmostEqual(latest["ref_max"], 100.8896)
+
+    def test_trends_keep_rows_without_canonical_values(self):
+        glucose = Analyte.objects.get(name="glucose")
+        # Rows from before the canonical columns existed, or in units the registry lacks.
+        ResultValue.objects.filter(report=self.report).update(
+            canonical_value=None, canonical_unit=""
+        )
+        ResultValue.objects.bulk_create(
+            [
+                ResultValue(
+                    report=self.report,
+                    analyte=glucose,
+                    value=value,
+                    unit=unit,
+                    ref_min=ref_min,
+                    ref_max=ref_max,
+                    measured_at=datetime(2025, 1 + month, 10, tzinfo=timezone.utc),
+                )
+                for month, (value, unit, ref_min, ref_max) in enumerate(
+                    [("5", "mmol/L", "3.9", "5.6"), ("7", "furlongs", "1", "9")], start=1
+                )
+            ]
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/report-trends/", {"analytes": "glucose"})
+        points = response.data["analytes"][0]["points"]
+        self.assertEqual(
+            [(point["value"], point["unit"]) for point in points],
+            [(110.0, "mg/dL"), (90.08, "mg/dL"), (7.0, "furlongs")],
+        )
+        self.assertEqual((points[2]["ref_min"], points[2]["ref_max"]), (1.0, 9.0))
+
+
+class RequestInstrumentationTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="ops", password="supersecret", role=User.Roles.ADMIN, is_staff=True
+        )
+        self.patient_user = User.objects.create_user(
+            username="plain", password="supersecret", role=User.Roles.PATIENT
+        )
+
+    def test_server_timing_header_only_for_staff(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get("/api/reports/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+        self.client.force_authenticate(user=self.patient_user)
+        response = self.client.get("/api/reports/")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_query_budget_enforced(self):
+        self.client.force_authenticate(user=self.staff)
+        config = {"QUERY_BUDGETS": {"report-list": 0}, "ENFORCE_QUERY_BUDGETS": True}
+        with override_settings(REQUEST_INSTRUMENTATION=config):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/reports/")
+
+
+class MetricsEndpointTests(APITestCase):
+    def test_upload_pipeline_metrics_are_exported(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(lambda: shutil.rmtree(media_dir, ignore_errors=True))
+        user = User.objects.create_user(
+            username="metrics_patient", password="supersecret", role=User.Roles.PATIENT
+        )
+        Patient.objects.create(user=user, name="Metrics", sex="O", birth_date=date(1990, 1, 1))
+        self.client.force_authenticate(user=user)
+        pdf_file = SimpleUploadedFile("scan.pdf", b"%PDF-1.4 test", content_type="application/pdf")
+        with override_settings(MEDIA_ROOT=media_dir):
+            self.client.post("/api/reports/upload/", {"pdf": pdf_file}, format="multipart")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('nanolabs_ingestion_stage_seconds_count{stage="persist"}', body)
+        self.assertIn('nanolabs_parser_path_total{path="fallback"}', body)
+        self.assertIn(
+            'nanolabs_ingestion_failures_total{reason="no_text",stage="extract_text"}', body
+        )
+
+    def test_metrics_denied_outside_internal_networks_without_token(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(METRICS_ALLOWED_NETWORKS=["203.0.113.0/24"]):
+            response = self.client.get("/metrics", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_AUTH_TOKEN="scrape-secret")
+    def test_metrics_token_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ReportBatchUploadTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(lambda: shutil.rmtree(media_dir, ignore_errors=True))
+        override = override_settings(MEDIA_ROOT=media_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(
+            username="batch_patient", password="supersecret", role=User.Roles.PATIENT
+        )
+        Patient.objects.create(user=self.user, name="Batch", sex="F", birth_date=date(1985, 4, 4))
+        self.client.force_authenticate(user=self.user)
+
+    def _pdf(self, name, content):
+        return SimpleUploadedFile(name, content, content_type="application/pdf")
+
+    def test_batch_upload_dedupes_and_reports_per_file(self):
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, "w") as bundle:
+            bundle.writestr("2024/march.pdf", b"%PDF-1.4 march")
+            bundle.writestr("notes.txt", b"not a report")
+        archive = SimpleUploadedFile(
+            "results.zip", archive_bytes.getvalue(), content_type="application/zip"
+        )
+        payload = {
+            "files": [
+                self._pdf("january.pdf", b"%PDF-1.4 january"),
+                self._pdf("january-copy.pdf", b"%PDF-1.4 january"),
+            ],
+            "archive": archive,
+        }
+        response = self.client.post("/api/reports/upload/batch/", payload, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statuses = {item["filename"]: item["status"] for item in response.data["results"]}
+        self.assertEqual(
+            statuses,
+            {
+                "january.pdf": "created",
+                "january-copy.pdf": "duplicate",
+                "march.pdf": "created",
+                "notes.txt": "error",
+            },
+        )
+        self.assertEqual(Report.objects.count(), 2)
+
+        again = self.client.post(
+            "/api/reports/upload/batch/",
+            {"files": [self._pdf("january.pdf", b"%PDF-1.4 january")]},
+            format="multipart",
+        )
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data["results"][0]["status"], "duplicate")
+        self.assertEqual(Report.objects.count(), 2)
+
+    def test_unreadable_archive_entries_are_reported_per_file(self):
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, "w") as bundle:
+            bundle.writestr("locked.pdf", b"%PDF-1.4 locked")
+            bundle.writestr("open.pdf", b"%PDF-1.4 open")
+        data = bytearray(archive_bytes.getvalue())
+        # Mark the first central directory entry as encrypted.
+        flags = data.index(b"PK\x01\x02") + 8
+        data[flags] |= 0x1
+        archive = SimpleUploadedFile("results.zip", bytes(data), content_type="application/zip")
+        with patch(
+            "core.services.batch_upload.aingest_pdf", side_effect=RuntimeError("db password=x")
+        ):
+            response = self.client.post(
+                "/api/reports/upload/batch/", {"archive": archive}, format="multipart"
+            )
+        results = {item["filename"]: item for item in response.data["results"]}
+        self.assertEqual(results["locked.pdf"]["error"], "File could not be extracted.")
+        self.assertEqual(results["open.pdf"]["error"], "File could not be processed.")
+
+    @override_settings(BATCH_UPLOAD={"MAX_FILE_BYTES": 20, "MAX_TOTAL_BYTES": 30})
+    def test_uploaded_files_are_size_limited(self):
+        files = [self._pdf("big.pdf", b"%PDF-1.4 " + b"x" * 20), self._pdf("a.pdf", b"%PDF-1.4 a")]
+        with patch("core.services.batch_upload.aingest_pdf") as ingest:
+            ingest.return_value = Report.objects.create(
+                patient=Patient.objects.get(),
+                org_name="Lab",
+                issued_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            )
+            response = self.client.post(
+                "/api/reports/upload/batch/", {"files": files}, format="multipart"
+            )
+        results = {item["filename"]: item for item in response.data["results"]}
+        self.assertEqual(results["big.pdf"]["error"], "File is too large.")
+        self.assertEqual(results["a.pdf"]["status"], "created")
+
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, "w") as bundle:
+            bundle.writestr("b.pdf", b"%PDF-1.4 " + b"b" * 10)
+            bundle.writestr("c.pdf", b"%PDF-1.4 " + b"c" * 10)
+        payload = {
+            "files": [self._pdf("a.pdf", b"%PDF-1.4 a")],
+            "archive": SimpleUploadedFile("more.zip", archive_bytes.getvalue()),
+        }
+        response = self.client.post("/api/reports/upload/batch/", payload, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("maximum total size", str(response.data))
+
+
+class LabBulkResultsTests(APITestCase):
+    def setUp(self):
+        self.lab = User.objects.create_user(
+            username="lab_user", password="supersecret", role=User.Roles.LAB
+        )
+        self.patients = [
+            Patient.objects.create(name=f"Bulk {i}", sex="F", birth_date=date(1980, 1, 1 + i))
+            for i in range(2)
+        ]
+        Analyte.objects.create(name="Glucose", unit="mg/dL")
+        self.url = "/api/lab/results/bulk/"
+
+    def _payload(self, report_ref="R-1"):
+        return {
+            "reports": [
+                {
+                    "patient_id": str(patient.pk),
+                    "org_name": "Partner Lab",
+                    "issued_at": "2024-03-01T08:00:00Z",
+                    "report_ref": f"{report_ref}-{index}",
+                    "results": [
+                        {"analyte": "glucose", "value": "120", "ref_min": 70, "ref_max": 99},
+                        {
+                            "analyte": "Ferritin",
+                            "value": 15,
+                            "unit": "ng/mL",
+                            "ref_min": 20,
+                            "ref_max": 250,
+                        },
+                    ],
+                }
+                for index, patient in enumerate(self.patients)
+            ]
+        }
+
+    def test_patients_cannot_submit_bulk_results(self):
+        user = User.objects.create_user(username="bulk_patient", password="supersecret")
+        self.client.force_authenticate(user=user)
+        response = self.client.post(self.url, self._payload(), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_results_are_stored_with_flags_and_skipped_on_repeat(self):
+        self.client.force_authenticate(user=self.lab)
+        response = self.client.post(self.url, self._payload(), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created_reports"], 2)
+        self.assertEqual(response.data["created_results"], 4)
+        glucose = ResultValue.objects.filter(analyte__name="Glucose")
+        self.assertEqual(set(glucose.values_list("flag", flat=True)), {"high"})
+        self.assertEqual(set(glucose.values_list("unit", flat=True)), {"mg/dL"})
+        ferritin = ResultValue.objects.filter(analyte__name="Ferritin")
+        self.assertEqual(set(ferritin.values_list("flag", flat=True)), {"low"})
+
+        repeat = self.client.post(self.url, self._payload(), format="json")
+        self.assertEqual(repeat.status_code, status.HTTP_200_OK)
+        self.assertEqual(repeat.data["created_reports"], 0)
+        self.assertEqual(Report.objects.count(), 2)
+
+    def test_invalid_rows_reject_the_whole_batch(self):
+        self.client.force_authenticate(user=self.lab)
+        payload = self._payload()
+        payload["reports"][1]["results"][0]["value"] = "abc"
+        payload["reports"][0]["patient_id"] = "not-a-uuid"
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("reports[1].results[0].value", response.data)
+        self.assertIn("reports[0].patient_id", response.data)
+        self.assertEqual(Report.objects.count(), 0)
+
+    def test_repeated_refs_in_one_payload_are_rejected(self):
+        self.client.force_authenticate(user=self.lab)
+        payload = self._payload()
+        payload["reports"].append(dict(payload["reports"][0]))
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["reports[2].report_ref"], ["Duplicate of reports[0]."])
+        self.assertEqual(Report.objects.count(), 0)
+
+
+class PatientResultsExportTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="export_owner", password="supersecret")
+        self.patient = Patient.objects.create(
+            user=self.owner, name="Export", sex="M", birth_date=date(1975, 6, 1)
+        )
+        issued = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        report = Report.objects.create(patient=self.patient, org_name="Lab", issued_at=issued)
+        analyte = Analyte.objects.create(name="ldl", unit="mg/dL")
+        for day, value in ((2, "90"), (3, "160")):
+            ResultValue.objects.create(
+                report=report,
+                analyte=analyte,
+                value=value,
+                unit="mg/dL",
+                ref_min=0,
+                ref_max=129,
+                flag="high" if value == "160" else "normal",
+                measured_at=datetime(2024, 1, day, tzinfo=timezone.utc),
+            )
+        self.url = f"/api/patients/{self.patient.pk}/results/export/"
+
+    def _content(self, response):
+        return b"".join(response).decode()
+
+    def test_csv_export_streams_rows_in_order(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        lines = self._content(response).strip().splitlines()
+        self.assertTrue(lines[0].startswith("report_id,report_issued_at,org_name,analyte,value"))
+        self.assertEqual(len(lines), 3)
+        self.assertIn("160.0000", lines[2])
+
+    def test_ndjson_export(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {"output": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([row["flag"] for row in rows], ["normal", "high"])
+        self.assertEqual(rows[0]["analyte"], "ldl")
+
+    def test_other_patients_cannot_export(self):
+        stranger = User.objects.create_user(username="export_stranger", password="supersecret")
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(self.url, {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
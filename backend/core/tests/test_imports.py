@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# Modules that only the parsing/LLM code paths need; they must stay out of process startup.
+LAZY_MODULES = ("openai", "httpx", "pydantic", "pdfplumber", "pdfminer", "PIL", "pypdfium2")
+# Generous ceiling on the summed import time of ``django.setup()`` plus the URLconf, which
+# loads every view, serializer and service module. Override on slow CI machines.
+IMPORT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "2500"))
+
+
+def _importtime(code: str):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(self_us)
+    return modules
+
+
+def test_app_startup_skips_heavy_optional_dependencies():
+    modules = _importtime("import django; django.setup(); import config.urls")
+    loaded = {name.split(".")[0] for name in modules}
+    assert not loaded.intersection(LAZY_MODULES), sorted(loaded.intersection(LAZY_MODULES))
+    total_ms = sum(modules.values()) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"startup imports took {total_ms:.0f} ms"
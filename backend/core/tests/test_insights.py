@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import io
+import json
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from core.models import Analyte, Patient, Report, ResultValue, User
+from core.services import ai_insights
+from core.services.ai_insights import INSIGHTS_PROMPT_VERSION
+
+
+def _result(analyte, value, ref_min, ref_max, flag):
+    return {
+        "analyte": analyte,
+        "value": value,
+        "unit": "mg/dL",
+        "ref_min": ref_min,
+        "ref_max": ref_max,
+        "flag": flag,
+        "measured_at": "2025-01-10T00:00:00+00:00",
+    }
+
+
+NORMAL = [
+    _result("glucose", 90.0, 70.0, 100.0, "normal"),
+    _result("hdl", 50.0, 40.0, 60.0, "normal"),
+]
+
+
+def _generate(monkeypatch, results, content='{"explanation": "from the model"}'):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_insights, "get_client", lambda: client)
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr(ai_insights, "_result_to_payload", lambda result: result)
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+    report = SimpleNamespace(results=SimpleNamespace(all=lambda: results))
+    return ai_insights.generate_insights(report), calls
+
+
+def _routed(route, reason):
+    labels = {"route": route, "reason": reason}
+    return REGISTRY.get_sample_value("nanolabs_insights_route_total", labels) or 0
+
+
+def test_all_normal_reports_skip_the_llm(monkeypatch):
+    before = _routed("rules", "all_normal")
+    insights, calls = _generate(monkeypatch, NORMAL)
+    assert calls == []
+    assert insights["source"] == "rules"
+    assert insights["triage"] == "routine"
+    assert "glucosa" in insights["explanation"]
+    assert _routed("rules", "all_normal") == before + 1
+
+
+def test_single_mild_flag_uses_the_analyte_template(monkeypatch):
+    results = NORMAL[1:] + [_result("glucose", 104.0, 70.0, 100.0, "high")]
+    insights, calls = _generate(monkeypatch, results)
+    assert calls == []
+    assert insights["recommended_tests"][0]["test"].startswith("Hemoglobina glucosilada")
+    assert insights["key_results"][0]["confidence"] == 0.7
+    assert "Los demás resultados (1)" in insights["explanation"]
+
+
+def test_complex_reports_are_routed_to_the_llm(monkeypatch):
+    results = [
+        _result("glucose", 104.0, 70.0, 100.0, "high"),
+        _result("ldl", 190.0, 0.0, 130.0, "high"),
+    ]
+    assert ai_insights.route_insights(results) == ("llm", "multiple_flags")
+    assert ai_insights.route_insights([_result("ferritin", 5.0, 20.0, 250.0, "low")]) == (
+        "llm",
+        "no_template",
+    )
+    insights, calls = _generate(monkeypatch, results)
+    assert len(calls) == 1
+    assert insights["source"] == "llm"
+
+
+def test_malformed_model_output_is_logged_as_a_failed_call(monkeypatch, llm_call_records):
+    results = [
+        _result("glucose", 104.0, 70.0, 100.0, "high"),
+        _result("ldl", 190.0, 0.0, 130.0, "high"),
+    ]
+    insights, calls = _generate(monkeypatch, results, content='{"explanation": "cut off')
+    assert len(calls) == 1
+    assert insights["source"] == "fallback"
+    (record,) = llm_call_records
+    assert (record.outcome, record.error, record.fallback_used) == (
+        "error",
+        "JSONDecodeError",
+        True,
+    )
+
+
+@pytest.mark.django_db
+def test_regenerate_insights_command_updates_outdated_reports(monkeypatch, tmp_path):
+    patient = Patient.objects.create(name="Regen", sex="F", birth_date=date(1980, 1, 1))
+    analyte = Analyte.objects.create(name="ldl", unit="mg/dL")
+    reports = []
+    for day in (1, 2, 3):
+        report = Report.objects.create(
+            patient=patient, org_name="Lab", issued_at=datetime(2025, 1, day, tzinfo=timezone.utc)
+        )
+        for value in (190, 170):
+            ResultValue.objects.create(
+                report=report,
+                analyte=analyte,
+                value=value,
+                unit="mg/dL",
+                ref_min=0,
+                ref_max=130,
+                flag="high",
+                measured_at=report.issued_at,
+            )
+        reports.append(report)
+    Report.objects.filter(pk=reports[2].pk).update(insights_prompt_version=INSIGHTS_PROMPT_VERSION)
+
+    async def create(**kwargs):
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=40)
+        message = SimpleNamespace(content='{"explanation": "nuevo", "triage": "priority"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_insights, "get_async_client", lambda: client)
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+
+    checkpoint = tmp_path / "checkpoint.json"
+    out = io.StringIO()
+    call_command(
+        "regenerate_insights", "--batch-size", "1", "--checkpoint", str(checkpoint), stdout=out
+    )
+
+    refreshed = {r.pk: r for r in Report.objects.all()}
+    for report in reports[:2]:
+        assert refreshed[report.pk].insights["explanation"] == "nuevo"
+        assert refreshed[report.pk].insights_prompt_version == INSIGHTS_PROMPT_VERSION
+    assert refreshed[reports[2].pk].insights == {}
+    assert json.loads(checkpoint.read_text())["position"][1] == str(reports[1].pk)
+    assert "tokens: 200 prompt + 80 completion = 280" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_regeneration_skips_reports_when_model_unavailable(monkeypatch, tmp_path):
+    patient = Patient.objects.create(name="Skip", sex="M", birth_date=date(1975, 5, 5))
+    analyte = Analyte.objects.create(name="ldl", unit="mg/dL")
+    report = Report.objects.create(
+        patient=patient, org_name="Lab", issued_at=datetime(2025, 2, 1, tzinfo=timezone.utc)
+    )
+    for value in (190, 170):
+        ResultValue.objects.create(
+            report=report,
+            analyte=analyte,
+            value=value,
+            unit="mg/dL",
+            ref_min=0,
+            ref_max=130,
+            flag="high",
+            measured_at=report.issued_at,
+        )
+
+    async def create(**kwargs):
+        raise RuntimeError("provider down")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_insights, "get_async_client", lambda: client)
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+
+    out = io.StringIO()
+    call_command(
+        "regenerate_insights",
+        "--attempts",
+        "2",
+        "--backoff",
+        "0",
+        "--checkpoint",
+        str(tmp_path / "checkpoint.json"),
+        stdout=out,
+    )
+
+    report.refresh_from_db()
+    assert report.insights == {}
+    assert report.insights_prompt_version == ""
+    assert "Regenerated 0 of 1 reports" in out.getvalue()
+    assert "1 skipped after retries" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_resumed_regeneration_retries_skipped_reports_with_the_same_filters(monkeypatch, tmp_path):
+    patient = Patient.objects.create(name="Resume", sex="F", birth_date=date(1980, 1, 1))
+    analyte = Analyte.objects.create(name="ldl", unit="mg/dL")
+    for day in (1, 2, 3):
+        report = Report.objects.create(
+            patient=patient, org_name="Lab", issued_at=datetime(2025, 3, day, tzinfo=timezone.utc)
+        )
+        ResultValue.objects.create(
+            report=report,
+            analyte=analyte,
+            value=190,
+            unit="mg/dL",
+            ref_min=0,
+            ref_max=130,
+            flag="high",
+            measured_at=report.issued_at,
+        )
+    reports = list(Report.objects.order_by("created_at", "id"))
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise RuntimeError("provider down")
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        message = SimpleNamespace(content='{"explanation": "nuevo", "triage": "routine"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_insights, "get_async_client", lambda: client)
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+
+    checkpoint = tmp_path / "checkpoint.json"
+    options = ["--since", "2025-02-01", "--batch-size", "1", "--concurrency", "1"]
+    options += ["--attempts", "1", "--checkpoint", str(checkpoint)]
+    call_command("regenerate_insights", *options, stdout=io.StringIO())
+
+    # The second report was skipped, so the checkpoint stays on the first one.
+    assert json.loads(checkpoint.read_text())["position"][1] == str(reports[0].pk)
+    reports[1].refresh_from_db()
+    assert reports[1].insights_prompt_version == ""
+
+    with pytest.raises(CommandError, match="different filters"):
+        call_command(
+            "regenerate_insights",
+            "--resume",
+            *options[2:],
+            "--since",
+            "2025-02-02",
+            stdout=io.StringIO(),
+        )
+
+    call_command("regenerate_insights", "--resume", *options, stdout=io.StringIO())
+    reports[1].refresh_from_db()
+    assert reports[1].insights_prompt_version == INSIGHTS_PROMPT_VERSION
+    assert len(calls) == 4
+    assert json.loads(checkpoint.read_text())["position"][1] == str(reports[1].pk)
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage, model="gpt-4o-mini")
+
+
+class _StubStreamingClient:
+    """Mimics ``AsyncOpenAI`` with ``stream=True``: the completion arrives in small chunks."""
+
+    def __init__(self, pieces, fail=False):
+        self.pieces = pieces
+        self.fail = fail
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        if self.fail:
+            raise RuntimeError("provider down")
+
+        async def chunks():
+            for piece in self.pieces:
+                yield _chunk(piece)
+            yield _chunk(usage=SimpleNamespace(prompt_tokens=50, completion_tokens=12))
+
+        return chunks()
+
+
+def _sse(response):
+    body = b"".join(response).decode()
+    events = []
+    for message in body.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.fixture
+def streaming_report(monkeypatch):
+    user = User.objects.create_user(username="stream_owner", password="x")
+    patient = Patient.objects.create(user=user, name="Stream", sex="F", birth_date=date(1985, 3, 3))
+    analyte = Analyte.objects.create(name="ldl", unit="mg/dL")
+    report = Report.objects.create(
+        patient=patient, org_name="Lab", issued_at=datetime(2025, 3, 1, tzinfo=timezone.utc)
+    )
+    for value in (190, 170):
+        ResultValue.objects.create(
+            report=report,
+            analyte=analyte,
+            value=value,
+            unit="mg/dL",
+            ref_min=0,
+            ref_max=130,
+            flag="high",
+            measured_at=report.issued_at,
+        )
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client, report
+
+
+@pytest.mark.django_db
+def test_insights_stream_sends_deltas_and_saves_final_json(
+    monkeypatch, streaming_report, llm_call_records
+):
+    client, report = streaming_report
+    pieces = ['{"explanation": "LDL ', 'elevado", ', '"triage": "priority"}']
+    monkeypatch.setattr(ai_insights, "get_async_client", lambda: _StubStreamingClient(pieces))
+
+    response = client.post(
+        f"/api/reports/{report.pk}/insights/stream/", HTTP_ACCEPT="text/event-stream"
+    )
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    events = _sse(response)
+    assert [name for name, _ in events] == ["start", "delta", "delta", "delta", "done"]
+    assert "".join(data["text"] for name, data in events if name == "delta") == "".join(pieces)
+    done = events[-1][1]
+    assert done["saved"] is True
+    assert done["insights"]["explanation"] == "LDL elevado"
+    report.refresh_from_db()
+    assert report.insights["triage"] == "priority"
+    assert report.insights_prompt_version == INSIGHTS_PROMPT_VERSION
+    (log,) = llm_call_records
+    assert (log.outcome, log.input_tokens, log.output_tokens) == ("success", 50, 12)
+
+
+@pytest.mark.django_db
+def test_insights_stream_keeps_existing_insights_when_model_fails(monkeypatch, streaming_report):
+    client, report = streaming_report
+    Report.objects.filter(pk=report.pk).update(insights={"explanation": "previo", "source": "llm"})
+    monkeypatch.setattr(
+        ai_insights, "get_async_client", lambda: _StubStreamingClient([], fail=True)
+    )
+
+    response = client.post(f"/api/reports/{report.pk}/insights/stream/")
+
+    name, done = _sse(response)[-1]
+    assert (name, done["saved"], done["insights"]["source"]) == ("done", False, "fallback")
+    report.refresh_from_db()
+    assert report.insights["explanation"] == "previo"
+
+
+@pytest.mark.django_db
+def test_insights_stream_errors_are_events_for_other_users(streaming_report):
+    _, report = streaming_report
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username="stranger", password="x"))
+
+    response = client.post(
+        f"/api/reports/{report.pk}/insights/stream/", HTTP_ACCEPT="text/event-stream"
+    )
+
+    assert response.status_code == 403
+    assert response.content.decode().startswith("event: error\ndata: ")
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import io
+import json
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from django.contrib.postgres.search import SearchQuery
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Patient, Report, ResultValue
+from core.services.lab_import import LabResultImporter, read_csv, read_hl7
+
+CSV_HEADER = (
+    "patient_id,patient_name,birth_date,report_ref,lab_name,issued_at,"
+    "analyte,value,unit,ref_min,ref_max,measured_at\n"
+)
+CSV_ROWS = """\
+{pid},,,A-1,Partner Lab,2025-01-10,glucose,105,mg/dL,70,100,
+{pid},,,A-1,Partner Lab,2025-01-10,hdl,52,mg/dL,40,60,
+,Maria Lopez,1980-04-02,A-2,Partner Lab,2025-02-11T08:30:00,ldl,90,mg/dL,,,
+,Nobody Known,1970-01-01,A-3,Partner Lab,2025-02-11,ldl,90,mg/dL,0,130,
+{pid},,,A-4,Partner Lab,2025-03-01,ferritin,12,ng/mL,20,10,
+"""
+CSV_EXPORT = CSV_HEADER + CSV_ROWS
+
+HL7_MESSAGE = (
+    "MSH|^~\\&|LIS|Central Lab|NANO|NANO|20250110083000||ORU^R01|1|P|2.5\r"
+    "PID|1||{pid}||Roe^Jane||19920615|F\r"
+    "OBR|1||ACC-9|CBC|||20250110080000\r"
+    "OBX|1|NM|718-7^Hemoglobin||11.2|g/dL|12-17.5|L|||F|||20250110081500\r"
+)
+
+
+class LabResultImportTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(
+            name="Jane Roe", sex="F", birth_date=date(1992, 6, 15)
+        )
+        Patient.objects.create(name="Maria Lopez", sex="F", birth_date=date(1980, 4, 2))
+        self.tmpdir = Path(tempfile.mkdtemp())
+
+    def _write(self, name, content):
+        path = self.tmpdir / name
+        path.write_text(content)
+        return path
+
+    def test_csv_import_copies_reports_and_results(self):
+        path = self._write("export.csv", CSV_EXPORT.format(pid=self.patient.pk))
+        out = io.StringIO()
+        call_command("import_lab_results", str(path), "--chunk-size", "1", stdout=out)
+
+        self.assertEqual(Report.objects.count(), 2)
+        first = Report.objects.get(raw_json__report_ref="A-1")
+        self.assertEqual(first.patient, self.patient)
+        glucose = ResultValue.objects.get(report=first, analyte__name="glucose")
+        self.assertEqual(glucose.flag, ResultValue.Flag.HIGH)
+        # A-1 spans two chunks; its search vector covers the analytes of both.
+        indexed = Report.objects.filter(search_vector=SearchQuery("hdl glucose", config="simple"))
+        self.assertEqual(list(indexed), [first])
+        ldl = ResultValue.objects.get(report__raw_json__report_ref="A-2")
+        self.assertEqual(ldl.ref_max, 130)
+        self.assertIn('"unknown patient": 1', out.getvalue())
+        self.assertIn('"invalid reference range": 1', out.getvalue())
+        self.assertTrue(json.loads(Path(f"{path}.checkpoint.json").read_text())["complete"])
+
+        call_command("import_lab_results", str(path), stdout=io.StringIO())
+        self.assertEqual(Report.objects.count(), 2)
+        self.assertEqual(ResultValue.objects.count(), 3)
+
+    def test_resume_skips_committed_records(self):
+        path = self._write("export.csv", CSV_EXPORT.format(pid=self.patient.pk))
+        Path(f"{path}.checkpoint.json").write_text(json.dumps({"position": 2}))
+        call_command("import_lab_results", str(path), "--resume", stdout=io.StringIO())
+        refs = Report.objects.values_list("raw_json__report_ref", flat=True)
+        self.assertEqual(list(refs), ["A-2"])
+
+    def test_resume_keeps_reports_that_straddle_the_checkpoint(self):
+        rows = [
+            f"{self.patient.pk},,,,Partner Lab,2025-01-10,{analyte},{value},mg/dL,0,200,"
+            for analyte, value in (("glucose", 90), ("hdl", 52), ("ldl", 100))
+        ]
+        path = self._write("export.csv", CSV_HEADER + "\n".join(rows) + "\n")
+        LabResultImporter(path.name).run(list(read_csv(io.StringIO(CSV_HEADER + rows[0]))))
+        Path(f"{path}.checkpoint.json").write_text(json.dumps({"position": 1}))
+        call_command("import_lab_results", str(path), "--resume", stdout=io.StringIO())
+        report = Report.objects.get()
+        self.assertEqual(report.results.count(), 3)
+
+    def test_replaying_a_committed_chunk_does_not_duplicate_results(self):
+        rows = [
+            f"{self.patient.pk},,,,Partner Lab,2025-01-10,{analyte},{value},mg/dL,0,200,"
+            for analyte, value in (("glucose", 90), ("hdl", 52), ("ldl", 100))
+        ]
+        path = self._write("export.csv", CSV_HEADER + "\n".join(rows) + "\n")
+        # Both chunks committed, but the process stopped before the last checkpoint write.
+        LabResultImporter(path.name, chunk_size=1).run(list(read_csv(path.open())))
+        Path(f"{path}.checkpoint.json").write_text(json.dumps({"position": 1}))
+        call_command("import_lab_results", str(path), "--resume", stdout=io.StringIO())
+        report = Report.objects.get()
+        self.assertEqual(report.results.count(), 3)
+
+    def test_rerunning_a_file_without_refs_skips_its_reports(self):
+        rows = CSV_HEADER + f"{self.patient.pk},,,,Partner Lab,2025-01-10,glucose,90,mg/dL,0,200,\n"
+        path = self._write("export.csv", rows)
+        call_command("import_lab_results", str(path), stdout=io.StringIO())
+        out = io.StringIO()
+        call_command("import_lab_results", str(path), stdout=out)
+        self.assertEqual(Report.objects.count(), 1)
+        self.assertEqual(ResultValue.objects.count(), 1)
+        self.assertIn("1 reports already present", out.getvalue())
+
+    def test_hl7_reader_maps_oru_segments(self):
+        records = list(read_hl7(io.StringIO(HL7_MESSAGE.format(pid=self.patient.pk))))
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record["lab_name"], "Central Lab")
+        self.assertEqual(record["patient_id"], str(self.patient.pk))
+        self.assertEqual(record["report_ref"], "ACC-9")
+        self.assertEqual(record["analyte"], "Hemoglobin")
+        self.assertEqual(
+            (record["value"], record["ref_min"], record["ref_max"]), ("11.2", "12", "17.5")
+        )
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.test import override_settings
+
+from core.services import ai_insights
+from core.services.llm import aguarded_call
+from core.services.llm_guard import LLMGuard, LLMUnavailable
+
+PAYLOAD = [
+    {
+        "analyte": "glucose",
+        "value": 130.0,
+        "unit": "mg/dL",
+        "ref_min": 70.0,
+        "ref_max": 100.0,
+        "flag": "high",
+        "measured_at": "2025-01-10T00:00:00+00:00",
+    }
+]
+
+
+def _guard(tmp_path, **overrides):
+    options = {
+        "rate_per_minute": 60,
+        "burst": 2,
+        "failure_threshold": 2,
+        "cooldown_seconds": 30,
+        **overrides,
+    }
+    return LLMGuard(str(tmp_path), **options)
+
+
+def test_token_bucket_is_shared_between_guard_instances(tmp_path):
+    first, second = _guard(tmp_path), _guard(tmp_path)
+    first.acquire()
+    second.acquire()
+    with pytest.raises(LLMUnavailable) as excinfo:
+        first.acquire()
+    assert excinfo.value.reason == "rate_limited"
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers(tmp_path, monkeypatch):
+    guard = _guard(tmp_path, burst=10)
+    guard.record_failure()
+    guard.record_success()
+    guard.record_failure()
+    guard.acquire()
+    guard.record_failure()
+    with pytest.raises(LLMUnavailable) as excinfo:
+        guard.acquire()
+    assert excinfo.value.reason == "circuit_open"
+
+    later = time.time() + 31
+    monkeypatch.setattr("core.services.llm_guard.time.time", lambda: later)
+    guard.acquire()
+    guard.record_failure()
+    with pytest.raises(LLMUnavailable):
+        guard.acquire()
+
+
+def test_half_open_breaker_lets_one_trial_call_through(tmp_path, monkeypatch):
+    guard, other_worker = _guard(tmp_path, burst=10), _guard(tmp_path, burst=10)
+    guard.record_failure()
+    guard.record_failure()
+    later = time.time() + 31
+    monkeypatch.setattr("core.services.llm_guard.time.time", lambda: later)
+
+    guard.acquire()
+    with pytest.raises(LLMUnavailable) as excinfo:
+        other_worker.acquire()
+    assert excinfo.value.reason == "circuit_open"
+    guard.record_success()
+    other_worker.acquire()
+    other_worker.acquire()
+
+    # A trial whose caller never reports back is given up after another cool-down.
+    guard.record_failure()
+    guard.record_failure()
+    later += 31
+    guard.acquire()
+    later += 31
+    other_worker.acquire()
+
+
+def test_async_guarded_call_keeps_the_file_lock_off_the_event_loop(tmp_path, monkeypatch):
+    guard = _guard(tmp_path)
+    threads = []
+    acquire = guard.acquire
+
+    def spy():
+        threads.append(threading.current_thread())
+        acquire()
+
+    monkeypatch.setattr(guard, "acquire", spy)
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: guard)
+    monkeypatch.setattr("core.services.llm.record_call", lambda *args: None)
+
+    async def call():
+        async with aguarded_call("insights"):
+            return threading.current_thread()
+
+    loop_thread = asyncio.run(call())
+    assert threads and threads[0] is not loop_thread
+
+
+def test_insights_fall_back_immediately_while_the_circuit_is_open(tmp_path, monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise TimeoutError("provider timed out")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_insights, "get_client", lambda: client)
+    monkeypatch.setattr(ai_insights, "get_api_key", lambda: "test-key")
+    monkeypatch.setattr(ai_insights, "_result_to_payload", lambda result: result)
+    report = SimpleNamespace(results=SimpleNamespace(all=lambda: PAYLOAD))
+
+    guard_settings = {"STATE_DIR": str(tmp_path), "FAILURE_THRESHOLD": 2, "BURST": 10}
+    with override_settings(LLM_GUARD=guard_settings):
+        for _ in range(4):
+            insights = ai_insights.generate_insights(report)
+            assert insights["triage"] == "priority"
+    assert len(calls) == 2
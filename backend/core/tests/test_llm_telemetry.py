@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import LLMCallLog, User
+from core.services import lab_vision
+from core.services.llm import guarded_call
+from core.services.llm_guard import LLMUnavailable
+from core.services.llm_telemetry import TelemetryWriter, call_cost
+
+
+def _completion(prompt_tokens=1200, completion_tokens=300, cached_tokens=1000):
+    usage = SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+    )
+    return SimpleNamespace(model="gpt-4o-mini-2024-07-18", usage=usage)
+
+
+class _RefusingGuard:
+    def acquire(self):
+        raise LLMUnavailable("circuit_open")
+
+
+def test_guarded_call_records_every_outcome(monkeypatch, llm_call_records):
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: None)
+    with guarded_call("insights", prompt_version="v7") as call:
+        call.attempts = 2
+        call.completion = _completion()
+    with pytest.raises(RuntimeError):
+        with guarded_call("ai_parse"):
+            raise RuntimeError("provider down")
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: _RefusingGuard())
+    with pytest.raises(LLMUnavailable):
+        with guarded_call("insights"):
+            pass
+
+    success, error, refused = llm_call_records
+    assert (success.stage, success.outcome, success.prompt_version) == ("insights", "success", "v7")
+    assert success.model == "gpt-4o-mini-2024-07-18"
+    assert (success.input_tokens, success.output_tokens, success.cached_tokens) == (1200, 300, 1000)
+    assert success.retries == 1
+    assert not success.fallback_used
+    assert (error.outcome, error.error, error.model) == ("error", "RuntimeError", "gpt-4o-mini")
+    assert error.fallback_used
+    assert (refused.outcome, refused.error, refused.latency_ms) == (
+        "unavailable",
+        "circuit_open",
+        0,
+    )
+
+
+def test_unparseable_ai_parse_output_counts_as_a_failure(monkeypatch, llm_call_records):
+    failures = []
+    guard = SimpleNamespace(
+        acquire=lambda: None,
+        record_success=lambda: pytest.fail("malformed output is not a success"),
+        record_failure=lambda: failures.append(1),
+    )
+    completion = _completion()
+    completion.choices = [SimpleNamespace(message=SimpleNamespace(content="not json"))]
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: completion))
+    )
+    monkeypatch.setattr("core.services.llm.get_guard", lambda: guard)
+    monkeypatch.setattr(lab_vision, "get_client", lambda: client)
+    monkeypatch.setattr(lab_vision, "get_api_key", lambda: "test-key")
+    assert lab_vision.parse_lab_document_with_ai("Glucose 90 mg/dL") is None
+    assert failures == [1]
+    (record,) = llm_call_records
+    assert (record.outcome, record.error, record.fallback_used) == (
+        "error",
+        "JSONDecodeError",
+        True,
+    )
+
+
+def test_writer_flushes_full_batches_and_stragglers():
+    batches = []
+    writer = TelemetryWriter(batch_size=2, flush_seconds=0.05, max_queue=3, write=batches.append)
+    for stage in ("a", "b", "c", "d"):
+        writer.submit(LLMCallLog(stage=stage, outcome="success"))
+    deadline = time.monotonic() + 2
+    while sum(map(len, batches)) + writer.dropped < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.dropped <= 1
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sum(map(len, batches)) + writer.dropped == 4
+
+
+def test_call_cost_uses_base_model_price_and_cached_discount():
+    cost = call_cost("gpt-4o-mini-2024-07-18", 1_000_000, 1_000_000, 400_000)
+    assert cost == pytest.approx(0.6 * 0.15 + 0.4 * 0.075 + 0.60)
+    assert call_cost("unknown-model", 1000, 1000, 0) == 0
+
+
+class LLMUsageSummaryTests(APITestCase):
+    url = "/api/analytics/llm-calls/"
+
+    def setUp(self):
+        for latency in (100, 200, 300, 400):
+            LLMCallLog.objects.create(
+                stage="insights",
+                model="gpt-4o-mini",
+                outcome="success",
+                latency_ms=latency,
+                input_tokens=1_000_000,
+                output_tokens=100_000,
+            )
+        LLMCallLog.objects.create(stage="insights", outcome="unavailable", fallback_used=True)
+        LLMCallLog.objects.create(
+            stage="insights", outcome="success", created_at=timezone.now() - timedelta(days=8)
+        )
+
+    def test_summary_is_staff_only(self):
+        doctor = User.objects.create_user(username="llm_doctor", password="x", role="doctor")
+        self.client.force_authenticate(user=doctor)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_summary_reports_latency_percentiles_and_spend(self):
+        staff = User.objects.create_user(username="llm_staff", password="x", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"days": 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary_sql = [query["sql"] for query in queries if "core_llmcalllog" in query["sql"]]
+        self.assertTrue(summary_sql)
+        self.assertTrue(all('"created_at" >=' in sql for sql in summary_sql))
+        (today,) = response.data["days"]
+        self.assertEqual((today["calls"], today["errors"], today["fallbacks"]), (5, 0, 1))
+        self.assertAlmostEqual(today["p50_latency_ms"], 250)
+        self.assertAlmostEqual(today["p95_latency_ms"], 385)
+        self.assertEqual(today["input_tokens"], 4_000_000)
+        self.assertAlmostEqual(today["cost_usd"], 4 * (0.15 + 0.06))
+
+        bad = self.client.get(self.url, {"days": 0})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
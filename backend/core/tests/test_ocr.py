@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+
+from core.benchmarks.synthetic_pdf import render_pdf
+from core.services import ocr, pdf_parser
+
+DPI = 300
+SCANNED_LINES = [
+    [(60, "Laboratorio Central")],
+    [(60, "Fecha de reporte: 05/11/2025")],
+    [(60, "Análisis"), (250, "Resultado"), (340, "Unidades"), (430, "Referencia")],
+    [(60, "Glucosa"), (250, "95"), (340, "mg/dL"), (430, "70 - 100")],
+    [(60, "Colesterol HDL"), (250, "38"), (340, "mg/dL"), (430, "40 - 60")],
+]
+
+
+def _tsv(lines):
+    """Tesseract TSV for ``lines`` of ``(x in points, text)`` cells, one word per token."""
+    header = "level page_num block_num par_num line_num word_num left top width height conf text"
+    rows = [header.replace(" ", "\t")]
+    scale = DPI / 72
+    for line_number, cells in enumerate(lines, start=1):
+        top = int((100 + line_number * 20) * scale)
+        rows.append(f"4\t1\t1\t1\t{line_number}\t0\t0\t{top}\t2000\t40\t-1\t")
+        word_number = 0
+        for x, cell in cells:
+            left = int(x * scale)
+            for word in cell.split():
+                word_number += 1
+                width = len(word) * 20
+                # Ascenders make Tesseract's word boxes start a few pixels apart.
+                rows.append(
+                    f"5\t1\t1\t1\t{line_number}\t{word_number}\t{left}\t{top + word_number % 3}"
+                    f"\t{width}\t40\t95\t{word}"
+                )
+                left += width + 12
+    return "\n".join(rows) + "\n"
+
+
+@pytest.fixture
+def scanned_pdf():
+    # A page with table rulings but no text layer, like a scanner's output.
+    rules = [(60, 600 - 20 * row, 552, 600 - 20 * row) for row in range(4)]
+    return render_pdf([([], rules), ([], [])])
+
+
+@pytest.fixture
+def tesseract(monkeypatch, settings):
+    settings.OCR = {"COMMAND": sys.executable, "DPI": DPI, "WORKERS": 2}
+    cache.clear()
+    outputs = [_tsv(SCANNED_LINES), _tsv([[(60, "Observaciones: ninguna")]])]
+    rendered = {}
+    calls = []
+
+    def render(data, numbers, dpi):
+        images = ocr.render_pages(data, numbers, dpi)
+        rendered.update({image: number for number, image in images.items()})
+        return images
+
+    def run(command, input, capture_output, timeout, check):
+        assert command[1:3] == ["stdin", "stdout"] and command[-1] == "tsv"
+        assert input.startswith(b"\x89PNG")
+        calls.append(timeout)
+        return SimpleNamespace(stdout=outputs[rendered[input]].encode())
+
+    monkeypatch.setattr(pdf_parser, "render_pages", render)
+    monkeypatch.setattr(ocr.subprocess, "run", run)
+    return calls
+
+
+def test_scanned_pages_are_ocred_and_parsed(tesseract, scanned_pdf):
+    text, tables = pdf_parser._extract_document(io.BytesIO(scanned_pdf))
+    assert len(tesseract) == 2
+    assert tesseract[0] == 30
+    assert "Glucosa 95 mg/dL 70 - 100" in text.splitlines()
+    assert "Observaciones: ninguna" in text
+    assert tables[0][1] == ["Glucosa", "95", "mg/dL", "70 - 100"]
+
+    pdf_parser._extract_document(io.BytesIO(scanned_pdf))
+    assert len(tesseract) == 2  # both pages came from the cache
+
+
+def test_timed_out_pages_are_skipped(monkeypatch, settings, scanned_pdf):
+    settings.OCR = {"COMMAND": sys.executable, "PAGE_TIMEOUT_SECONDS": 1}
+    cache.clear()
+
+    def run(command, timeout, **kwargs):
+        raise subprocess.TimeoutExpired(command, timeout)
+
+    monkeypatch.setattr(ocr.subprocess, "run", run)
+    text, tables = pdf_parser._extract_document(io.BytesIO(scanned_pdf))
+    assert (text.strip(), tables) == ("", [])
+
+
+def test_ocr_is_skipped_without_tesseract(monkeypatch, settings, scanned_pdf):
+    settings.OCR = {"COMMAND": "definitely-not-tesseract"}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("nothing should be rendered or run")
+
+    monkeypatch.setattr(pdf_parser, "render_pages", fail)
+    monkeypatch.setattr(ocr.subprocess, "run", fail)
+    assert pdf_parser._extract_document(io.BytesIO(scanned_pdf)) == ("\n", [])
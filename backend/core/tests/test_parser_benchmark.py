@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import io
+
+import pdfplumber
+from django.core.management import call_command
+
+from core.benchmarks.harness import golden_corpus, load_golden, run_benchmark
+from core.benchmarks.synthetic_pdf import DocumentSpec, generate_document
+
+
+def test_golden_corpus_matches_the_generator():
+    for entry in load_golden():
+        _, expected = generate_document(DocumentSpec(**entry["spec"]))
+        assert expected == entry["expected"], entry["spec"]
+
+
+def test_synthetic_pdf_is_readable():
+    data, expected = generate_document(DocumentSpec(seed=3, language="es", pages=2))
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        assert len(pdf.pages) == 2
+        text = pdf.pages[0].extract_text()
+    assert expected["lab_name"] in text
+    assert "Fecha de reporte" in text
+
+
+def test_parser_accuracy_on_golden_corpus_does_not_regress():
+    report = run_benchmark(golden_corpus(), memory=False)
+    assert report.documents == len(load_golden())
+    assert report.text_recall == 1
+    assert report.date_accuracy == 1
+    assert report.scores["tables"].precision == 1
+    assert report.scores["parse_pdf"].recall == 1
+    assert report.scores["parse_pdf"].precision >= 0.95
+    assert report.parsers["table"] >= 16
+
+
+def test_benchmark_parser_command_reports_throughput():
+    out = io.StringIO()
+    call_command("benchmark_parser", "--documents", "6", "--repeat", "1", "--no-memory", stdout=out)
+    output = out.getvalue()
+    assert "extract_text" in output
+    assert "6 documents" in output
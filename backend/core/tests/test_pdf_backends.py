@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from core.benchmarks.synthetic_pdf import DocumentSpec, generate_document
+from core.services import pdf_backends, pdf_parser
+
+
+@pytest.fixture
+def document():
+    return generate_document(DocumentSpec(seed=3, layout="aligned_columns", pages=2))
+
+
+def test_text_backends_read_the_same_words(document):
+    data, expected = document
+    texts = {
+        name: pdf_parser._extract_text(io.BytesIO(data), name)
+        for name in pdf_backends.TEXT_BACKENDS
+    }
+    for text in texts.values():
+        assert expected["lab_name"] in text
+        assert text.count(expected["lab_name"]) == 2
+    assert texts["pypdfium2"].split() == texts["pdfplumber"].split()
+
+
+def test_backends_follow_the_setting_unless_the_caller_picks_one(settings):
+    settings.PDF_BACKENDS = {"text": "pdfplumber"}
+    assert pdf_backends.get_backend("text").name == "pdfplumber"
+    assert pdf_backends.get_backend("text", "pypdfium2").name == "pypdfium2"
+    assert pdf_backends.get_backend("tables").name == "pdfplumber"
+
+
+def test_unknown_backends_are_a_configuration_error():
+    with pytest.raises(ImproperlyConfigured):
+        pdf_backends.get_backend("text", "ghostscript")
+    with pytest.raises(ImproperlyConfigured):
+        pdf_backends.get_backend("tables", "pypdfium2")
+
+
+def test_only_pages_with_results_are_searched_for_tables(monkeypatch, document):
+    data, expected = document
+    searched = []
+    page_tables = pdf_backends.PdfplumberBackend.page_tables
+
+    def spy(self, data, numbers):
+        searched.append(list(numbers))
+        return page_tables(self, data, numbers)
+
+    monkeypatch.setattr(pdf_backends.PdfplumberBackend, "page_tables", spy)
+    text, tables = pdf_parser._extract_document(io.BytesIO(data), {"text": "pypdfium2"})
+    assert searched == [[0]]
+    assert len(tables[0]) == len(expected["analytes"]) + 1
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import io
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from utils.parsers import ORJSONParser
+from utils.renderers import ORJSONRenderer
+
+PAYLOAD = {
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "issued_at": datetime(2025, 1, 10, 8, 30, 15, 123000, tzinfo=timezone.utc),
+    "value": Decimal("95.5000"),
+    "label": gettext_lazy("Glucose"),
+    "counts": {1: "one"},
+    "points": [{"value": 1.5, "flag": None, "tags": ("a", "b")}],
+    "text": "Hemoglobina 13 g/dL ✓",
+}
+
+
+def test_orjson_renderer_matches_drf_output():
+    assert ORJSONRenderer().render(PAYLOAD) == JSONRenderer().render(PAYLOAD)
+
+
+def test_orjson_renderer_honours_indent_and_empty_data():
+    rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=4")
+    assert rendered == b'{\n  "a": 1\n}'
+    assert ORJSONRenderer().render(None) == b""
+
+
+def test_orjson_parser_round_trip_and_errors():
+    parser = ORJSONParser()
+    body = ORJSONRenderer().render(PAYLOAD)
+    assert parser.parse(io.BytesIO(body))["value"] == 95.5
+    with pytest.raises(ParseError):
+        parser.parse(io.BytesIO(b'{"value": NaN}'))
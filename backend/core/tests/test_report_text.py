@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import importlib
+from datetime import date, datetime, timezone
+
+from django.apps import apps
+from rest_framework import status
+from rest_framework.test import APITestCase
+from utils.compression import ZLIB, compress_text, decompress_text
+
+from core.models import Patient, Report, ReportText, User
+from core.services.report_text import store_report_text
+
+move_raw_text = importlib.import_module("core.migrations.0012_reporttext").move_raw_text
+
+TEXT = "Laboratorio Central\nGlucosa 95 mg/dL 70 - 100\n" * 200
+
+
+def test_compression_round_trip_and_zstd_fallback():
+    codec, payload = compress_text(TEXT)
+    assert codec == ZLIB
+    assert len(payload) < len(TEXT.encode()) / 10
+    assert decompress_text(codec, memoryview(payload)) == TEXT
+    used, _ = compress_text("texto", codec="zstd")
+    assert used in {"zstd", "zlib"}
+
+
+class ReportTextTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="text_owner", password="x")
+        patient = Patient.objects.create(
+            user=self.owner, name="Text", sex="F", birth_date=date(1990, 1, 1)
+        )
+        self.report = Report.objects.create(
+            patient=patient, org_name="Lab", issued_at=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+        self.url = f"/api/reports/{self.report.pk}/text/"
+
+    def test_text_endpoint_returns_decompressed_text_to_owner_only(self):
+        store_report_text(self.report.pk, TEXT)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["text"], response.data["length"]), (TEXT, len(TEXT)))
+
+        stranger = User.objects.create_user(username="text_stranger", password="x")
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_missing_text_is_404(self):
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_migration_moves_and_dedupes_raw_text(self):
+        Report.objects.filter(pk=self.report.pk).update(
+            raw_json={"filename": "a.pdf", "raw_text": TEXT},
+            parsed_fields={"lab_name": "Lab", "raw_text": TEXT},
+        )
+        move_raw_text(apps, None)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.raw_json, {"filename": "a.pdf"})
+        self.assertEqual(self.report.parsed_fields, {"lab_name": "Lab"})
+        self.assertEqual(ReportText.objects.get(report=self.report).text, TEXT)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import io
+from datetime import date, datetime, timezone
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Analyte, Patient, Report, ResultValue, User
+from core.services.report_text import store_report_text
+from core.services.search import update_search_vectors
+
+
+class ReportSearchTests(APITestCase):
+    url = "/api/reports/search/"
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="search_owner", password="x")
+        self.other_user = User.objects.create_user(username="search_other", password="x")
+        ferritin = Analyte.objects.create(name="ferritin", unit="ng/mL")
+        glucose = Analyte.objects.create(name="glucose", unit="mg/dL")
+        own = Patient.objects.create(
+            user=self.owner, name="Own", sex="F", birth_date=date(1990, 1, 1)
+        )
+        other = Patient.objects.create(
+            user=self.other_user, name="Other", sex="M", birth_date=date(1980, 1, 1)
+        )
+        self.mentioned = self._report(own, "Hierro sérico normal; ferritin baja.", [glucose])
+        self.measured = self._report(other, "Perfil metabólico.", [ferritin])
+        self.unrelated = self._report(own, "Biometría hemática completa.", [glucose])
+        update_search_vectors(Report.objects.values_list("id", flat=True))
+
+    def _report(self, patient, text, analytes):
+        issued = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        report = Report.objects.create(patient=patient, org_name="Lab Central", issued_at=issued)
+        store_report_text(report.pk, text)
+        for analyte in analytes:
+            ResultValue.objects.create(
+                report=report,
+                analyte=analyte,
+                value=10,
+                unit=analyte.unit,
+                ref_min=5,
+                ref_max=20,
+                flag="normal",
+                measured_at=issued,
+            )
+        return report
+
+    def test_clinical_search_ranks_analyte_matches_above_text_mentions(self):
+        doctor = User.objects.create_user(username="search_doctor", password="x", role="doctor")
+        self.client.force_authenticate(user=doctor)
+        response = self.client.get(self.url, {"q": "ferritin"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [row["id"] for row in response.data["results"]]
+        self.assertEqual(ids, [str(self.measured.pk), str(self.mentioned.pk)])
+        self.assertIn("<mark>ferritin</mark>", response.data["results"][1]["headline"])
+        self.assertIsNone(response.data["next"])
+        self.assertNotIn("count", response.data)
+
+    def test_patients_only_find_their_own_reports(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {"q": "ferritin"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [str(self.mentioned.pk)])
+
+    def test_query_is_required_and_pages_without_count(self):
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"q": "lab central", "page_size": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIn("page=2", response.data["next"])
+
+    def test_backfill_command_indexes_missing_vectors(self):
+        Report.objects.update(search_vector=None)
+        call_command("backfill_search_vectors", "--batch-size", "2", stdout=io.StringIO())
+        self.assertFalse(Report.objects.filter(search_vector__isnull=True).exists())
+        doctor = User.objects.create_user(username="search_admin", password="x", is_staff=True)
+        self.client.force_authenticate(user=doctor)
+        response = self.client.get(self.url, {"q": "biometría"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [str(self.unrelated.pk)])
+
+    def test_headlines_escape_the_report_text(self):
+        report = self._report(
+            self.mentioned.patient, "ferritin <12 & hierro <img src=x onerror=alert(1)", []
+        )
+        update_search_vectors([report.pk])
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.url, {"q": "hierro"})
+        headline = {row["id"]: row["headline"] for row in response.data["results"]}[str(report.pk)]
+        self.assertNotIn("<img", headline)
+        self.assertIn("ferritin &lt;12 &amp; <mark>hierro</mark>", headline)
+
+    def test_reports_and_results_added_through_the_api_are_searchable(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(
+            "/api/reports/",
+            {
+                "patient_id": str(self.mentioned.patient_id),
+                "org_name": "Laboratorio Norte",
+                "issued_at": "2025-02-01T00:00:00Z",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report_id = response.data["id"]
+        results = self.client.get(self.url, {"q": "norte"}).data["results"]
+        self.assertEqual([row["id"] for row in results], [report_id])
+
+        ferritin = Analyte.objects.get(name="ferritin")
+        response = self.client.post(
+            "/api/result-values/",
+            {
+                "report_id": report_id,
+                "analyte_id": ferritin.pk,
+                "value": 12,
+                "ref_min": 5,
+                "ref_max": 20,
+                "unit": "ng/mL",
+                "measured_at": "2025-02-01T00:00:00Z",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        results = self.client.get(self.url, {"q": "ferritin"}).data["results"]
+        self.assertEqual([row["id"] for row in results][0], report_id)
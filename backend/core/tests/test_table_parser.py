@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from core.models import ParserTemplate
+from core.services import pdf_parser
+from core.services.parser_templates import flush_template_hits
+from core.services.pdf_parser import DEFAULT_ANALYTES
+from core.services.table_parser import (
+    extract_table_analytes,
+    layout_fingerprint,
+    tables_from_words,
+)
+
+HEADED_TABLE = [
+    ["Análisis", "Resultado", "Unidades", "Valores de referencia"],
+    ["Glucosa", "95", "mg/dL", "70 - 100"],
+    ["Colesterol HDL", "38 L", "mg/dL", "40 - 60"],
+    ["Vitamina D", "31,5", "ng/mL", "30 - 100"],
+]
+UNHEADED_TABLE = [
+    ["HDL Cholesterol", "45", "40-60", "mg/dL"],
+    ["Triglycerides", "*180", "< 150", "mg/dL"],
+]
+
+
+def test_headed_table_is_read_from_its_header():
+    result = extract_table_analytes([HEADED_TABLE], DEFAULT_ANALYTES)
+    by_name = {item["name"]: item for item in result.analytes}
+    assert set(by_name) == {"glucose", "hdl", "vitamina_d"}
+    assert by_name["hdl"]["value"] == 38
+    assert (by_name["vitamina_d"]["value"], by_name["vitamina_d"]["unit"]) == (31.5, "ng/mL")
+    assert (by_name["glucose"]["ref_min"], by_name["glucose"]["ref_max"]) == (70, 100)
+    assert result.candidates == 3
+    # Vitamin D is not in the catalog; the other rows are read in full.
+    assert result.confidence == pytest.approx((1 + 1 + 0.7) / 3)
+
+
+def test_columns_are_inferred_without_a_header():
+    result = extract_table_analytes([UNHEADED_TABLE], DEFAULT_ANALYTES)
+    hdl, triglycerides = result.analytes
+    assert (hdl["name"], hdl["ref_min"], hdl["ref_max"], hdl["unit"]) == ("hdl", 40, 60, "mg/dL")
+    assert (triglycerides["value"], triglycerides["ref_max"]) == (180, 150)
+    assert result.confidence == 1
+
+
+def test_unreadable_rows_lower_confidence():
+    table = HEADED_TABLE + [
+        ["Ferritina", "pendiente", "ng/mL", "15 - 150"],
+        ["Sodio", "140", "", ""],
+    ]
+    result = extract_table_analytes([table], DEFAULT_ANALYTES)
+    assert len(result.analytes) == 3
+    assert result.candidates == 5
+    assert result.confidence < 0.8
+
+
+def test_tables_are_rebuilt_from_aligned_words():
+    def word(text, x0, top):
+        return {"text": text, "x0": x0, "x1": x0 + 5 * len(text), "top": top}
+
+    words = [
+        word("Laboratorio Central", 60, 10),
+        word("Glucosa", 60, 40),
+        word("95", 250, 40.5),
+        word("mg/dL", 340, 40),
+        word("Colesterol", 60, 60),
+        word("HDL", 113, 60),
+        word("38", 250, 60),
+        word("Página 1", 60, 90),
+    ]
+    assert tables_from_words(words) == [[["Glucosa", "95", "mg/dL"], ["Colesterol HDL", "38"]]]
+
+
+def _pdf():
+    return SimpleUploadedFile("lab.pdf", b"%PDF-1.4 stub", content_type="application/pdf")
+
+
+@pytest.fixture(autouse=True)
+def _clear_template_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_confident_tables_skip_the_llm(monkeypatch):
+    text = "Laboratorio Central\nReport Date: 2025-11-05"
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: (text, [HEADED_TABLE]))
+
+    def fail(_text):
+        raise AssertionError("the LLM parser should not run")
+
+    monkeypatch.setattr(pdf_parser, "parse_lab_document_with_ai", fail)
+    payload = pdf_parser.parse_pdf(_pdf())
+    assert payload["parser"] == "table"
+    assert payload["confidence"] >= 0.8
+    assert payload["lab_name"] == "Laboratorio Central"
+    assert payload["report_date"].date().isoformat() == "2025-11-05"
+    assert {item["measured_at"] for item in payload["analytes"]} == {
+        payload["report_date"].isoformat()
+    }
+
+
+@pytest.mark.django_db
+def test_low_confidence_tables_fall_back_to_the_llm(monkeypatch, settings):
+    settings.PARSER_ROUTING = {"TABLE_MIN_CONFIDENCE": 0.99}
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: ("Glucose", [HEADED_TABLE]))
+    calls = []
+
+    def ai(text):
+        calls.append(text)
+        return {"analytes": [{"name": "glucose", "value": "96", "unit": "mg/dL"}]}
+
+    monkeypatch.setattr(pdf_parser, "parse_lab_document_with_ai", ai)
+    payload = pdf_parser.parse_pdf(_pdf())
+    assert calls == ["Glucose"]
+    assert payload["parser"] == "ai"
+
+    monkeypatch.setattr(pdf_parser, "parse_lab_document_with_ai", lambda text: None)
+    payload = pdf_parser.parse_pdf(_pdf())
+    assert payload["parser"] == "table"
+    assert len(payload["analytes"]) == 3
+
+
+@pytest.mark.django_db
+def test_tables_of_unknown_tests_go_to_the_llm(monkeypatch):
+    table = [
+        ["Análisis", "Resultado", "Unidades", "Valores de referencia"],
+        ["Vitamina B12", "410", "pg/mL", "200 - 900"],
+        ["Ácido fólico", "9,1", "ng/mL", "3 - 17"],
+    ]
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: ("Laboratorio", [table]))
+    monkeypatch.setattr(
+        pdf_parser,
+        "parse_lab_document_with_ai",
+        lambda text: {"analytes": [{"name": "vitamin_b12", "value": "410", "unit": "pg/mL"}]},
+    )
+    payload = pdf_parser.parse_pdf(_pdf())
+    assert payload["parser"] == "ai"
+    assert [item["name"] for item in payload["analytes"]] == ["vitamin_b12"]
+
+
+@pytest.mark.django_db
+def test_low_confidence_tables_lose_to_a_fuller_regex_read(monkeypatch, settings):
+    settings.PARSER_ROUTING = {"TABLE_MIN_CONFIDENCE": 0.99}
+    text = "Glucose 95 mg/dL 70-100\nHDL 52 mg/dL 40-60\nLDL 120 mg/dL 0-130"
+    table = [["Glucose", "95", "70 - 100"]]  # no unit column: scores 0.8
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: (text, [table]))
+    monkeypatch.setattr(pdf_parser, "parse_lab_document_with_ai", lambda text: None)
+    payload = pdf_parser.parse_pdf(_pdf())
+    assert payload["parser"] == "regex"
+    assert len(payload["analytes"]) == 3
+
+
+def test_fingerprint_ignores_patient_values_but_not_layout():
+    other_values = [row[:] for row in HEADED_TABLE]
+    other_values[1][1] = "120"
+    fingerprint = layout_fingerprint("Laboratorio Central", [HEADED_TABLE])
+    assert layout_fingerprint("Laboratorio  central", [other_values]) == fingerprint
+    assert layout_fingerprint("Otro Laboratorio", [HEADED_TABLE]) != fingerprint
+    assert layout_fingerprint("Laboratorio Central", [UNHEADED_TABLE]) != fingerprint
+
+
+@pytest.mark.django_db
+def test_layout_template_is_learned_reused_and_replaced(monkeypatch):
+    text = "Laboratorio Central\nReport Date: 2025-11-05"
+    tables = [UNHEADED_TABLE]
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: (text, tables))
+
+    first = pdf_parser.parse_pdf(_pdf())
+    template = ParserTemplate.objects.get()
+    assert first["parser"] == "table"
+    assert template.lab_name == "Laboratorio Central"
+    assert template.layout == [
+        {"start": 0, "columns": {"name": 0, "value": 1, "range": 2, "unit": 3}}
+    ]
+
+    second = pdf_parser.parse_pdf(_pdf())
+    assert second["parser"] == "template"
+    assert second["analytes"] == first["analytes"]
+
+    # Same fingerprint, but the lab moved the unit and range columns.
+    tables = [[[row[0], row[1], row[3], row[2]] for row in UNHEADED_TABLE]]
+    third = pdf_parser.parse_pdf(_pdf())
+    template.refresh_from_db()
+    assert third["parser"] == "table"
+    assert (template.hits, template.misses) == (1, 1)
+    assert template.layout[0]["columns"] == {"name": 0, "value": 1, "unit": 2, "range": 3}
+
+
+@pytest.mark.django_db
+def test_template_hits_are_written_in_batches(monkeypatch, settings):
+    text = "Laboratorio Central\nReport Date: 2025-11-05"
+    monkeypatch.setattr(pdf_parser, "_extract_document", lambda f: (text, [UNHEADED_TABLE]))
+    settings.PARSER_ROUTING = {**settings.PARSER_ROUTING, "TEMPLATE_HIT_FLUSH_EVERY": 3}
+    pdf_parser.parse_pdf(_pdf())
+    template = ParserTemplate.objects.get()
+
+    for _ in range(2):
+        assert pdf_parser.parse_pdf(_pdf())["parser"] == "template"
+    template.refresh_from_db()
+    assert (template.hits, template.last_used_at) == (0, None)
+
+    pdf_parser.parse_pdf(_pdf())
+    template.refresh_from_db()
+    assert template.hits == 3
+    assert template.last_used_at is not None
+
+    # Hits still pending when the process exits are written by the atexit flush.
+    pdf_parser.parse_pdf(_pdf())
+    flush_template_hits()
+    template.refresh_from_db()
+    assert template.hits == 4
+    flush_template_hits()
+    template.refresh_from_db()
+    assert template.hits == 4
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import io
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from core.models import Analyte, Patient, Report, ResultValue
+from core.serializers import ResultValueSerializer
+from core.services.units import canonicalize, conversion_for, normalize_unit
+
+
+def test_normalize_unit_handles_common_spellings():
+    assert normalize_unit(" MG/DL ") == "mg/dL"
+    assert normalize_unit("umol/l") == "µmol/L"
+    assert normalize_unit("IU/mL") == "IU/mL"
+
+
+def test_canonicalize_converts_molar_and_mass_units():
+    assert canonicalize("glucose", "mmol/L", Decimal("5.5")) == (99.088, "mg/dL")
+    assert canonicalize("hemoglobin", "g/L", 140) == (14.0, "g/dL")
+    assert canonicalize("glucose", "mg/dL", 90) == (90.0, "mg/dL")
+
+
+def test_unknown_analytes_fall_back_to_their_own_unit():
+    assert conversion_for("ferritin", "ng/mL", "ng/mL") == (1.0, "ng/mL")
+    assert canonicalize("ferritin", "pmol/L", 10, "ng/mL") == (None, "ng/mL")
+
+
+@pytest.mark.django_db
+def test_result_values_get_canonical_columns_and_backfill_fills_legacy_rows():
+    patient = Patient.objects.create(name="Units", sex="F", birth_date=date(1980, 1, 1))
+    report = Report.objects.create(
+        patient=patient, org_name="Lab", issued_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+    )
+    glucose = Analyte.objects.create(name="glucose", unit="mg/dL")
+    serializer = ResultValueSerializer(
+        data={
+            "report_id": report.pk,
+            "analyte_id": glucose.pk,
+            "value": "5.0",
+            "unit": "mmol/L",
+            "ref_min": "3.9",
+            "ref_max": "5.6",
+            "measured_at": report.issued_at.isoformat(),
+        }
+    )
+    assert serializer.is_valid(), serializer.errors
+    result = serializer.save()
+    assert (result.canonical_value, result.canonical_unit) == (90.08, "mg/dL")
+
+    ResultValue.objects.filter(pk=result.pk).update(canonical_value=None, canonical_unit="")
+    call_command("backfill_canonical_values", batch_size=10, stdout=io.StringIO())
+    result.refresh_from_db()
+    assert (result.canonical_value, result.canonical_unit) == (90.08, "mg/dL")
+
+
+@pytest.mark.django_db
+def test_partial_updates_recompute_canonical_values_only_when_the_measurement_changes(
+    django_assert_num_queries,
+):
+    patient = Patient.objects.create(name="Units", sex="F", birth_date=date(1980, 1, 1))
+    report = Report.objects.create(
+        patient=patient, org_name="Lab", issued_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+    )
+    glucose = Analyte.objects.create(name="glucose", unit="mg/dL")
+    result = ResultValue.objects.create(
+        report=report,
+        analyte=glucose,
+        value=Decimal("5.0"),
+        unit="mmol/L",
+        ref_min=Decimal("3.9"),
+        ref_max=Decimal("5.6"),
+        measured_at=report.issued_at,
+        canonical_value=90.08,
+        canonical_unit="mg/dL",
+    )
+    result = ResultValue.objects.get(pk=result.pk)
+
+    serializer = ResultValueSerializer(result, data={"ref_max": "6.0"}, partial=True)
+    assert serializer.is_valid(), serializer.errors
+    # Only the UPDATE: the analyte is not loaded to recompute an unchanged value.
+    with django_assert_num_queries(1):
+        serializer.save()
+
+    serializer = ResultValueSerializer(result, data={"value": "6.0"}, partial=True)
+    assert serializer.is_valid(), serializer.errors
+    result = serializer.save()
+    result.refresh_from_db()
+    assert (result.canonical_value, result.canonical_unit) == (108.096, "mg/dL")
@@ -6,15 +6,35 @@ from .views_profile import ProfileView
 urlpatterns = [
     path("patients/", views.PatientListCreateView.as_view(), name="patient-list"),
     path("patients/<uuid:pk>/", views.PatientDetailView.as_view(), name="patient-detail"),
+    path(
+        "patients/<uuid:pk>/results/export/",
+        views.PatientResultsExportView.as_view(),
+        name="patient-results-export",
+    ),
     path("reports/", views.ReportListCreateView.as_view(), name="report-list"),
+    path("reports/search/", views.ReportSearchView.as_view(), name="report-search"),
     path("reports/<uuid:pk>/", views.ReportDetailView.as_view(), name="report-detail"),
     path("reports/<uuid:pk>/download/", views.ReportDownloadView.as_view(), name="report-download"),
+    path("reports/<uuid:pk>/text/", views.ReportTextView.as_view(), name="report-text"),
+    path(
+        "reports/<uuid:pk>/insights/stream/",
+        views.ReportInsightsStreamView.as_view(),
+        name="report-insights-stream",
+    ),
     path("reports/<uuid:pk>/delete/", views.ReportDeleteView.as_view(), name="report-delete"),
     path("reports/upload/", views.ReportUploadView.as_view(), name="report-upload"),
+    path(
+        "reports/upload/batch/",
+        views.ReportBatchUploadView.as_view(),
+        name="report-upload-batch",
+    ),
+    path("lab/results/bulk/", views.LabBulkResultsView.as_view(), name="lab-results-bulk"),
     path("report-trends/", views.ReportTrendsView.as_view(), name="report-trends"),
     path("profile/", ProfileView.as_view(), name="profile"),
     path("onboarding/", views.OnboardingProfileView.as_view(), name="onboarding"),
     path("analytes/", views.AnalyteListCreateView.as_view(), name="analyte-list"),
+    path("analytics/analytes/", views.AnalyteAnalyticsView.as_view(), name="analyte-analytics"),
+    path("analytics/llm-calls/", views.LLMUsageSummaryView.as_view(), name="llm-usage-summary"),
     path("result-values/", views.ResultValueListCreateView.as_view(), name="resultvalue-list"),
     path("alerts/", views.AlertListView.as_view(), name="alert-list"),
 ]
@@ -1,35 +1,55 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import datetime
 from pathlib import Path
 
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from django.utils.dateparse import parse_datetime
-from django.http import FileResponse, Http404, HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponseRedirect, StreamingHttpResponse
 from rest_framework import generics, permissions, parsers
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Alert, Analyte, OnboardingProfile, Patient, Report, ResultValue, User
-from .permissions import IsOwnerOrClinical
+from .access import CLINICAL_ROLES, get_patient_access
+from .models import (
+    Alert,
+    Analyte,
+    AnalyteRollup,
+    OnboardingProfile,
+    Patient,
+    Report,
+    ReportText,
+    ResultValue,
+    User,
+)
+from .permissions import IsClinicalRole, IsLabRole, IsOwnerOrClinical
 from .serializers import (
     AlertSerializer,
+    AnalyteRollupSerializer,
     AnalyteSerializer,
     OnboardingProfileSerializer,
     PatientSerializer,
     RegisterSerializer,
+    ReportBatchUploadSerializer,
+    ReportSearchResultSerializer,
     ReportSerializer,
     ReportUploadSerializer,
     ResultValueSerializer,
     UserSerializer,
 )
-from .services.ai_insights import generate_insights
-from .services.pdf_parser import parse_pdf
+from .services.batch_upload import BatchUploadError, aingest_batch, collect_documents
+from .services.bulk_results import BulkValidationError, store_bulk_results, validate_bulk_payload
+from .services.ingestion import aingest_pdf
+from .services.insights_stream import stream_report_insights
+from .services.llm_telemetry import daily_summary
+from .services.results_export import EXPORT_FORMATS, STREAMERS
+from .services.search import attach_headlines, search_reports, update_search_vectors
+from .services.units import conversion_for
+from utils.async_views import AsyncAPIView
+from utils.pagination import NoCountPagination
+from utils.renderers import EventStreamRenderer
 
 
 class RegisterView(APIView):
@@ -57,14 +77,9 @@ class PatientListCreateView(generics.ListCreateAPIView):
     queryset = Patient.objects.select_related("user", "onboarding")
 
     def get_queryset(self):
-        user = self.request.user
         queryset = Patient.objects.select_related("user", "onboarding")
-        mine = self.request.query_params.get("mine")
-        if mine in {"true", "1", "yes"}:
-            return queryset.filter(user=user)
-        if user.role in IsOwnerOrClinical.clinical_roles or user.is_staff:
-            return queryset
-        return queryset.filter(user=user)
+        mine = self.request.query_params.get("mine") in {"true", "1", "yes"}
+        return get_patient_access(self.request).scope(queryset, "pk", mine=mine)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -80,6 +95,28 @@ class PatientDetailView(generics.RetrieveAPIView):
     permission_classes = [IsOwnerOrClinical]
 
 
+class PatientResultsExportView(AsyncAPIView):
+    """Streams every result of a patient as CSV or NDJSON without buffering the rows."""
+
+    permission_classes = [IsOwnerOrClinical]
+
+    async def get(self, request, pk):
+        patient = await aget_object_or_404(Patient, pk=pk)
+        await self.acheck_object_permissions(request, patient)
+        # ``format`` is reserved by DRF's content negotiation, hence ``output``.
+        output = request.query_params.get("output", "csv").lower()
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+        response = StreamingHttpResponse(
+            STREAMERS[output](patient.pk), content_type=EXPORT_FORMATS[output]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="patient-{patient.pk}-results.{output}"'
+        )
+        response["Cache-Control"] = "no-store"
+        return response
+
+
 class ReportListCreateView(generics.ListCreateAPIView):
     serializer_class = ReportSerializer
     queryset = Report.objects.select_related("patient", "patient__user").prefetch_related(
@@ -87,35 +124,93 @@ class ReportListCreateView(generics.ListCreateAPIView):
     )
 
     def get_queryset(self):
-        user = self.request.user
         queryset = Report.objects.select_related("patient", "patient__user").prefetch_related(
             "results", "results__analyte"
         )
-        mine = self.request.query_params.get("mine")
-        if mine in {"true", "1", "yes"}:
-            queryset = queryset.filter(patient__user=user)
         patient_id = self.request.query_params.get("patient_id")
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
-        if user.role in IsOwnerOrClinical.clinical_roles or user.is_staff:
-            return queryset
-        return queryset.filter(patient__user=user)
+        mine = self.request.query_params.get("mine") in {"true", "1", "yes"}
+        return get_patient_access(self.request).scope(queryset, mine=mine)
 
     def perform_create(self, serializer):
-        user = self.request.user
         patient = serializer.validated_data["patient"]
-        if user.role not in IsOwnerOrClinical.clinical_roles and patient.user_id != user.id:
+        if not get_patient_access(self.request).can_access(patient.pk):
             raise PermissionDenied("You can only create reports for linked patients.")
-        serializer.save()
+        report = serializer.save()
+        # API-created reports carry no extracted text; index the lab name now.
+        update_search_vectors([report.pk], texts={})
 
 
-class ReportDetailView(generics.RetrieveAPIView):
-    queryset = Report.objects.select_related("patient", "patient__user").prefetch_related(
-        "results", "results__analyte"
-    )
-    serializer_class = ReportSerializer
+class ReportSearchView(generics.ListAPIView):
+    """Full-text search over analyte names, lab name and report text (``?q=ferritin``)."""
+
+    serializer_class = ReportSearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NoCountPagination
+
+    def get_queryset(self):
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "Enter a search term."})
+        queryset = Report.objects.select_related("patient")
+        patient_id = self.request.query_params.get("patient_id")
+        if patient_id:
+            queryset = queryset.filter(patient_id=patient_id)
+        mine = self.request.query_params.get("mine") in {"true", "1", "yes"}
+        queryset = get_patient_access(self.request).scope(queryset, mine=mine)
+        return search_reports(queryset, text)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return attach_headlines(page, self.request.query_params["q"].strip())
+
+
+class ReportDetailView(AsyncAPIView):
+    queryset = Report.objects.select_related(
+        "patient", "patient__user", "patient__onboarding"
+    ).prefetch_related("results", "results__analyte")
     permission_classes = [IsOwnerOrClinical]
 
+    async def get(self, request, pk):
+        report = await aget_object_or_404(self.queryset, pk=pk)
+        await self.acheck_object_permissions(request, report)
+        return Response(await self.aserialize(ReportSerializer, report))
+
+
+class ReportInsightsStreamView(AsyncAPIView):
+    """Regenerates a report's insights, streaming the model output as Server-Sent Events."""
+
+    permission_classes = [IsOwnerOrClinical]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    async def post(self, request, pk):
+        report = await aget_object_or_404(Report, pk=pk)
+        await self.acheck_object_permissions(request, report)
+        response = StreamingHttpResponse(
+            stream_report_insights(report), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Tell nginx not to buffer the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class ReportTextView(AsyncAPIView):
+    """The text extracted from a report's PDF, which report payloads no longer include."""
+
+    permission_classes = [IsOwnerOrClinical]
+
+    async def get(self, request, pk):
+        report = await aget_object_or_404(Report, pk=pk)
+        await self.acheck_object_permissions(request, report)
+        stored = await ReportText.objects.filter(report_id=report.pk).afirst()
+        if stored is None:
+            raise Http404("No extracted text is stored for this report.")
+        return Response(
+            {"report_id": str(report.pk), "length": stored.length, "text": stored.text}
+        )
+
 
 class ReportDeleteView(generics.DestroyAPIView):
     queryset = Report.objects.all()
@@ -154,31 +249,77 @@ class AnalyteListCreateView(generics.ListCreateAPIView):
     serializer_class = AnalyteSerializer
 
     def perform_create(self, serializer):
-        if self.request.user.role not in IsOwnerOrClinical.clinical_roles:
+        if self.request.user.role not in CLINICAL_ROLES:
             raise PermissionDenied("Only medical staff can add analytes.")
         serializer.save()
 
 
+class AnalyteAnalyticsView(generics.ListAPIView):
+    """Population distributions per analyte, read from the precomputed rollup table."""
+
+    serializer_class = AnalyteRollupSerializer
+    permission_classes = [IsClinicalRole]
+    GROUPS = {
+        "overall": {"sex": "", "age_band": ""},
+        "sex": {"age_band": ""},
+        "age_band": {"sex": ""},
+    }
+
+    def get_queryset(self):
+        queryset = AnalyteRollup.objects.select_related("analyte")
+        analytes = self.request.query_params.get("analytes")
+        if analytes:
+            names = [item.strip() for item in analytes.split(",") if item.strip()]
+            queryset = queryset.filter(analyte__name__in=names)
+        group = self.request.query_params.get("group", "overall")
+        if group == "sex_age_band":
+            return queryset.exclude(sex="").exclude(age_band="")
+        if group not in self.GROUPS:
+            choices = ", ".join([*self.GROUPS, "sex_age_band"])
+            raise ValidationError({"group": f"Choose one of: {choices}."})
+        queryset = queryset.filter(**self.GROUPS[group])
+        if group != "overall":
+            queryset = queryset.exclude(**{group: ""})
+        return queryset
+
+
+class LLMUsageSummaryView(APIView):
+    """Staff only: model calls, latency percentiles and estimated spend per day."""
+
+    permission_classes = [permissions.IsAdminUser]
+    MAX_DAYS = 90
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", 14))
+        except ValueError:
+            raise ValidationError({"days": "Must be an integer."})
+        if not 1 <= days <= self.MAX_DAYS:
+            raise ValidationError({"days": f"Must be between 1 and {self.MAX_DAYS}."})
+        return Response({"days": daily_summary(days)})
+
+
 class ResultValueListCreateView(generics.ListCreateAPIView):
     serializer_class = ResultValueSerializer
     queryset = ResultValue.objects.select_related("report", "report__patient", "analyte")
 
     def get_queryset(self):
-        user = self.request.user
         queryset = ResultValue.objects.select_related("report", "report__patient", "analyte")
-        if user.role in IsOwnerOrClinical.clinical_roles or user.is_staff:
-            return queryset
-        return queryset.filter(report__patient__user=user)
+        return get_patient_access(self.request).scope(queryset, "report__patient")
 
     def perform_create(self, serializer):
         report = serializer.validated_data["report"]
-        user = self.request.user
-        if user.role not in IsOwnerOrClinical.clinical_roles and report.patient.user_id != user.id:
+        if not get_patient_access(self.request).can_access(report.patient_id):
             raise PermissionDenied("You can only add results to your own reports.")
-        serializer.save()
+        result = serializer.save()
+        update_search_vectors([result.report_id])
+
+
+def _scaled(value, factor):
+    return round(float(value) * factor, 6) if value is not None and factor is not None else None
 
 
-class ReportTrendsView(APIView):
+class ReportTrendsView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     DEFAULT_ANALYTES = {
@@ -196,8 +337,7 @@ class ReportTrendsView(APIView):
             return list(self.DEFAULT_ANALYTES.keys())
         return [item.strip() for item in param.split(",") if item.strip()]
 
-    def get(self, request):
-        user = request.user
+    async def get(self, request):
         analyte_keys = self._parse_analytes(request)
         if not analyte_keys:
             return Response({"analytes": []})
@@ -208,37 +348,47 @@ class ReportTrendsView(APIView):
 
         patient_id = request.query_params.get("patient_id")
         if patient_id:
-            patient = get_object_or_404(Patient, pk=patient_id)
+            patient = await aget_object_or_404(Patient, pk=patient_id)
             permission = IsOwnerOrClinical()
-            if not permission.has_object_permission(request, self, patient):
+            allowed = await sync_to_async(permission.has_object_permission)(request, self, patient)
+            if not allowed:
                 raise PermissionDenied("You cannot access this patient's data.")
             queryset = queryset.filter(report__patient=patient)
         else:
-            queryset = queryset.filter(report__patient__user=user)
+            access = get_patient_access(request)
+            queryset = await sync_to_async(access.scope)(queryset, "report__patient", mine=True)
 
         queryset = queryset.order_by("measured_at", "report__issued_at", "pk")
 
         trends_map = {}
-        for result in queryset:
+        async for result in queryset:
             key = result.analyte.name
+            factor, canonical_unit = conversion_for(key, result.unit, result.analyte.unit)
+            value, unit = result.canonical_value, canonical_unit
+            if value is None and factor is not None:
+                # Written before canonical values existed and not backfilled yet.
+                value = _scaled(result.value, factor)
+            if value is None:
+                # Unit outside the registry: show the reading as reported, with its own range.
+                factor, value, unit = 1.0, float(result.value), result.unit
             entry = trends_map.setdefault(
                 key,
                 {
                     "key": key,
                     "label": self.DEFAULT_ANALYTES.get(key, key.replace("_", " ").title()),
-                    "unit": result.unit or result.analyte.unit,
+                    "unit": canonical_unit,
                     "points": [],
                 },
             )
-            if not entry["unit"]:
-                entry["unit"] = result.unit or result.analyte.unit
             measured_at = result.measured_at or result.report.issued_at
             entry["points"].append(
                 {
-                    "value": float(result.value),
-                    "unit": result.unit,
-                    "ref_min": float(result.ref_min) if result.ref_min is not None else None,
-                    "ref_max": float(result.ref_max) if result.ref_max is not None else None,
+                    "value": value,
+                    "unit": unit,
+                    "original_value": float(result.value),
+                    "original_unit": result.unit,
+                    "ref_min": _scaled(result.ref_min, factor),
+                    "ref_max": _scaled(result.ref_max, factor),
                     "flag": result.flag,
                     "measured_at": measured_at.isoformat() if measured_at else None,
                     "report_id": str(result.report_id),
@@ -257,98 +407,71 @@ class AlertListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
         queryset = Alert.objects.select_related("patient", "report", "report__patient")
-        if user.role in IsOwnerOrClinical.clinical_roles or user.is_staff:
-            return queryset
-        return queryset.filter(Q(patient__user=user) | Q(report__patient__user=user))
+        return get_patient_access(self.request).scope_alerts(queryset)
 
 
-class ReportUploadView(APIView):
+class ReportUploadView(AsyncAPIView):
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
 
-    def post(self, request, *args, **kwargs):
-        serializer = ReportUploadSerializer(data=request.data)
+    async def post(self, request, *args, **kwargs):
+        serializer = ReportUploadSerializer(data=await self.aget_data(request))
         serializer.is_valid(raise_exception=True)
-        patient = Patient.objects.filter(user=request.user).first()
+        patient = await sync_to_async(get_patient_access(request).get_own_patient)()
         if not patient:
             raise ValidationError("Please create a patient profile before uploading reports.")
         pdf_file = serializer.validated_data["pdf"]
-        parsed_payload = parse_pdf(pdf_file)
-        report_date_raw = parsed_payload.get("report_date") or timezone.now()
-        if isinstance(report_date_raw, str):
-            dt = parse_datetime(report_date_raw)
-        elif isinstance(report_date_raw, datetime):
-            dt = report_date_raw
-        else:
-            dt = None
-        if dt is None:
-            dt = timezone.now()
-        if timezone.is_naive(dt):
-            dt = timezone.make_aware(dt, timezone.get_current_timezone())
-        report_date = dt
-        parsed_fields = parsed_payload.copy()
-        parsed_fields["report_date"] = report_date.isoformat()
-        pdf_file.seek(0)
-        report = Report.objects.create(
-            patient=patient,
-            org_name=parsed_payload.get("lab_name") or "Unknown Lab",
-            issued_at=report_date,
-            pdf_file=pdf_file,
-            raw_json={
-                "filename": pdf_file.name,
-                "size": pdf_file.size,
-                "content_type": pdf_file.content_type,
-                "raw_text": parsed_payload.get("raw_text", ""),
-            },
-            parsed_fields=parsed_fields,
-        )
-        if report.pdf_file:
-            url = report.pdf_file.url
-            if request:
-                url = request.build_absolute_uri(url)
-            report.pdf_url = url
-            report.save(update_fields=["pdf_url"])
-        results_payload = parsed_payload.get("analytes", [])
-        for result_data in results_payload:
-            analyte, _ = Analyte.objects.get_or_create(
-                name=result_data.get("name", "unknown"),
-                defaults={
-                    "unit": result_data.get("unit", ""),
-                    "description": "Auto-created",
-                },
-            )
-            measured_str = result_data.get("measured_at")
-            measured_at = parse_datetime(measured_str) if measured_str else None
-            if measured_at is None:
-                measured_at = report_date
-            elif timezone.is_naive(measured_at):
-                measured_at = timezone.make_aware(measured_at, timezone.get_current_timezone())
-            value = result_data.get("value", 0)
-            ref_min = result_data.get("ref_min", 0)
-            ref_max = result_data.get("ref_max", 0)
-            flag = ResultValue.Flag.NORMAL
-            if value < ref_min:
-                flag = ResultValue.Flag.LOW
-            elif value > ref_max:
-                flag = ResultValue.Flag.HIGH
-            ResultValue.objects.create(
-                report=report,
-                analyte=analyte,
-                value=value,
-                unit=result_data.get("unit", analyte.unit),
-                ref_min=ref_min,
-                ref_max=ref_max,
-                flag=flag,
-                measured_at=measured_at,
+        report = await aingest_pdf(patient, pdf_file, request)
+        return Response(await self.aserialize(ReportSerializer, report), status=201)
+
+
+class ReportBatchUploadView(AsyncAPIView):
+    parser_classes = [parsers.MultiPartParser, parsers.FormParser]
+
+    async def post(self, request, *args, **kwargs):
+        serializer = ReportBatchUploadSerializer(data=await self.aget_data(request))
+        serializer.is_valid(raise_exception=True)
+        patient = await sync_to_async(get_patient_access(request).get_own_patient)()
+        if not patient:
+            raise ValidationError("Please create a patient profile before uploading reports.")
+        try:
+            documents = await sync_to_async(collect_documents, thread_sensitive=False)(
+                serializer.validated_data.get("files", []),
+                serializer.validated_data.get("archive"),
             )
+        except BatchUploadError as exc:
+            raise ValidationError(str(exc)) from exc
+        entries = await aingest_batch(patient, documents, request)
+
+        created_ids = [entry["report_id"] for entry in entries if entry["status"] == "created"]
+        reports = await sync_to_async(self._serialize_reports)(created_ids)
+        for entry in entries:
+            if entry["status"] == "created":
+                entry["report"] = reports.get(entry["report_id"])
+        summary = {
+            status_name: sum(1 for entry in entries if entry["status"] == status_name)
+            for status_name in ("created", "duplicate", "error")
+        }
+        return Response({"results": entries, **summary}, status=201 if created_ids else 200)
+
+    def _serialize_reports(self, report_ids):
+        queryset = ReportDetailView.queryset.filter(pk__in=report_ids)
+        data = ReportSerializer(queryset, many=True, context=self.get_serializer_context()).data
+        return {item["id"]: item for item in data}
 
-        insights = generate_insights(report)
-        report.insights = insights
-        report.analysis_generated_at = timezone.now()
-        report.save(update_fields=["insights", "analysis_generated_at"])
-        serializer = ReportSerializer(report, context={"request": request})
-        return Response(serializer.data, status=201)
+
+class LabBulkResultsView(APIView):
+    """Accepts structured results from lab systems, skipping PDF parsing entirely."""
+
+    permission_classes = [IsLabRole]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            reports = validate_bulk_payload(request.data)
+            summary = store_bulk_results(reports)
+        except BulkValidationError as exc:
+            raise ValidationError(exc.errors) from exc
+        return Response(summary, status=201 if summary["created_reports"] else 200)
 
 
 class OnboardingProfileView(generics.RetrieveUpdateAPIView):
@@ -356,7 +479,7 @@ class OnboardingProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        patient = Patient.objects.filter(user=self.request.user).first()
+        patient = get_patient_access(self.request).get_own_patient()
         if patient is None:
             raise ValidationError("Patient profile not found.")
         profile, _ = OnboardingProfile.objects.get_or_create(patient=patient)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import render_latest
+
+
+def _from_allowed_network(request) -> bool:
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, "METRICS_ALLOWED_NETWORKS", [])
+    )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint.
+
+    With ``METRICS_AUTH_TOKEN`` set, scrapers must send it as a bearer token; without one,
+    only clients in ``METRICS_ALLOWED_NETWORKS`` (loopback by default) are served.
+    """
+    token = getattr(settings, "METRICS_AUTH_TOKEN", "")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden("Invalid metrics token.")
+    elif not _from_allowed_network(request):
+        return HttpResponseForbidden("Metrics are only served to internal networks.")
+    payload, content_type = render_latest()
+    return HttpResponse(payload, content_type=content_type)
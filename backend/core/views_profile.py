@@ -3,7 +3,7 @@ from __future__ import annotations
 from django.http import Http404
 from rest_framework import generics, permissions
 
-from .models import Patient
+from .access import get_patient_access
 from .serializers import PatientSerializer
 
 
@@ -12,7 +12,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        patient = Patient.objects.filter(user=self.request.user).first()
+        patient = get_patient_access(self.request).get_own_patient()
         if patient is None:
             raise Http404("Patient profile not found.")
         return patient
@@ -0,0 +1,25 @@
+"""Gunicorn settings picked up automatically from the working directory.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set every worker writes its metrics to that directory and
+``/metrics`` aggregates them, so stale files are cleared on boot and dead workers are marked.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    if _multiproc_dir:
+        shutil.rmtree(_multiproc_dir, ignore_errors=True)
+        os.makedirs(_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if _multiproc_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
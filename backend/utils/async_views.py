@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines.
+
+    DRF's request setup (authentication, permissions, throttling) is synchronous and may hit
+    the database, so it runs through ``sync_to_async``; the handler itself is awaited on the
+    event loop, which lets slow external calls wait without holding a worker thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def acheck_object_permissions(self, request, obj):
+        """``check_object_permissions`` in a thread; permission checks may query the database."""
+        await sync_to_async(self.check_object_permissions)(request, obj)
+
+    async def aget_data(self, request):
+        """Parse the request body off the event loop (multipart parsing spools to disk)."""
+        return await sync_to_async(lambda: request.data)()
+
+    async def aserialize(self, serializer_class, instance, **kwargs):
+        """Render ``serializer_class(instance).data`` in a thread so lazy relations can load."""
+        kwargs.setdefault("context", self.get_serializer_context())
+        return await sync_to_async(lambda: serializer_class(instance, **kwargs).data)()
+
+    def get_serializer_context(self):
+        return {"request": self.request, "format": self.format_kwarg, "view": self}
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import zlib
+from typing import Tuple
+
+try:  # pragma: no cover - optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+
+def compress_text(text: str, codec: str = ZLIB) -> Tuple[str, bytes]:
+    """Compress ``text`` as UTF-8; returns the codec actually used and the payload.
+
+    ``zstd`` falls back to ``zlib`` when the ``zstandard`` package is not installed.
+    """
+    data = text.encode("utf-8")
+    if codec == ZSTD and zstandard is not None:
+        return ZSTD, zstandard.ZstdCompressor(level=10).compress(data)
+    return ZLIB, zlib.compress(data, 6)
+
+
+def decompress_text(codec: str, payload: bytes) -> str:
+    payload = bytes(payload)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed text.")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    return zlib.decompress(payload).decode("utf-8")
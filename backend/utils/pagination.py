@@ -1,9 +1,91 @@
 from __future__ import annotations
 
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class DefaultPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class NoCountPagination(PageNumberPagination):
+    """Page numbers without ``COUNT(*)``: one extra row is fetched to know if there is more.
+
+    For queries whose total is expensive to compute (full-text matches over many rows) and
+    which clients only page through from the top.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            self.number = 1
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data}
+        )
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator that takes large totals from the planner instead of ``COUNT(*)``.
+
+    Postgres' row estimate for the query (``EXPLAIN``) costs a plan, not a scan. Totals
+    estimated below ``estimate_above`` are small enough to count exactly; above it the page
+    count is approximate, which admin changelists over very large tables can live with.
+    """
+
+    estimate_above = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        estimate = self._estimated_count()
+        if estimate is None or estimate < self.estimate_above:
+            return super().count
+        return estimate
+
+    def _estimated_count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
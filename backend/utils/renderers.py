@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import datetime
+import decimal
+import json
+import uuid
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def orjson_default(obj):
+    """Fallback for types orjson does not serialize natively, mirroring DRF's encoder."""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in ``JSONRenderer`` backed by orjson; falls back to DRF when orjson is missing.
+
+    Output matches the stdlib renderer for the types DRF emits: aware UTC datetimes end in
+    ``Z``, Decimals become numbers and lazy translation strings are forced. Indentation
+    requested through the ``Accept`` header is rendered with orjson's two-space indent.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=orjson_default, option=options)
+
+
+def sse_event(event: str, data) -> str:
+    """One Server-Sent Events message; ``data`` is JSON encoded onto a single line."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets ``text/event-stream`` views pass content negotiation.
+
+    Successful responses are ``StreamingHttpResponse`` objects that bypass rendering, so
+    this only renders DRF's error responses (403, 404, ...) as a single ``error`` event.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return sse_event("error", data).encode(self.charset)